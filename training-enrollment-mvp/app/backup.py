@@ -0,0 +1,364 @@
+"""Online snapshots of the live database through the SQLite backup API.
+
+:func:`create_backup` copies ``pages`` pages per ``backup_step`` and sleeps
+``step_sleep`` seconds between steps, so a snapshot of a large database is
+spread out instead of saturating the disk while requests are served. The
+copy is written to a temporary name, fsynced and renamed to
+``training-<timestamp>.db`` next to a ``.json`` manifest holding its SHA-256,
+size and step count; :func:`rotate` keeps the newest ``keep`` snapshots.
+
+In WAL mode the source connection holds one read transaction across all
+steps, so the copy is a consistent snapshot and writers carry on (they only
+keep the WAL from being checkpointed past it until the copy ends). Without
+WAL that would lock writers out, so the steps run unpinned; SQLite restarts
+the copy whenever another connection writes, and after ``MAX_RESTARTS``
+restarts the snapshot is taken in a single step instead.
+
+:func:`verify_backup` checks a snapshot the way a restore would use it: the
+checksum must match its manifest, and a scratch copy restored through the
+backup API must pass ``PRAGMA integrity_check``.
+
+With ``archive_dir``, the per-year archive databases registered in the
+snapshot's ``archive_year`` table are copied too, in the same pinned read
+transaction as the main copy, so a year archived meanwhile is either in
+both or in neither. Archives rarely change, so copies live in
+``archives/`` under a name that carries their SHA-256 prefix and are shared
+by every snapshot that has the same bytes; the manifest lists them with
+their checksums and :func:`rotate` deletes copies no snapshot lists.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import urllib.parse
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+PREFIX = "training-"
+SUFFIX = ".db"
+MANIFEST_SUFFIX = ".json"
+ARCHIVE_SUBDIR = "archives"
+MAX_RESTARTS = 3
+CHUNK_SIZE = 1024 * 1024
+# Tables whose row counts a verification reports, to compare with the live database.
+COUNTED_TABLES = ("person", "training_session", "enrollment", "course", "finance_record")
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def create_backup(
+    db_path: Path,
+    backup_dir: Path,
+    pages: int = 64,
+    step_sleep: float = 0.005,
+    keep: int = 7,
+    archive_dir: Optional[Path] = None,
+) -> Dict[str, Any]:
+    """Snapshot ``db_path`` (and its archives) into ``backup_dir``; return the manifest plus timing."""
+    backup_dir = Path(backup_dir)
+    backup_dir.mkdir(parents=True, exist_ok=True)
+    name = f"{PREFIX}{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}{SUFFIX}"
+    tmp_path = backup_dir / f".{name}.tmp"
+    scratch: List[Path] = [tmp_path]
+    started = time.perf_counter()
+    single_step = False
+    try:
+        try:
+            steps, archives = _copy(db_path, tmp_path, pages, step_sleep, archive_dir, backup_dir, scratch)
+        except _TooManyRestarts:
+            _unlink_all(scratch)
+            steps, archives = _copy(db_path, tmp_path, -1, 0, archive_dir, backup_dir, scratch)
+            single_step = True
+        _fsync(tmp_path)
+        sha256, size = file_sha256(tmp_path)
+        archives = [_store_archive(backup_dir, entry) for entry in archives]
+        path = backup_dir / name
+        os.replace(tmp_path, path)
+    except BaseException:
+        _unlink_all(scratch)
+        raise
+    seconds = time.perf_counter() - started
+    manifest = {
+        "file": name,
+        "sha256": sha256,
+        "size": size,
+        "source": str(db_path),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "pages_per_step": pages,
+        "steps": steps,
+        "single_step": single_step,
+        "seconds": round(seconds, 3),
+        "archives": archives,
+    }
+    _manifest_path(path).write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    manifest["removed"] = rotate(backup_dir, keep)
+    return manifest
+
+
+def _progress(state: Dict[str, Any], step_sleep: float) -> Callable[[int, int, int], None]:
+    def progress(status: int, remaining: int, total: int) -> None:
+        state["steps"] += 1
+        if state["remaining"] is not None and remaining > state["remaining"]:
+            state["restarts"] += 1
+            if state["restarts"] >= MAX_RESTARTS:
+                raise _TooManyRestarts()
+        state["remaining"] = remaining
+        if remaining and step_sleep > 0:
+            time.sleep(step_sleep)
+
+    return progress
+
+
+def _copy(
+    db_path: Path,
+    target_path: Path,
+    pages: int,
+    step_sleep: float,
+    archive_dir: Optional[Path],
+    backup_dir: Path,
+    scratch: List[Path],
+) -> Tuple[int, List[Dict[str, Any]]]:
+    """Copy the main database to ``target_path`` and the registered archives to scratch files.
+
+    Returns the main copy's step count and one entry per registered archive
+    year: ``{"year", "file_name", "tmp"}``, or ``"missing": True`` when its
+    file is not in ``archive_dir``.
+    """
+    state = {"steps": 0, "restarts": 0, "remaining": None}
+    # uri=True lets _attach_archives() ATTACH archives with ?mode=ro.
+    source = sqlite3.connect(db_path, timeout=30, isolation_level=None, uri=True)
+    target = sqlite3.connect(target_path)
+    try:
+        # ATTACH is not allowed inside a transaction: attach what is
+        # registered now, then compare with the registry as of the snapshot.
+        attached = _attach_archives(source, archive_dir) if archive_dir is not None else {}
+        pinned = source.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        if pinned:
+            source.execute("BEGIN")
+            source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            for schema, _ in attached.values():
+                source.execute(f"SELECT COUNT(*) FROM {schema}.sqlite_master").fetchone()
+        source.backup(target, pages=pages, progress=_progress(state, step_sleep))
+        archives: List[Dict[str, Any]] = []
+        if archive_dir is not None:
+            archive_tmp_dir = Path(backup_dir) / ARCHIVE_SUBDIR
+            archive_tmp_dir.mkdir(exist_ok=True)
+            for year, file_name in _registered_archives(source):
+                if year not in attached:
+                    archives.append({"year": year, "file_name": file_name, "missing": True})
+                    continue
+                tmp = archive_tmp_dir / f".{target_path.stem}-{file_name}.tmp"
+                scratch.append(tmp)
+                archive_target = sqlite3.connect(tmp)
+                try:
+                    archive_state = {"steps": 0, "restarts": 0, "remaining": None}
+                    source.backup(
+                        archive_target, pages=pages, progress=_progress(archive_state, step_sleep),
+                        name=attached[year][0],
+                    )
+                    archive_target.execute("PRAGMA journal_mode=DELETE")
+                finally:
+                    archive_target.close()
+                archives.append({"year": year, "file_name": file_name, "tmp": tmp})
+        if pinned:
+            source.execute("COMMIT")
+        # A standalone rollback-journal file: no -wal/-shm needed to open it.
+        target.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        target.close()
+        source.close()
+    return state["steps"], archives
+
+
+def _registered_archives(conn: sqlite3.Connection) -> List[Tuple[str, str]]:
+    tables = {row[0] for row in conn.execute("SELECT name FROM main.sqlite_master WHERE type = 'table'")}
+    if "archive_year" not in tables:
+        return []
+    return [(row[0], row[1]) for row in conn.execute("SELECT year, file_name FROM main.archive_year ORDER BY year")]
+
+
+def _attach_archives(conn: sqlite3.Connection, archive_dir: Path) -> Dict[str, Tuple[str, str]]:
+    """Attach each registered archive read-only; ``{year: (schema, file_name)}``."""
+    attached = {}
+    for year, file_name in _registered_archives(conn):
+        path = Path(archive_dir) / file_name
+        if not path.exists():
+            continue
+        schema = f"backup_archive_{year}"
+        conn.execute(f"ATTACH DATABASE ? AS {schema}", (f"file:{urllib.parse.quote(str(path.resolve()))}?mode=ro",))
+        attached[year] = (schema, file_name)
+    return attached
+
+
+def _store_archive(backup_dir: Path, entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Move an archive copy to its content-addressed name; an intact stored copy is reused."""
+    if entry.get("missing"):
+        return {"year": entry["year"], "file_name": entry["file_name"], "missing": True}
+    tmp = entry["tmp"]
+    _fsync(tmp)
+    sha256, size = file_sha256(tmp)
+    stem = Path(entry["file_name"]).stem
+    relative = f"{ARCHIVE_SUBDIR}/{stem}-{sha256[:16]}{SUFFIX}"
+    path = Path(backup_dir) / relative
+    if path.exists() and file_sha256(path) == (sha256, size):
+        tmp.unlink()
+    else:
+        os.replace(tmp, path)
+    return {"year": entry["year"], "file_name": entry["file_name"], "file": relative, "sha256": sha256, "size": size}
+
+
+def _fsync(path: Path) -> None:
+    with open(path, "rb+") as handle:
+        os.fsync(handle.fileno())
+
+
+def _unlink_all(paths: List[Path]) -> None:
+    for path in paths:
+        path.unlink(missing_ok=True)
+
+
+def file_sha256(path: Path) -> Tuple[str, int]:
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def list_backups(backup_dir: Path) -> List[Dict[str, Any]]:
+    """Manifests of the snapshots in ``backup_dir``, newest first."""
+    backup_dir = Path(backup_dir)
+    if not backup_dir.is_dir():
+        return []
+    result = []
+    for path in sorted(backup_dir.glob(f"{PREFIX}*{SUFFIX}"), reverse=True):
+        manifest_path = _manifest_path(path)
+        if manifest_path.exists():
+            result.append(json.loads(manifest_path.read_text(encoding="utf-8")))
+        else:
+            result.append({"file": path.name, "size": path.stat().st_size, "sha256": None})
+    return result
+
+
+def rotate(backup_dir: Path, keep: int) -> List[str]:
+    """Delete all but the newest ``keep`` snapshots with their manifests, and archive copies none lists."""
+    removed = []
+    manifests = list_backups(backup_dir)
+    for manifest in manifests[max(keep, 1):]:
+        path = Path(backup_dir) / manifest["file"]
+        path.unlink(missing_ok=True)
+        _manifest_path(path).unlink(missing_ok=True)
+        removed.append(manifest["file"])
+    referenced = {
+        entry.get("file") for manifest in manifests[: max(keep, 1)] for entry in manifest.get("archives", [])
+    }
+    archive_dir = Path(backup_dir) / ARCHIVE_SUBDIR
+    if archive_dir.is_dir():
+        for path in archive_dir.glob(f"*{SUFFIX}"):
+            if f"{ARCHIVE_SUBDIR}/{path.name}" not in referenced:
+                path.unlink()
+                removed.append(f"{ARCHIVE_SUBDIR}/{path.name}")
+    return removed
+
+
+def resolve_backup(backup_dir: Path, name: Optional[str] = None) -> Path:
+    """``name`` inside ``backup_dir`` (or a path), or the newest snapshot when omitted."""
+    if name and name != "latest":
+        path = Path(name)
+        return path if path.exists() or path.is_absolute() else Path(backup_dir) / name
+    backups = list_backups(backup_dir)
+    if not backups:
+        raise FileNotFoundError(f"{backup_dir} 中没有备份")
+    return Path(backup_dir) / backups[0]["file"]
+
+
+def verify_backup(path: Path) -> Dict[str, Any]:
+    """Checksum a snapshot against its manifest, restore it to a scratch file and integrity-check that.
+
+    Archive copies listed in the manifest are checksummed and integrity-checked
+    in place; every year the snapshot's ``archive_year`` registers must be listed.
+    """
+    path = Path(path)
+    result: Dict[str, Any] = {"file": path.name, "ok": False}
+    if not path.exists():
+        result["error"] = "备份文件不存在"
+        return result
+    manifest_path = _manifest_path(path)
+    sha256, size = file_sha256(path)
+    result.update({"sha256": sha256, "size": size})
+    expected: Dict[str, Any] = {}
+    if manifest_path.exists():
+        expected = json.loads(manifest_path.read_text(encoding="utf-8"))
+        result["checksum_ok"] = expected.get("sha256") == sha256 and expected.get("size") == size
+    else:
+        result["checksum_ok"] = None
+    registered: List[Tuple[str, str]] = []
+
+    with tempfile.TemporaryDirectory(prefix="training-restore-") as tmp:
+        restored_path = Path(tmp) / "restored.db"
+        source = sqlite3.connect(f"file:{urllib.parse.quote(str(path.resolve()))}?mode=ro", uri=True)
+        restored = sqlite3.connect(restored_path)
+        try:
+            source.backup(restored)
+            result["integrity"] = restored.execute("PRAGMA integrity_check").fetchone()[0]
+            tables = {row[0] for row in restored.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            result["tables"] = {
+                table: restored.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in COUNTED_TABLES
+                if table in tables
+            }
+            registered = _registered_archives(restored)
+        except sqlite3.DatabaseError as exc:
+            result["integrity"] = str(exc)
+        finally:
+            restored.close()
+            source.close()
+    result["archives"] = [_verify_archive(path.parent, entry) for entry in expected.get("archives", [])]
+    listed = {entry["year"] for entry in result["archives"]}
+    result["archives"] += [
+        {"year": year, "file_name": file_name, "ok": False, "error": "快照登记的归档库未包含在备份中"}
+        for year, file_name in registered
+        if year not in listed
+    ]
+    result["ok"] = (
+        result["integrity"] == "ok"
+        and result["checksum_ok"] is not False
+        and all(entry["ok"] for entry in result["archives"])
+    )
+    return result
+
+
+def _verify_archive(backup_dir: Path, entry: Dict[str, Any]) -> Dict[str, Any]:
+    result: Dict[str, Any] = {"year": entry["year"], "file_name": entry["file_name"], "ok": False}
+    if entry.get("missing"):
+        result["error"] = "备份时归档库文件不存在"
+        return result
+    path = Path(backup_dir) / entry["file"]
+    result["file"] = entry["file"]
+    if not path.exists():
+        result["error"] = "归档库备份文件不存在"
+        return result
+    sha256, size = file_sha256(path)
+    result["checksum_ok"] = entry.get("sha256") == sha256 and entry.get("size") == size
+    conn = sqlite3.connect(f"file:{urllib.parse.quote(str(path.resolve()))}?mode=ro", uri=True)
+    try:
+        result["integrity"] = conn.execute("PRAGMA integrity_check").fetchone()[0]
+    except sqlite3.DatabaseError as exc:
+        result["integrity"] = str(exc)
+    finally:
+        conn.close()
+    result["ok"] = result["checksum_ok"] and result["integrity"] == "ok"
+    return result
+
+
+def _manifest_path(path: Path) -> Path:
+    return path.with_suffix(MANIFEST_SUFFIX)
@@ -0,0 +1,237 @@
+"""Content-addressed storage for uploaded files.
+
+Every upload is stored once, at ``<root>/<sha[:2]>/<sha[2:]><suffix>``; the
+part below ``root`` is the blob key that ``source_file``/``notice_filename``
+columns record. The two-character fan-out keeps every directory small
+however many files accumulate, and uploading the same bytes again only
+hashes them.
+
+The database keeps one ``upload_blob`` row per stored file (size, first
+name, last use) and ``upload_ref`` rows for what still needs it: the
+session whose notice it is, the session whose enrollments or courses were
+imported from it, or the finance records it last updated.
+:func:`delete_unreferenced` removes blobs with no references that have
+not been used for a while, so disk usage follows what is referenced.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import time
+import uuid
+from pathlib import Path
+from typing import BinaryIO, Dict, Tuple
+
+CHUNK_SIZE = 1024 * 1024
+TMP_DIR_NAME = "tmp"
+TMP_MAX_AGE = 3600
+
+SCHEMA_STATEMENTS = (
+    """
+    CREATE TABLE IF NOT EXISTS upload_blob (
+        blob_key TEXT PRIMARY KEY,
+        sha256 TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        original_name TEXT,
+        created_at TEXT NOT NULL,
+        last_used_at TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS upload_ref (
+        blob_key TEXT NOT NULL,
+        ref_table TEXT NOT NULL,
+        ref_id INTEGER NOT NULL,
+        PRIMARY KEY (blob_key, ref_table, ref_id)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_upload_blob_last_used ON upload_blob(last_used_at)",
+)
+
+# Deleting the last course imported from a Word file releases that file.
+REF_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_course_upload_ref_delete
+    AFTER DELETE ON course
+    WHEN OLD.source_file IS NOT NULL AND NOT EXISTS (
+        SELECT 1 FROM course WHERE source_file = OLD.source_file AND session_id IS OLD.session_id
+    )
+    BEGIN
+        DELETE FROM upload_ref
+        WHERE blob_key = OLD.source_file AND ref_table = 'course' AND ref_id = COALESCE(OLD.session_id, 0);
+    END
+    """,
+)
+
+
+def blob_key(sha256: str, suffix: str) -> str:
+    return f"{sha256[:2]}/{sha256[2:]}{suffix.lower()}"
+
+
+def blob_path(root: Path, key: str) -> Path:
+    return Path(root) / key
+
+
+def put(root: Path, stream: BinaryIO, suffix: str) -> Tuple[str, str, int]:
+    """Store the bytes of ``stream`` and return ``(key, sha256, size)``.
+
+    A seekable stream is hashed first and only written when the blob is
+    new; otherwise it is copied to a temporary file while hashing and
+    renamed into place (or dropped if the blob already exists).
+    """
+    root = Path(root)
+    if stream.seekable():
+        start = stream.tell()
+        sha256, size = _hash_stream(stream)
+        key = blob_key(sha256, suffix)
+        path = blob_path(root, key)
+        if not path.exists():
+            stream.seek(start)
+            _write_atomic(root, stream, path)
+        return key, sha256, size
+
+    tmp_path = _tmp_path(root)
+    digest = hashlib.sha256()
+    size = 0
+    with open(tmp_path, "wb") as handle:
+        for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+            size += len(chunk)
+            handle.write(chunk)
+    sha256 = digest.hexdigest()
+    key = blob_key(sha256, suffix)
+    path = blob_path(root, key)
+    if path.exists():
+        tmp_path.unlink()
+    else:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp_path, path)
+    return key, sha256, size
+
+
+def _hash_stream(stream: BinaryIO) -> Tuple[str, int]:
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+        digest.update(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def _tmp_path(root: Path) -> Path:
+    tmp_dir = root / TMP_DIR_NAME
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    return tmp_dir / uuid.uuid4().hex
+
+
+def _write_atomic(root: Path, stream: BinaryIO, path: Path) -> None:
+    tmp_path = _tmp_path(root)
+    with open(tmp_path, "wb") as handle:
+        for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+            handle.write(chunk)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(tmp_path, path)
+
+
+def register(
+    conn: sqlite3.Connection, root: Path, key: str, sha256: str, size: int, original_name: str, now: str
+) -> bool:
+    """Record (or touch) the blob; False if its file vanished and must be written again.
+
+    Runs in the writer like :func:`delete_unreferenced`, so a blob cannot be
+    collected between this check and the caller adding its reference.
+    """
+    if not blob_path(root, key).exists():
+        return False
+    conn.execute(
+        """
+        INSERT INTO upload_blob (blob_key, sha256, size, original_name, created_at, last_used_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(blob_key) DO UPDATE SET last_used_at = excluded.last_used_at
+        """,
+        (key, sha256, size, original_name, now, now),
+    )
+    return True
+
+
+def add_ref(conn: sqlite3.Connection, key: str, ref_table: str, ref_id: int) -> None:
+    """Reference ``key`` from ``ref_table``/``ref_id``; a no-op for names that are not stored blobs."""
+    conn.execute(
+        """
+        INSERT OR IGNORE INTO upload_ref (blob_key, ref_table, ref_id)
+        SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM upload_blob WHERE blob_key = ?)
+        """,
+        (key, ref_table, ref_id, key),
+    )
+
+
+def drop_ref(conn: sqlite3.Connection, key: str, ref_table: str, ref_id: int) -> None:
+    conn.execute(
+        "DELETE FROM upload_ref WHERE blob_key = ? AND ref_table = ? AND ref_id = ?",
+        (key, ref_table, ref_id),
+    )
+
+
+def refresh_finance_refs(conn: sqlite3.Connection) -> None:
+    """Drop references from finance CSVs that no longer provide any record's current values."""
+    conn.execute(
+        """
+        DELETE FROM upload_ref
+        WHERE ref_table = 'finance_record'
+          AND blob_key NOT IN (SELECT source_file FROM finance_record WHERE source_file IS NOT NULL)
+        """
+    )
+
+
+def delete_unreferenced(conn: sqlite3.Connection, root: Path, cutoff: str) -> Dict[str, int]:
+    """Delete blobs without references last used before ``cutoff``, rows and files together.
+
+    Must run in the writer: a concurrent :func:`register` of the same
+    content then either sees the file gone and rewrites it, or touched
+    ``last_used_at`` first and keeps the blob alive.
+    """
+    rows = conn.execute(
+        """
+        SELECT blob_key, size FROM upload_blob
+        WHERE last_used_at < ?
+          AND NOT EXISTS (SELECT 1 FROM upload_ref WHERE upload_ref.blob_key = upload_blob.blob_key)
+        """,
+        (cutoff,),
+    ).fetchall()
+    conn.executemany("DELETE FROM upload_blob WHERE blob_key = ?", [(row[0],) for row in rows])
+    freed = 0
+    for key, size in rows:
+        try:
+            blob_path(root, key).unlink()
+        except FileNotFoundError:
+            pass
+        freed += size
+    return {"deleted": len(rows), "freed_bytes": freed}
+
+
+def sweep_tmp(root: Path, max_age_seconds: float = TMP_MAX_AGE) -> int:
+    """Remove temporary files left behind by interrupted uploads."""
+    tmp_dir = Path(root) / TMP_DIR_NAME
+    if not tmp_dir.is_dir():
+        return 0
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    for entry in os.scandir(tmp_dir):
+        if entry.is_file() and entry.stat().st_mtime < cutoff:
+            os.remove(entry.path)
+            removed += 1
+    return removed
+
+
+def usage(conn: sqlite3.Connection) -> Dict[str, int]:
+    row = conn.execute(
+        """
+        SELECT COUNT(*) AS blobs, COALESCE(SUM(size), 0) AS bytes,
+               (SELECT COUNT(*) FROM upload_blob
+                WHERE NOT EXISTS (SELECT 1 FROM upload_ref WHERE upload_ref.blob_key = upload_blob.blob_key)) AS unreferenced
+        FROM upload_blob
+        """
+    ).fetchone()
+    return {"blobs": row[0], "bytes": row[1], "unreferenced": row[2]}
+
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Sequence, Tuple
+
+from app.db.archive import union_all
+
+# The year an enrollment counts towards: the session's start year, or the
+# enrollment date for sessions created without one. Stored on each row as
+# ``enrollment.stat_year`` so per-year aggregates read idx_enrollment_stat_year
+# instead of joining every row. New rows get it from STAT_YEAR_VALUE_SQL in
+# their INSERT; STAT_YEAR_TRIGGERS only follow session start-date edits.
+STAT_YEAR_SQL = (
+    "COALESCE(NULLIF(substr((SELECT start_date FROM training_session"
+    " WHERE training_session.session_id = enrollment.session_id), 1, 4), ''),"
+    " substr(enrollment.enrolled_at, 1, 4))"
+)
+
+# STAT_YEAR_SQL for a row being inserted; parameters are the session_id and enrolled_at.
+STAT_YEAR_VALUE_SQL = (
+    "COALESCE(NULLIF(substr((SELECT start_date FROM training_session WHERE session_id = ?), 1, 4), ''),"
+    " substr(?, 1, 4))"
+)
+
+STAT_YEAR_INDEX = "CREATE INDEX IF NOT EXISTS idx_enrollment_stat_year ON enrollment(stat_year, person_id)"
+
+STAT_YEAR_TRIGGERS = (
+    # Per-row triggers that rewrote every inserted enrollment a second time;
+    # inserts now compute stat_year themselves and nothing moves enrollments
+    # between sessions or changes enrolled_at.
+    "DROP TRIGGER IF EXISTS trg_enrollment_stat_year_insert",
+    "DROP TRIGGER IF EXISTS trg_enrollment_stat_year_update",
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_session_stat_year_update
+    AFTER UPDATE OF start_date ON training_session
+    BEGIN
+        UPDATE enrollment SET stat_year = {STAT_YEAR_SQL} WHERE session_id = NEW.session_id;
+    END
+    """,
+)
+
+ENROLLMENT_VERSION_KEY = "enrollment_version"
+
+
+class VersionedCache:
+    """Memoises results per key until the version they were computed at changes."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: Dict[Hashable, Tuple[str, Any]] = {}
+
+    def get_or_compute(self, key: Hashable, version: str, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        value = compute()
+        with self._lock:
+            self._entries[key] = (version, value)
+        return value
+
+
+CACHE = VersionedCache()
+
+
+def bump_enrollment_version(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        "UPDATE app_state SET value = CAST(value AS INTEGER) + 1 WHERE key = ?", (ENROLLMENT_VERSION_KEY,)
+    )
+
+
+def enrollment_version(conn: sqlite3.Connection) -> str:
+    row = conn.execute("SELECT value FROM app_state WHERE key = ?", (ENROLLMENT_VERSION_KEY,)).fetchone()
+    return row["value"] if row else "0"
+
+
+def cohort_retention(conn: sqlite3.Connection, schemas: Sequence[str] = ("main",)) -> Dict[str, Any]:
+    """First-year cohorts and how many of each came back in every later year.
+
+    One pass over enrollment: distinct (person, year) pairs, ``MIN(year) OVER
+    (PARTITION BY person)`` for the cohort, then a GROUP BY. Cached until
+    ``app_state.enrollment_version`` changes; the database path and the
+    attached archive ``schemas`` are part of the key so other databases do
+    not share entries.
+    """
+    database = conn.execute("PRAGMA database_list").fetchone()["file"]
+    return CACHE.get_or_compute(
+        ("cohorts", database, tuple(schemas)), enrollment_version(conn), lambda: _cohort_retention(conn, schemas)
+    )
+
+
+def _cohort_retention(conn: sqlite3.Connection, schemas: Sequence[str]) -> Dict[str, Any]:
+    enrollments = union_all(
+        schemas,
+        "SELECT e.stat_year, {person} AS person_id FROM {schema}.enrollment AS e {person_join}"
+        " WHERE e.stat_year IS NOT NULL AND e.stat_year <> ''",
+    )
+    rows = conn.execute(
+        f"""
+        WITH person_year AS (
+            SELECT DISTINCT stat_year AS year, person_id
+            FROM ({enrollments})
+        ),
+        cohort AS (
+            SELECT year, MIN(year) OVER (PARTITION BY person_id) AS cohort_year
+            FROM person_year
+        )
+        SELECT cohort_year, year, COUNT(*) AS people
+        FROM cohort
+        GROUP BY cohort_year, year
+        ORDER BY cohort_year, year
+        """
+    ).fetchall()
+
+    cohorts: Dict[str, Dict[str, Any]] = {}
+    years = set()
+    for row in rows:
+        years.add(row["year"])
+        cohort = cohorts.setdefault(row["cohort_year"], {"cohort_year": row["cohort_year"], "size": 0, "returns": []})
+        if row["year"] == row["cohort_year"]:
+            cohort["size"] = row["people"]
+        else:
+            cohort["returns"].append({"year": row["year"], "people": row["people"]})
+    result: List[Dict[str, Any]] = []
+    for cohort in cohorts.values():
+        for item in cohort["returns"]:
+            item["rate"] = round(item["people"] / cohort["size"], 4) if cohort["size"] else None
+        result.append(cohort)
+    return {"years": sorted(years), "cohorts": result}
+
+
+def yearly_summary(
+    conn: sqlite3.Connection, year: str, top_n: int = 5, schemas: Sequence[str] = ("main",)
+) -> Dict[str, Any]:
+    """Totals, unique people, repeat people and the top ``top_n`` learners of ``year``.
+
+    A single statement: per-person counts are built once from
+    idx_enrollment_stat_year, then both the totals and the ``ORDER BY ...
+    LIMIT`` top-N read that materialised CTE. Ties in the top-N go to the
+    lower person_id. ``schemas`` lists attached archives to include.
+    """
+    enrollments = union_all(
+        schemas,
+        "SELECT {person} AS person_id FROM {schema}.enrollment AS e {person_join} WHERE e.stat_year = :year",
+    )
+    rows = conn.execute(
+        f"""
+        WITH per_person AS MATERIALIZED (
+            SELECT person_id, COUNT(*) AS enrollments
+            FROM ({enrollments})
+            GROUP BY person_id
+        ),
+        totals AS (
+            SELECT COALESCE(SUM(enrollments), 0) AS total_enrollments,
+                   COUNT(*) AS total_people,
+                   COALESCE(SUM(enrollments >= 2), 0) AS repeat_people
+            FROM per_person
+        ),
+        top AS (
+            SELECT person_id, enrollments
+            FROM per_person
+            ORDER BY enrollments DESC, person_id
+            LIMIT :top_n
+        )
+        SELECT totals.total_enrollments, totals.total_people, totals.repeat_people,
+               top.person_id, person.phone_norm, person.name_latest, top.enrollments
+        FROM totals
+        LEFT JOIN top ON 1
+        LEFT JOIN main.person ON person.person_id = top.person_id
+        ORDER BY top.enrollments DESC, top.person_id
+        """,
+        {"year": year, "top_n": top_n},
+    ).fetchall()
+    first = rows[0]
+    return {
+        "total_enrollments": first["total_enrollments"],
+        "total_people": first["total_people"],
+        "repeat_people": first["repeat_people"],
+        "top": [
+            {
+                "person_id": row["person_id"],
+                "phone_norm": row["phone_norm"],
+                "name": row["name_latest"] or "",
+                "count": row["enrollments"],
+            }
+            for row in rows
+            if row["person_id"] is not None
+        ],
+    }
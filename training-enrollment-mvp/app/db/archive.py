@@ -0,0 +1,210 @@
+"""Per-year archive databases.
+
+``archive_year`` moves the sessions that started in a closed year, together
+with their enrollments, courses, survey responses and message tasks, out of
+the hot database into ``<archive_dir>/training_<year>.db`` and records the
+year in ``archive_year``. People stay in the hot database, so archived rows
+keep pointing at valid ``person_id`` values. Archives are read-only, so a
+person merge after archiving leaves archived enrollments on the merged-away
+id: readers take an enrollment's person from :func:`person_sql`, which maps
+archived rows through ``main.person``. The merge itself re-points ``main``.
+
+Readers that are asked for archived years call :func:`attach_years` (or
+:func:`attach_all`) first: each archive is ATTACHed read-only as
+``archive_<year>`` and the query runs over ``main`` plus those schemas with
+UNION ALL. The connection must not be inside a transaction when attaching.
+"""
+from __future__ import annotations
+
+import re
+import sqlite3
+import urllib.parse
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+# Parents before children; deletes run in reverse.
+ARCHIVE_TABLES = ("training_session", "enrollment", "course", "survey_response", "message_task")
+
+REGISTRY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS archive_year (
+    year TEXT PRIMARY KEY,
+    file_name TEXT NOT NULL,
+    sessions INTEGER NOT NULL DEFAULT 0,
+    enrollments INTEGER NOT NULL DEFAULT 0,
+    archived_at TEXT NOT NULL
+)
+"""
+
+_TARGET = "archive_target"
+_ROW_FILTERS = {
+    "training_session": "session_id IN (SELECT session_id FROM temp.archive_session)",
+    "enrollment": "session_id IN (SELECT session_id FROM temp.archive_session)",
+    "course": "session_id IN (SELECT session_id FROM temp.archive_session)",
+    "survey_response": "course_id IN (SELECT course_id FROM main.course WHERE session_id IN (SELECT session_id FROM temp.archive_session))",
+    "message_task": "course_id IN (SELECT course_id FROM main.course WHERE session_id IN (SELECT session_id FROM temp.archive_session))",
+}
+_CREATE_TABLE_RE = re.compile(r"^CREATE TABLE (\S+)", re.IGNORECASE)
+_CREATE_INDEX_RE = re.compile(r"^CREATE (UNIQUE )?INDEX (\S+) ON", re.IGNORECASE)
+
+
+def schema_name(year: str) -> str:
+    return f"archive_{year}"
+
+
+def archive_path(archive_dir: Path, year: str) -> Path:
+    return Path(archive_dir) / f"training_{year}.db"
+
+
+def archived_years(conn: sqlite3.Connection) -> List[str]:
+    return [row[0] for row in conn.execute("SELECT year FROM main.archive_year ORDER BY year")]
+
+
+def attach_years(conn: sqlite3.Connection, archive_dir: Path, years: Iterable[str]) -> List[str]:
+    """Attach the archives among ``years`` read-only; return the schemas to query, ``main`` first."""
+    wanted = set(years)
+    attached = {row[1] for row in conn.execute("PRAGMA database_list")}
+    schemas = ["main"]
+    for year in archived_years(conn):
+        if year not in wanted:
+            continue
+        schema = schema_name(year)
+        if schema not in attached:
+            path = archive_path(archive_dir, year)
+            if not path.exists():
+                continue
+            uri = f"file:{urllib.parse.quote(str(path.resolve()))}?mode=ro"
+            conn.execute(f"ATTACH DATABASE ? AS {schema}", (uri,))
+        schemas.append(schema)
+    return schemas
+
+
+def attach_all(conn: sqlite3.Connection, archive_dir: Path) -> List[str]:
+    return attach_years(conn, archive_dir, archived_years(conn))
+
+
+def person_sql(schema: str) -> Dict[str, str]:
+    """``{"person", "person_join"}`` for ``{schema}.enrollment AS e``: the person after merges.
+
+    Only archives need the join; merging re-points enrollments in ``main``.
+    """
+    if schema == "main":
+        return {"person": "e.person_id", "person_join": ""}
+    return {
+        "person": "COALESCE(enrolled_person.merged_into, e.person_id)",
+        "person_join": "JOIN main.person AS enrolled_person ON enrolled_person.person_id = e.person_id",
+    }
+
+
+def union_all(schemas: Sequence[str], select_sql: str) -> str:
+    """``select_sql`` repeated over ``schemas`` with UNION ALL.
+
+    ``{schema}`` is replaced by each schema, and ``{person}``/``{person_join}``
+    by :func:`person_sql` for queries over ``{schema}.enrollment AS e``.
+    """
+    return "\nUNION ALL\n".join(select_sql.format(schema=schema, **person_sql(schema)) for schema in schemas)
+
+
+def select_columns(
+    conn: sqlite3.Connection,
+    schema: str,
+    table: str,
+    columns: Sequence[str],
+    alias: Optional[str] = None,
+    overrides: Optional[Dict[str, str]] = None,
+) -> str:
+    """Select list for ``columns`` of ``schema.table``; columns an older archive lacks read as NULL.
+
+    ``overrides`` maps a column to the expression selected in its place.
+    """
+    present = set(_columns(conn, schema, table))
+    prefix = alias or table
+    overrides = overrides or {}
+    return ", ".join(
+        f"{overrides[column]} AS {column}" if column in overrides
+        else f"{prefix}.{column}" if column in present
+        else f"NULL AS {column}"
+        for column in columns
+    )
+
+
+def archive_year(conn: sqlite3.Connection, archive_dir: Path, year: str) -> Dict[str, int]:
+    """Move ``year``'s sessions and everything hanging off them into its archive file.
+
+    Runs in one IMMEDIATE transaction on ``conn`` (a plain connection, not
+    the writer's): rows are copied into the archive, then deleted from the
+    hot database, so a failure leaves both unchanged. Archiving the same
+    year again appends sessions added since.
+    """
+    path = archive_path(archive_dir, year)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn.execute(f"ATTACH DATABASE ? AS {_TARGET}", (str(path),))
+    try:
+        _ensure_archive_schema(conn)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DROP TABLE IF EXISTS temp.archive_session")
+            conn.execute(
+                "CREATE TEMP TABLE archive_session AS "
+                "SELECT session_id FROM main.training_session WHERE substr(start_date, 1, 4) = ?",
+                (year,),
+            )
+            moved: Dict[str, int] = {}
+            for table in ARCHIVE_TABLES:
+                columns = ", ".join(_columns(conn, "main", table))
+                cursor = conn.execute(
+                    f"INSERT INTO {_TARGET}.{table} ({columns}) "
+                    f"SELECT {columns} FROM main.{table} WHERE {_ROW_FILTERS[table]}"
+                )
+                moved[table] = cursor.rowcount
+            for table in reversed(ARCHIVE_TABLES):
+                conn.execute(f"DELETE FROM main.{table} WHERE {_ROW_FILTERS[table]}")
+            totals = conn.execute(
+                f"SELECT (SELECT COUNT(*) FROM {_TARGET}.training_session), (SELECT COUNT(*) FROM {_TARGET}.enrollment)"
+            ).fetchone()
+            conn.execute(
+                """
+                INSERT INTO main.archive_year (year, file_name, sessions, enrollments, archived_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(year) DO UPDATE SET
+                    sessions = excluded.sessions, enrollments = excluded.enrollments, archived_at = excluded.archived_at
+                """,
+                (year, path.name, totals[0], totals[1], datetime.now().isoformat(timespec="seconds")),
+            )
+            conn.execute("DROP TABLE temp.archive_session")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.execute(f"DETACH DATABASE {_TARGET}")
+    return moved
+
+
+def _columns(conn: sqlite3.Connection, schema: str, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def _ensure_archive_schema(conn: sqlite3.Connection) -> None:
+    """Create the archived tables and their indexes with the hot schema; add columns added since."""
+    for table in ARCHIVE_TABLES:
+        sql = conn.execute(
+            "SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone()[0]
+        conn.execute(_CREATE_TABLE_RE.sub(f"CREATE TABLE IF NOT EXISTS {_TARGET}.{table}", sql, count=1))
+        existing = set(_columns(conn, _TARGET, table))
+        for row in conn.execute(f"PRAGMA main.table_info({table})").fetchall():
+            if row[1] not in existing:
+                conn.execute(f"ALTER TABLE {_TARGET}.{table} ADD COLUMN {row[1]} {row[2]}")
+    placeholders = ", ".join("?" for _ in ARCHIVE_TABLES)
+    for (sql,) in conn.execute(
+        f"SELECT sql FROM main.sqlite_master WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ({placeholders})",
+        ARCHIVE_TABLES,
+    ).fetchall():
+        conn.execute(
+            _CREATE_INDEX_RE.sub(
+                lambda match: f"CREATE {match.group(1) or ''}INDEX IF NOT EXISTS {_TARGET}.{match.group(2)} ON",
+                sql,
+                count=1,
+            )
+        )
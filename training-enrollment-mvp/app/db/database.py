@@ -2,6 +2,8 @@ import sqlite3
 from pathlib import Path
 from typing import Iterable, Optional
 
+from app.db.analytics import STAT_YEAR_INDEX, STAT_YEAR_SQL, STAT_YEAR_TRIGGERS
+
 DB_PATH = Path(__file__).resolve().parent / "training.db"
 
 SCHEMA_STATEMENTS: Iterable[str] = (
@@ -34,6 +36,7 @@ SCHEMA_STATEMENTS: Iterable[str] = (
         region_text TEXT,
         room_preference TEXT,
         remote_id_snapshot TEXT,
+        stat_year TEXT,
         FOREIGN KEY (session_id) REFERENCES training_session(session_id),
         FOREIGN KEY (person_id) REFERENCES person(person_id)
     );
@@ -56,6 +59,12 @@ def initialize_database(db_path: Optional[Path] = None) -> Path:
     try:
         for statement in SCHEMA_STATEMENTS:
             conn.execute(statement)
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(enrollment)")}
+        if "stat_year" not in columns:
+            conn.execute("ALTER TABLE enrollment ADD COLUMN stat_year TEXT")
+            conn.execute(f"UPDATE enrollment SET stat_year = {STAT_YEAR_SQL}")
+        for statement in (STAT_YEAR_INDEX,) + STAT_YEAR_TRIGGERS:
+            conn.execute(statement)
         conn.commit()
     finally:
         conn.close()
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import logging
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+WriteFn = Callable[[sqlite3.Connection], Any]
+
+_STOP = object()
+
+
+class SQLiteWriter:
+    """Runs every write on one connection owned by a background thread.
+
+    Callers submit ``fn(conn)`` and get a :class:`Future`. The thread takes the
+    first queued job, drains whatever else arrived within ``max_wait`` seconds
+    (up to ``max_batch`` jobs) and runs them in a single ``BEGIN IMMEDIATE``
+    transaction, so many small writes share one commit and one fsync.
+
+    Each job runs inside its own SAVEPOINT: a job that raises is rolled back
+    on its own and its future gets the exception, while the rest of the batch
+    still commits. Futures resolve only after COMMIT succeeds. Jobs must not
+    call ``commit()``/``rollback()`` themselves.
+
+    The connection is opened with ``isolation_level=None`` so the sqlite3
+    module never issues implicit BEGIN/COMMIT around the explicit ones here.
+
+    ``before_commit(conn)`` runs once per batch that changed any rows, inside
+    the same transaction, e.g. to bump a data-version counter.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], sqlite3.Connection],
+        max_batch: int = 64,
+        max_wait: float = 0.002,
+        logger: Optional[logging.Logger] = None,
+        before_commit: Optional[WriteFn] = None,
+    ) -> None:
+        self._connect = connect
+        self.before_commit = before_commit
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.logger = logger or logging.getLogger(__name__)
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.jobs = 0
+
+    def submit(self, fn: WriteFn) -> "Future[Any]":
+        future: "Future[Any]" = Future()
+        if self._in_writer_thread():
+            # A job that itself calls run_write() would wait on its own queue.
+            raise RuntimeError("write jobs must not submit nested write jobs")
+        self._ensure_started()
+        self._queue.put((fn, future))
+        return future
+
+    def run(self, fn: Callable[[sqlite3.Connection], T], timeout: Optional[float] = None) -> T:
+        return self.submit(fn).result(timeout)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        with self._start_lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._queue.put(_STOP)
+            thread.join(timeout)
+            self._thread = None
+
+    def _in_writer_thread(self) -> bool:
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                ready: "Future[None]" = Future()
+                thread = threading.Thread(target=self._run, args=(ready,), name="sqlite-writer", daemon=True)
+                thread.start()
+                ready.result()
+                self._thread = thread
+
+    def _run(self, ready: "Future[None]") -> None:
+        try:
+            conn = self._connect()
+            conn.isolation_level = None
+        except BaseException as exc:
+            ready.set_exception(exc)
+            return
+        ready.set_result(None)
+        try:
+            while True:
+                batch, stop = self._next_batch()
+                if batch:
+                    self._run_batch(conn, batch)
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def _next_batch(self) -> Tuple[List[Tuple[WriteFn, "Future[Any]"]], bool]:
+        item = self._queue.get()
+        if item is _STOP:
+            return [], True
+        batch = [item]
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get(timeout=self.max_wait)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run_batch(self, conn: sqlite3.Connection, batch: List[Tuple[WriteFn, "Future[Any]"]]) -> None:
+        outcomes: List[Tuple["Future[Any]", bool, Any]] = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            changes_before = conn.total_changes
+            for fn, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT write_job")
+                try:
+                    result = fn(conn)
+                except Exception as exc:
+                    conn.execute("ROLLBACK TO write_job")
+                    conn.execute("RELEASE write_job")
+                    outcomes.append((future, False, exc))
+                else:
+                    conn.execute("RELEASE write_job")
+                    outcomes.append((future, True, result))
+            if self.before_commit is not None and conn.total_changes != changes_before:
+                self.before_commit(conn)
+            conn.execute("COMMIT")
+        except BaseException as exc:
+            self.logger.exception("Write batch of %d jobs failed", len(batch))
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        self.batches += 1
+        self.jobs += len(outcomes)
+        for future, ok, value in outcomes:
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import re
+import unicodedata
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+ORG_SUFFIXES = ("有限责任公司", "股份有限公司", "有限公司", "公司", "委员会", "管理局", "中心", "集团")
+ORG_KEY_LENGTH = 4
+ORG_BITS = 128
+MAX_BLOCK_SIZE = 200
+PAIR_BATCH_SIZE = 50_000
+PHONE_WEIGHT = 0.3
+ORG_WEIGHT = 0.7
+
+_PUNCT_RE = re.compile(r"[\s\W_]+", re.UNICODE)
+
+
+@dataclass
+class PersonRecord:
+    person_id: int
+    phone_norm: str
+    name: str
+    org_text: str
+    enrollment_count: int = 0
+
+
+def normalize_name(name: Optional[str]) -> str:
+    return _PUNCT_RE.sub("", unicodedata.normalize("NFKC", name or "")).lower()
+
+
+def normalize_org(org_text: Optional[str]) -> str:
+    text = _PUNCT_RE.sub("", unicodedata.normalize("NFKC", org_text or "")).lower()
+    for suffix in ORG_SUFFIXES:
+        if text.endswith(suffix) and len(text) > len(suffix):
+            text = text[: -len(suffix)]
+            break
+    return text
+
+
+def blocking_key(record: PersonRecord) -> Optional[Tuple[str, str]]:
+    """Name plus the head of the normalised org; records without a name are not matched."""
+    name = normalize_name(record.name)
+    if not name:
+        return None
+    return name, normalize_org(record.org_text)[:ORG_KEY_LENGTH]
+
+
+def build_blocks(records: Sequence[PersonRecord]) -> Tuple[List[List[int]], int]:
+    """Group record indexes by blocking key; return blocks of 2+ and the number of oversized blocks skipped.
+
+    Oversized blocks (a very common name at an unnamed org) would bring the
+    quadratic cost back, so they are skipped rather than compared.
+    """
+    groups: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+    for index, record in enumerate(records):
+        key = blocking_key(record)
+        if key is not None:
+            groups[key].append(index)
+    blocks = [indexes for indexes in groups.values() if 2 <= len(indexes) <= MAX_BLOCK_SIZE]
+    skipped = sum(1 for indexes in groups.values() if len(indexes) > MAX_BLOCK_SIZE)
+    return blocks, skipped
+
+
+def _org_bitset(org: str) -> bytes:
+    bits = bytearray(ORG_BITS // 8)
+    grams = [org[i : i + 2] for i in range(len(org) - 1)] or ([org] if org else [])
+    for gram in grams:
+        slot = zlib.crc32(gram.encode("utf-8")) % ORG_BITS
+        bits[slot // 8] |= 1 << (slot % 8)
+    return bytes(bits)
+
+
+def build_features(records: Sequence[PersonRecord]) -> Tuple[Any, Any]:
+    """Per-record arrays: phone digits ``(n, 11)`` and org bigram bitsets ``(n, ORG_BITS / 8)``."""
+    import numpy as np
+
+    digits = np.frombuffer("".join(r.phone_norm.rjust(11, "0")[-11:] for r in records).encode("ascii"), dtype=np.uint8)
+    orgs = np.frombuffer(b"".join(_org_bitset(normalize_org(r.org_text)) for r in records), dtype=np.uint8)
+    return digits.reshape(len(records), 11), orgs.reshape(len(records), ORG_BITS // 8)
+
+
+def score_pairs(features: Tuple[Any, Any], left: Any, right: Any) -> Tuple[Any, Any, Any]:
+    """Vectorised similarity for index arrays ``left``/``right``.
+
+    Returns ``(score, phone_similarity, org_similarity)`` arrays. Phone
+    similarity is 1 - Hamming distance / 11 over the digits; org similarity
+    is the Jaccard index of hashed character bigrams of the normalised org,
+    0 when neither record has an org.
+    """
+    import numpy as np
+
+    digits, orgs = features
+    phone_similarity = 1.0 - (digits[left] != digits[right]).sum(axis=1) / 11.0
+    both = np.unpackbits(orgs[left] & orgs[right], axis=1).sum(axis=1)
+    either = np.unpackbits(orgs[left] | orgs[right], axis=1).sum(axis=1)
+    org_similarity = both / np.maximum(either, 1)
+    score = PHONE_WEIGHT * phone_similarity + ORG_WEIGHT * org_similarity
+    return score, phone_similarity, org_similarity
+
+
+def candidate_pairs(blocks: Iterable[List[int]]) -> Iterable[Tuple[List[int], List[int]]]:
+    """Yield all within-block pairs as index lists, ``PAIR_BATCH_SIZE`` at a time."""
+    left: List[int] = []
+    right: List[int] = []
+    for block in blocks:
+        for position, first in enumerate(block):
+            for second in block[position + 1 :]:
+                left.append(first)
+                right.append(second)
+                if len(left) >= PAIR_BATCH_SIZE:
+                    yield left, right
+                    left, right = [], []
+    if left:
+        yield left, right
+
+
+def find_duplicates(records: Sequence[PersonRecord], threshold: float = 0.7, limit: int = 200) -> Dict[str, Any]:
+    """Suggest merges among ``records``, best scores first.
+
+    The record with more enrollments (then the lower id) is proposed as the
+    one to keep.
+    """
+    import numpy as np
+
+    blocks, skipped = build_blocks(records)
+    features = build_features(records) if blocks else None
+    suggestions: List[Dict[str, Any]] = []
+    compared = 0
+    for left_list, right_list in candidate_pairs(blocks):
+        left = np.asarray(left_list, dtype=np.int64)
+        right = np.asarray(right_list, dtype=np.int64)
+        compared += len(left)
+        score, phone_similarity, org_similarity = score_pairs(features, left, right)
+        for position in np.nonzero(score >= threshold)[0]:
+            first, second = records[left[position]], records[right[position]]
+            keep, merge = sorted(
+                (first, second), key=lambda record: (-record.enrollment_count, record.person_id)
+            )
+            suggestions.append(
+                {
+                    "score": round(float(score[position]), 3),
+                    "phone_similarity": round(float(phone_similarity[position]), 3),
+                    "org_similarity": round(float(org_similarity[position]), 3),
+                    "keep": _describe(keep),
+                    "merge": _describe(merge),
+                }
+            )
+    suggestions.sort(key=lambda item: (-item["score"], item["keep"]["person_id"], item["merge"]["person_id"]))
+    return {
+        "people": len(records),
+        "blocks": len(blocks),
+        "oversized_blocks_skipped": skipped,
+        "pairs_compared": compared,
+        "suggestion_count": len(suggestions),
+        "suggestions": suggestions[:limit],
+    }
+
+
+def _describe(record: PersonRecord) -> Dict[str, Any]:
+    return {
+        "person_id": record.person_id,
+        "phone_norm": record.phone_norm,
+        "name": record.name,
+        "org_text": record.org_text,
+        "enrollment_count": record.enrollment_count,
+    }
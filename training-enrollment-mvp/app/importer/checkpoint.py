@@ -0,0 +1,117 @@
+"""Progress records for imports that commit in chunks.
+
+An import is identified by its kind, the uploaded file's blob key (which
+embeds the file's SHA-256, so the same bytes give the same key) and the
+target it writes into. Each committed chunk advances ``rows_done`` and the
+receipt counters in the same writer job that wrote the rows, so the record
+never claims more than the database holds. Importing the same file into the
+same target after a failure or a crash skips the first ``rows_done`` rows and
+continues from there; a completed import starts over.
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS import_checkpoint (
+    import_key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    source_file TEXT NOT NULL,
+    target_id INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    rows_done INTEGER NOT NULL DEFAULT 0,
+    sheet TEXT,
+    row_index INTEGER,
+    counters TEXT NOT NULL DEFAULT '{}',
+    error TEXT,
+    started_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+)
+"""
+
+RUNNING = "running"
+FAILED = "failed"
+DONE = "done"
+
+
+class ImportInProgress(ValueError):
+    pass
+
+
+def import_key(kind: str, source_file: str, target_id: int) -> str:
+    return f"{kind}:{target_id}:{source_file}"
+
+
+def claim(
+    conn: sqlite3.Connection, kind: str, source_file: str, target_id: int, now: str, stale_before: str
+) -> Dict[str, Any]:
+    """Start or resume an import; returns ``{"rows_done", "counters"}`` to continue from.
+
+    A ``running`` record updated after ``stale_before`` belongs to an import
+    that is still going, and raises :class:`ImportInProgress`.
+    """
+    key = import_key(kind, source_file, target_id)
+    row = conn.execute(
+        "SELECT status, rows_done, counters, updated_at FROM import_checkpoint WHERE import_key = ?", (key,)
+    ).fetchone()
+    if row is not None and row[0] == RUNNING and row[3] >= stale_before:
+        raise ImportInProgress("该文件正在导入中，请稍后再试。")
+    if row is not None and row[0] in (RUNNING, FAILED):
+        conn.execute(
+            "UPDATE import_checkpoint SET status = ?, error = NULL, updated_at = ? WHERE import_key = ?",
+            (RUNNING, now, key),
+        )
+        return {"rows_done": row[1], "counters": json.loads(row[2])}
+    conn.execute(
+        """
+        INSERT OR REPLACE INTO import_checkpoint (
+            import_key, kind, source_file, target_id, status, rows_done, counters, started_at, updated_at
+        ) VALUES (?, ?, ?, ?, ?, 0, '{}', ?, ?)
+        """,
+        (key, kind, source_file, target_id, RUNNING, now, now),
+    )
+    return {"rows_done": 0, "counters": {}}
+
+
+def advance(
+    conn: sqlite3.Connection,
+    key: str,
+    rows_done: int,
+    sheet: Optional[str],
+    row_index: Optional[int],
+    counters: Dict[str, int],
+    now: str,
+) -> None:
+    conn.execute(
+        """
+        UPDATE import_checkpoint
+        SET rows_done = ?, sheet = ?, row_index = ?, counters = ?, updated_at = ?
+        WHERE import_key = ?
+        """,
+        (rows_done, sheet, row_index, json.dumps(counters), now, key),
+    )
+
+
+def finish(conn: sqlite3.Connection, key: str, now: str) -> None:
+    conn.execute("UPDATE import_checkpoint SET status = ?, updated_at = ? WHERE import_key = ?", (DONE, now, key))
+
+
+def fail(conn: sqlite3.Connection, key: str, error: str, now: str) -> None:
+    conn.execute(
+        "UPDATE import_checkpoint SET status = ?, error = ?, updated_at = ? WHERE import_key = ?",
+        (FAILED, error[:1000], now, key),
+    )
+
+
+def unfinished(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+    rows = conn.execute(
+        """
+        SELECT kind, source_file, target_id, status, rows_done, sheet, row_index, error, started_at, updated_at
+        FROM import_checkpoint WHERE status <> ? ORDER BY updated_at DESC
+        """,
+        (DONE,),
+    ).fetchall()
+    keys = ("kind", "source_file", "target_id", "status", "rows_done", "sheet", "row_index", "error", "started_at", "updated_at")
+    return [dict(zip(keys, row)) for row in rows]
@@ -0,0 +1,92 @@
+"""Compare a revised registration workbook with what a session already holds.
+
+Every enrollment row gets ``row_hash``: a SHA-256 over the session, the
+normalized phone and the stored fields (in the form ``insert_enrollment``
+writes them: empty values as NULL). A re-upload of the same workbook
+classifies each row against the session's enrollments of the same person:
+
+* an enrollment with the same hash: ``unchanged``, nothing is written;
+* otherwise the oldest enrollment left: ``update`` it in place;
+* no enrollment left for the person: ``insert``.
+
+Preferring the matching hash keeps a person registered twice in a session
+stable when the rows swap places or only one of them changes.
+
+Enrollments written before the column existed have a NULL ``row_hash``; their
+hash is computed from the stored columns when they are compared, so they
+match without being rewritten first. Enrollments of the session that no row
+matched are returned by :meth:`EnrollmentDelta.unmatched_ids`, for callers
+that retract what the latest revision no longer lists.
+"""
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+from typing import Any, Dict, List, Optional, Tuple
+
+INSERT = "insert"
+UPDATE = "update"
+UNCHANGED = "unchanged"
+
+# Import field -> enrollment column.
+HASHED_FIELDS = (
+    ("name", "name_snapshot"),
+    ("org_text", "org_text"),
+    ("region_text", "region_text"),
+    ("title_text", "title_text"),
+    ("remote_id_snapshot", "remote_id_snapshot"),
+    ("room_preference", "room_preference"),
+)
+
+
+def _hash_value(value: Any) -> str:
+    # Mirrors ``fields.get(name) or None`` in insert_enrollment.
+    return str(value).strip() if value else ""
+
+
+def row_hash(session_id: int, phone_norm: str, fields: Dict[str, Any]) -> str:
+    values = [str(session_id), phone_norm] + [_hash_value(fields.get(field)) for field, _ in HASHED_FIELDS]
+    return hashlib.sha256("\x1f".join(values).encode("utf-8")).hexdigest()
+
+
+class EnrollmentDelta:
+    def __init__(self, session_id: int) -> None:
+        self.session_id = session_id
+        # person_id -> [(enrollment_id, row_hash or None, stored fields)], oldest first.
+        self.existing: Optional[Dict[int, List[Tuple[int, Optional[str], Dict[str, Any]]]]] = None
+
+    def load(self, conn: sqlite3.Connection) -> None:
+        columns = ", ".join(column for _, column in HASHED_FIELDS)
+        rows = conn.execute(
+            f"""
+            SELECT enrollment_id, person_id, row_hash, {columns}
+            FROM enrollment WHERE session_id = ?
+            ORDER BY enrollment_id
+            """,
+            (self.session_id,),
+        ).fetchall()
+        existing: Dict[int, List[Tuple[int, Optional[str], Dict[str, Any]]]] = {}
+        for row in rows:
+            stored = {field: row[3 + index] for index, (field, _) in enumerate(HASHED_FIELDS)}
+            existing.setdefault(row[1], []).append((row[0], row[2], stored))
+        self.existing = existing
+
+    def match(
+        self, person_id: Optional[int], phone_norm: str, fields: Dict[str, Any]
+    ) -> Tuple[str, Optional[int], str]:
+        """``(action, enrollment_id, row_hash)`` for one row; consumes the matched enrollment."""
+        digest = row_hash(self.session_id, phone_norm, fields)
+        candidates = self.existing.get(person_id) if person_id is not None else None
+        if not candidates:
+            return INSERT, None, digest
+        for index, (enrollment_id, stored_hash, stored) in enumerate(candidates):
+            if stored_hash is None:
+                stored_hash = row_hash(self.session_id, phone_norm, stored)
+            if stored_hash == digest:
+                del candidates[index]
+                return UNCHANGED, enrollment_id, digest
+        enrollment_id = candidates.pop(0)[0]
+        return UPDATE, enrollment_id, digest
+
+    def unmatched_ids(self) -> List[int]:
+        return [entry[0] for entries in self.existing.values() for entry in entries]
@@ -1,13 +1,12 @@
 from __future__ import annotations
 
-import csv
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Dict, Iterable, Optional
 
-import pandas as pd
-
+from app.db.analytics import STAT_YEAR_SQL
 from app.db.database import get_connection
+from app.importer import readers
 from app.importer.phone import PhoneNormalizationError, normalize_phone
 
 
@@ -40,30 +39,9 @@ def _normalize_columns(columns: Iterable[str]) -> Dict[str, str]:
         normalized = str(column).strip()
         lowered = normalized.lower()
         for key, aliases in COLUMN_ALIASES.items():
-            if normalized in aliases or lowered in aliases:
-                mapping[key] = column
-    return mapping
-
-
-def _read_value(row: pd.Series, mapping: Dict[str, str], key: str) -> Optional[str]:
-    column = mapping.get(key)
-    if column is None:
-        return None
-    value = row.get(column)
-    if pd.isna(value):
-        return None
-    return str(value).strip()
-
-
-def import_enrollments(excel_path: Path, session_id: int) -> ImportStats:
-    excel_path = Path(excel_path)
-    if not excel_path.exists():
-        raise FileNotFoundError(excel_path)
-
-    dataframes = _load_dataframes(excel_path)
             lowered_aliases = {alias.lower() for alias in aliases}
             if normalized in aliases or lowered in lowered_aliases:
-                mapping[key] = normalized
+                mapping[key] = column
     return mapping
 
 
@@ -84,15 +62,6 @@ def import_enrollments(data_path: Path, session_id: int) -> ImportStats:
     imported_rows = 0
 
     with get_connection() as conn:
-        for sheet_name, dataframe in dataframes.items():
-            if dataframe.empty:
-                continue
-            dataframe = dataframe.dropna(axis=0, how="all")
-            if dataframe.empty:
-                continue
-            mapping = _normalize_columns(dataframe.columns)
-
-            for _, row in dataframe.iterrows():
         for sheet_name, rows in rows_by_sheet.items():
             if not rows:
                 continue
@@ -142,43 +111,24 @@ def import_enrollments(data_path: Path, session_id: int) -> ImportStats:
                     ),
                 )
                 imported_rows += 1
+        conn.execute(
+            f"UPDATE enrollment SET stat_year = {STAT_YEAR_SQL} WHERE session_id = ? AND stat_year IS NULL",
+            (session_id,),
+        )
         conn.commit()
 
     return ImportStats(total_rows=total_rows, imported_rows=imported_rows)
 
 
-def _load_dataframes(source_path: Path) -> Dict[str, pd.DataFrame]:
-    suffix = source_path.suffix.lower()
-    if suffix == ".csv":
-        dataframe = pd.read_csv(source_path)
-        return {"csv": dataframe}
-    return pd.read_excel(source_path, sheet_name=None)
 def _load_rows(source_path: Path) -> Dict[str, list[Dict[str, object]]]:
     suffix = source_path.suffix.lower()
-    if suffix == ".csv":
-        with source_path.open("r", encoding="utf-8-sig", newline="") as csv_file:
-            reader = csv.DictReader(csv_file)
-            return {"csv": [dict(row) for row in reader]}
-
-    if suffix in {".xlsx", ".xls"}:
-        try:
-            import pandas as pd
-        except ModuleNotFoundError as exc:
-            raise ModuleNotFoundError(
-                "Importing Excel requires pandas/openpyxl. Please install them or use CSV input."
-            ) from exc
-
-        dataframes = pd.read_excel(source_path, sheet_name=None)
-        rows_by_sheet: Dict[str, list[Dict[str, object]]] = {}
-        for sheet_name, dataframe in dataframes.items():
-            if dataframe.empty:
-                rows_by_sheet[sheet_name] = []
-                continue
-            dataframe = dataframe.dropna(axis=0, how="all")
-            rows_by_sheet[sheet_name] = dataframe.to_dict(orient="records")
-        return rows_by_sheet
+    if suffix not in readers.CSV_SUFFIXES | {".xlsx", ".xls"}:
+        raise ValueError("Only CSV and Excel files (.csv/.xlsx/.xls) are supported.")
 
-    raise ValueError("Only CSV and Excel files (.csv/.xlsx/.xls) are supported.")
+    rows_by_sheet: Dict[str, list[Dict[str, object]]] = {}
+    for sheet_name, sheet in readers.read_workbook(source_path).items():
+        rows_by_sheet[sheet_name] = [dict(zip(sheet.columns, row)) for row in sheet.rows]
+    return rows_by_sheet
 
 
 def _get_or_create_person(
@@ -0,0 +1,184 @@
+"""Spreadsheet readers behind one interface.
+
+``read_workbook(path)`` returns every sheet as a :class:`Sheet` whose header
+and cell values are plain strings ("" for empty cells), whatever backend read
+it. Backends:
+
+* ``calamine`` - python-calamine (Rust); reads .xlsx/.xlsm/.xls, optional.
+* ``openpyxl`` - openpyxl in read-only, values-only mode.
+* ``pandas``   - ``pandas.read_excel``, the original code path, kept for
+  comparison in benchmarks.
+
+``.csv`` files always take the csv module fast path. The Excel backend is
+chosen by ``TRAINING_EXCEL_READER`` (a backend name, or ``auto`` for the
+fastest installed one in ``AUTO_ORDER``); ``benchmarks.readers`` measures
+the backends and reports which one ``auto`` should prefer.
+"""
+from __future__ import annotations
+
+import csv
+import importlib.util
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+CSV_SUFFIXES = {".csv"}
+XLS_SUFFIXES = {".xls"}
+
+# Fastest first, as measured by ``python -m benchmarks.readers``.
+AUTO_ORDER = ("calamine", "openpyxl", "pandas")
+
+
+@dataclass
+class Sheet:
+    name: str
+    columns: List[str]
+    rows: List[Tuple[str, ...]]
+
+
+def cell_text(value: Any) -> str:
+    """Render a cell the way ``read_excel(dtype=str)`` did: integral floats without ``.0``."""
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, float):
+        if value != value:
+            return ""
+        if value.is_integer():
+            return str(int(value))
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, date):
+        return value.isoformat() + " 00:00:00"
+    if isinstance(value, time):
+        return value.isoformat()
+    return str(value)
+
+
+def unique_columns(header: Sequence[Any]) -> List[str]:
+    """Header cells as names; blanks become ``Unnamed: i`` and repeats get ``.1``, ``.2`` like pandas."""
+    columns: List[str] = []
+    seen: Dict[str, int] = {}
+    for index, value in enumerate(header):
+        name = cell_text(value) or f"Unnamed: {index}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return columns
+
+
+def build_sheet(name: str, raw_rows: Sequence[Sequence[Any]]) -> Sheet:
+    """Turn raw cell rows into a :class:`Sheet`; the first row is the header.
+
+    Rows are padded or cut to the header width and trailing blank rows are
+    dropped, so row ``i`` is spreadsheet line ``i + 2`` for every backend.
+    """
+    if not raw_rows:
+        return Sheet(name, [], [])
+    width = max(len(row) for row in raw_rows)
+    header = list(raw_rows[0]) + [None] * (width - len(raw_rows[0]))
+    columns = unique_columns(header)
+    rows: List[Tuple[str, ...]] = []
+    blank = ("",) * width
+    for raw in raw_rows[1:]:
+        row = tuple(cell_text(value) for value in raw[:width])
+        if len(row) < width:
+            row += ("",) * (width - len(row))
+        rows.append(row)
+    while rows and rows[-1] == blank:
+        rows.pop()
+    return Sheet(name, columns, rows)
+
+
+def read_calamine(path: Path) -> Dict[str, Sheet]:
+    from python_calamine import CalamineWorkbook
+
+    workbook = CalamineWorkbook.from_path(str(path))
+    return {
+        name: build_sheet(name, workbook.get_sheet_by_name(name).to_python(skip_empty_area=False))
+        for name in workbook.sheet_names
+    }
+
+
+def read_openpyxl(path: Path) -> Dict[str, Sheet]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        return {
+            worksheet.title: build_sheet(worksheet.title, list(worksheet.iter_rows(values_only=True)))
+            for worksheet in workbook.worksheets
+        }
+    finally:
+        workbook.close()
+
+
+def read_pandas(path: Path) -> Dict[str, Sheet]:
+    import pandas as pd
+
+    frames = pd.read_excel(path, sheet_name=None, header=None, dtype=object, engine="openpyxl")
+    return {
+        str(name): build_sheet(str(name), list(frame.itertuples(index=False, name=None)))
+        for name, frame in frames.items()
+    }
+
+
+def read_csv(path: Path) -> Dict[str, Sheet]:
+    with open(path, "r", encoding="utf-8-sig", errors="replace", newline="") as handle:
+        sample = handle.read(4096)
+        handle.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",\t;")
+        except csv.Error:
+            dialect = csv.excel
+        rows = list(csv.reader(handle, dialect))
+    return {"csv": build_sheet("csv", rows)}
+
+
+BACKENDS: Dict[str, Tuple[str, Callable[[Path], Dict[str, Sheet]]]] = {
+    "calamine": ("python_calamine", read_calamine),
+    "openpyxl": ("openpyxl", read_openpyxl),
+    "pandas": ("pandas", read_pandas),
+}
+
+
+def available_backends() -> List[str]:
+    return [name for name, (module, _) in BACKENDS.items() if importlib.util.find_spec(module) is not None]
+
+
+def resolve_backend(path: Path, backend: Optional[str] = None) -> str:
+    """Backend name used for ``path``: ``csv``, the requested one, or the first available in ``AUTO_ORDER``."""
+    if Path(path).suffix.lower() in CSV_SUFFIXES:
+        return "csv"
+    requested = (backend or os.environ.get("TRAINING_EXCEL_READER", "auto")).strip().lower()
+    installed = available_backends()
+    if requested != "auto":
+        if requested not in BACKENDS:
+            raise ValueError(f"未知的 Excel 读取方式：{requested}（可选 {', '.join(BACKENDS)} 或 auto）")
+        if requested not in installed:
+            raise ValueError(f"Excel 读取方式 {requested} 需要安装 {BACKENDS[requested][0]}")
+        return requested
+    candidates = [name for name in AUTO_ORDER if name in installed]
+    if Path(path).suffix.lower() in XLS_SUFFIXES:
+        # openpyxl (and pandas through it) cannot open the old binary format.
+        candidates = [name for name in candidates if name == "calamine"]
+        if not candidates:
+            raise ValueError("读取 .xls 文件需要安装 python-calamine，或另存为 .xlsx 后再导入。")
+    if not candidates:
+        raise ValueError("未安装可用的 Excel 读取库（python-calamine 或 openpyxl）。")
+    return candidates[0]
+
+
+def read_workbook(path: Any, backend: Optional[str] = None) -> Dict[str, Sheet]:
+    path = Path(path)
+    name = resolve_backend(path, backend)
+    if name == "csv":
+        return read_csv(path)
+    return BACKENDS[name][1](path)
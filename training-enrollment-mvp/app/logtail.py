@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import logging
+import os
+import zlib
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Tuple
+
+BLOCK_SIZE = 64 * 1024
+IDENTITY_BYTES = 256
+
+LinePredicate = Callable[[str], bool]
+
+
+def rotated_files(log_path: Path, backup_count: int) -> List[Path]:
+    """Return the log file and its RotatingFileHandler backups, newest first."""
+    files = [log_path]
+    files.extend(Path(f"{log_path}.{index}") for index in range(1, backup_count + 1))
+    return [path for path in files if path.exists()]
+
+
+def build_predicate(level: Optional[str] = None, keyword: Optional[str] = None) -> Optional[LinePredicate]:
+    """Build a line filter for a minimum level name and/or a keyword.
+
+    Lines are matched on the ``[LEVEL]`` marker written by the app's formatter,
+    so traceback continuation lines are dropped when a level is requested.
+    """
+    markers: Optional[Tuple[str, ...]] = None
+    if level:
+        threshold = logging.getLevelName(level.upper())
+        if not isinstance(threshold, int):
+            raise ValueError(f"Unknown log level: {level}")
+        markers = tuple(
+            f"[{name}]"
+            for name in ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+            if logging.getLevelName(name) >= threshold
+        )
+    needle = keyword.lower() if keyword else None
+    if markers is None and needle is None:
+        return None
+
+    def predicate(line: str) -> bool:
+        if markers is not None and not any(marker in line for marker in markers):
+            return False
+        if needle is not None and needle not in line.lower():
+            return False
+        return True
+
+    return predicate
+
+
+def _reverse_lines(path: Path, end: Optional[int] = None) -> Iterator[str]:
+    with path.open("rb") as handle:
+        position = handle.seek(0, os.SEEK_END) if end is None else end
+        remainder = b""
+        while position > 0:
+            step = min(BLOCK_SIZE, position)
+            position -= step
+            handle.seek(position)
+            chunk = handle.read(step) + remainder
+            parts = chunk.split(b"\n")
+            remainder = parts[0]
+            for part in reversed(parts[1:]):
+                if part:
+                    yield part.decode("utf-8", errors="replace").rstrip("\r")
+        if remainder:
+            yield remainder.decode("utf-8", errors="replace").rstrip("\r")
+
+
+def tail(
+    log_path: Path,
+    backup_count: int,
+    limit: int,
+    predicate: Optional[LinePredicate] = None,
+) -> Tuple[List[str], int]:
+    """Return the last ``limit`` matching lines and a cursor for :func:`read_since`.
+
+    The current file is read backwards block by block and the rotated backups are
+    only opened when the current file does not hold enough matching lines.
+    """
+    lines: List[str] = []
+    size = _complete_size(log_path)
+    cursor = _format_cursor(log_path, size)
+    for index, path in enumerate(rotated_files(log_path, backup_count)):
+        end = size if index == 0 and path == log_path else None
+        for line in _reverse_lines(path, end):
+            if predicate is None or predicate(line):
+                lines.append(line)
+                if len(lines) >= limit:
+                    lines.reverse()
+                    return lines, cursor
+    lines.reverse()
+    return lines, cursor
+
+
+def read_since(
+    log_path: Path,
+    backup_count: int,
+    cursor: str,
+    limit: int,
+    predicate: Optional[LinePredicate] = None,
+) -> Tuple[List[str], str]:
+    """Return lines appended after ``cursor`` (``<file identity>:<byte offset>``).
+
+    The identity is the file's inode plus a checksum of its first line, so a
+    rotation is noticed even when the new file has already grown past the old
+    offset. The cursor's file is then looked up among the backups: its unread
+    tail and any newer backups are returned before the new file. When the
+    file rotated out of reach, the new file is read from the start.
+    """
+    identity, offset = parse_cursor(cursor)
+    size = _complete_size(log_path)
+    if _identity(log_path) == identity:
+        lines = _read_forward(log_path, offset, size)
+    else:
+        backups = rotated_files(log_path, backup_count)[1:] if backup_count else []
+        lines = []
+        for index, path in enumerate(backups):
+            if _identity(path) == identity:
+                lines.extend(_read_forward(path, offset, None))
+                for newer in reversed(backups[:index]):
+                    lines.extend(_read_forward(newer, 0, None))
+                break
+        lines.extend(_read_forward(log_path, 0, size))
+    if predicate is not None:
+        lines = [line for line in lines if predicate(line)]
+    return lines[-limit:], _format_cursor(log_path, size)
+
+
+def parse_cursor(cursor: str) -> Tuple[str, int]:
+    """Split a cursor from :func:`tail`/:func:`read_since`; raises ValueError when malformed."""
+    identity, separator, offset = cursor.rpartition(":")
+    if not separator or not identity or not offset.isdigit():
+        raise ValueError(f"Invalid log cursor: {cursor}")
+    return identity, int(offset)
+
+
+def _format_cursor(path: Path, offset: int) -> str:
+    return f"{_identity(path)}:{offset}"
+
+
+def _identity(path: Path) -> str:
+    """Inode and CRC-32 of the first bytes of ``path``; ``"-"`` when it does not exist.
+
+    The inode follows the file through the rename to ``.1``; the checksum
+    tells a new file apart from a deleted one whose inode was reused.
+    """
+    try:
+        with path.open("rb") as handle:
+            inode = os.fstat(handle.fileno()).st_ino
+            head = handle.read(IDENTITY_BYTES)
+    except FileNotFoundError:
+        return "-"
+    newline = head.find(b"\n")
+    if newline != -1:
+        head = head[: newline + 1]
+    elif len(head) < IDENTITY_BYTES:
+        head = b""  # the first line is still being written
+    return f"{inode:x}-{zlib.crc32(head):08x}"
+
+
+def _complete_size(path: Path) -> int:
+    """Size of ``path`` up to its last newline, ignoring a half-written line."""
+    if not path.exists():
+        return 0
+    with path.open("rb") as handle:
+        size = handle.seek(0, os.SEEK_END)
+        position = size
+        while position > 0:
+            step = min(BLOCK_SIZE, position)
+            handle.seek(position - step)
+            chunk = handle.read(step)
+            newline = chunk.rfind(b"\n")
+            if newline != -1:
+                return position - step + newline + 1
+            position -= step
+    return 0
+
+
+def _read_forward(path: Path, start: int, end: Optional[int]) -> List[str]:
+    if not path.exists():
+        return []
+    with path.open("rb") as handle:
+        if end is None:
+            end = handle.seek(0, os.SEEK_END)
+        if start >= end:
+            return []
+        handle.seek(start)
+        data = handle.read(end - start)
+    return [
+        line.decode("utf-8", errors="replace").rstrip("\r")
+        for line in data.split(b"\n")
+        if line
+    ]
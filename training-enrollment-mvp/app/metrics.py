@@ -0,0 +1,321 @@
+from __future__ import annotations
+
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+LATENCY_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PROGRESS_STEPS = 1000
+
+_SQL_TOKEN_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_.]*")
+_OBJECT_KINDS = {"TABLE", "INDEX", "TRIGGER", "VIEW"}
+
+
+class Histogram:
+    def __init__(self, buckets: Iterable[float] = LATENCY_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        index = len(self.buckets)
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = position
+                break
+        self.counts[index] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """In-process counters for HTTP requests and SQL statements.
+
+    All mutation happens under one lock; observations are a handful of integer
+    updates so the lock is held only briefly even under many worker threads.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.request_latency: Dict[Tuple[str, str], Histogram] = {}
+        self.request_status: Dict[Tuple[str, str, int], int] = defaultdict(int)
+        self.sql_latency: Dict[str, Histogram] = {}
+        self.sql_rows: Dict[str, int] = defaultdict(int)
+        self.sql_vm_steps: Dict[str, int] = defaultdict(int)
+        self.sql_traced: Dict[str, int] = defaultdict(int)
+        self.slow_queries = 0
+
+    def request_started(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+
+    def request_finished(self, method: str, route: str, status: int, seconds: float) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            histogram = self.request_latency.get((method, route))
+            if histogram is None:
+                histogram = self.request_latency[(method, route)] = Histogram()
+            histogram.observe(seconds)
+            self.request_status[(method, route, status)] += 1
+
+    def statement_finished(self, label: str, seconds: float, rows: int, vm_steps: int, slow: bool) -> None:
+        with self._lock:
+            histogram = self.sql_latency.get(label)
+            if histogram is None:
+                histogram = self.sql_latency[label] = Histogram()
+            histogram.observe(seconds)
+            self.sql_rows[label] += max(rows, 0)
+            self.sql_vm_steps[label] += vm_steps
+            if slow:
+                self.slow_queries += 1
+
+    def statement_traced(self, label: str) -> None:
+        with self._lock:
+            self.sql_traced[label] += 1
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            lines: List[str] = [
+                "# HELP http_requests_in_flight Requests currently being served.",
+                "# TYPE http_requests_in_flight gauge",
+                f"http_requests_in_flight {self.in_flight}",
+            ]
+            lines.extend(
+                _render_histogram(
+                    "http_request_duration_seconds",
+                    "Request latency by route.",
+                    {
+                        f'method="{_escape(method)}",route="{_escape(route)}"': histogram
+                        for (method, route), histogram in sorted(self.request_latency.items())
+                    },
+                )
+            )
+            lines.append("# HELP http_responses_total Responses by route and status code.")
+            lines.append("# TYPE http_responses_total counter")
+            for (method, route, status), count in sorted(self.request_status.items()):
+                lines.append(
+                    f'http_responses_total{{method="{_escape(method)}",route="{_escape(route)}",status="{status}"}} {count}'
+                )
+            lines.extend(
+                _render_histogram(
+                    "sqlite_statement_duration_seconds",
+                    "Statement time including row fetching, by statement kind and table.",
+                    {f'statement="{_escape(label)}"': histogram for label, histogram in sorted(self.sql_latency.items())},
+                )
+            )
+            for name, help_text, values in (
+                ("sqlite_statement_rows_total", "Rows returned or changed.", self.sql_rows),
+                ("sqlite_statement_vm_steps_total", "Approximate VDBE steps, sampled by the progress handler.", self.sql_vm_steps),
+                ("sqlite_traced_statements_total", "Statements started, including trigger programs.", self.sql_traced),
+            ):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for label, value in sorted(values.items()):
+                    lines.append(f'{name}{{statement="{_escape(label)}"}} {value}')
+            lines.append("# HELP sqlite_slow_statements_total Statements slower than the slow-query threshold.")
+            lines.append("# TYPE sqlite_slow_statements_total counter")
+            lines.append(f"sqlite_slow_statements_total {self.slow_queries}")
+        return "\n".join(lines) + "\n"
+
+
+def _render_histogram(name: str, help_text: str, series: Dict[str, Histogram]) -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for labels, histogram in series.items():
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.total:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+    return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+@lru_cache(maxsize=1024)
+def statement_label(sql: str) -> str:
+    """Collapse a statement to ``VERB table`` so metric cardinality stays bounded.
+
+    Cached because the app reuses a small set of statement strings and this
+    runs for every execute. Only pass SQL as given to ``execute``: traced SQL
+    has the bound values inlined, so nearly every string is a cache miss.
+    """
+    tokens = _SQL_TOKEN_RE.findall(sql[:2000])
+    if not tokens:
+        return "OTHER"
+    verb = tokens[0].upper()
+    upper = [token.upper() for token in tokens]
+    table: Optional[str] = None
+    if verb in {"CREATE", "DROP", "ALTER"}:
+        kind = next((token for token in upper[1:4] if token in _OBJECT_KINDS), None)
+        return f"{verb} {kind}" if kind else verb
+    if verb == "UPDATE":
+        rest = tokens[1:]
+        if len(rest) >= 2 and rest[0].upper() == "OR":
+            rest = rest[2:]
+        table = rest[0] if rest else None
+    elif verb in {"INSERT", "REPLACE"} and "INTO" in upper:
+        index = upper.index("INTO") + 1
+        table = tokens[index] if index < len(tokens) else None
+    elif verb in {"SELECT", "DELETE", "WITH"} and "FROM" in upper:
+        index = upper.index("FROM") + 1
+        table = tokens[index] if index < len(tokens) else None
+    return f"{verb} {table}" if table else verb
+
+
+REGISTRY = MetricsRegistry()
+
+
+class _Settings:
+    slow_query_seconds: float = 0.2
+    logger: Optional[logging.Logger] = None
+    trace_statements: bool = False
+
+
+SETTINGS = _Settings()
+
+
+def configure(slow_query_ms: float, logger: logging.Logger, trace_statements: bool = False) -> None:
+    SETTINGS.slow_query_seconds = slow_query_ms / 1000.0
+    SETTINGS.logger = logger
+    SETTINGS.trace_statements = trace_statements
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times each statement from ``execute`` until its rows are consumed.
+
+    A statement is finalised when the cursor runs another statement, when a
+    fetch call drains or samples its rows, or when it is closed. Iterating the
+    cursor directly is not timed beyond the ``execute`` call.
+    """
+
+    def __init__(self, connection: "InstrumentedConnection") -> None:
+        super().__init__(connection)
+        self._sql: Optional[str] = None
+        self._elapsed = 0.0
+        self._rows = 0
+        self._steps_start = 0
+
+    def execute(self, sql: str, parameters: Any = ()) -> "InstrumentedCursor":
+        self._finish()
+        return self._timed(sql, super().execute, sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters: Any) -> "InstrumentedCursor":
+        self._finish()
+        return self._timed(sql, super().executemany, sql, seq_of_parameters)
+
+    def executescript(self, sql_script: str) -> "InstrumentedCursor":
+        self._finish()
+        return self._timed(sql_script, super().executescript, sql_script)
+
+    def fetchone(self) -> Any:
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._elapsed += time.perf_counter() - started
+        self._rows += 0 if row is None else 1
+        self._finish()
+        return row
+
+    def fetchmany(self, size: Optional[int] = None) -> List[Any]:
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._elapsed += time.perf_counter() - started
+        self._rows += len(rows)
+        if len(rows) < (self.arraysize if size is None else size):
+            self._finish()
+        return rows
+
+    def fetchall(self) -> List[Any]:
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._elapsed += time.perf_counter() - started
+        self._rows += len(rows)
+        self._finish()
+        return rows
+
+    def close(self) -> None:
+        self._finish()
+        super().close()
+
+    def _timed(self, sql: str, method: Callable[..., Any], *args: Any) -> "InstrumentedCursor":
+        connection: InstrumentedConnection = self.connection  # type: ignore[assignment]
+        self._sql = sql
+        self._rows = 0
+        self._steps_start = connection.vm_steps
+        started = time.perf_counter()
+        try:
+            method(*args)
+        finally:
+            self._elapsed = time.perf_counter() - started
+        if self.description is None:
+            self._rows = self.rowcount
+            self._finish()
+        return self
+
+    def _finish(self) -> None:
+        if self._sql is None:
+            return
+        sql, self._sql = self._sql, None
+        connection: InstrumentedConnection = self.connection  # type: ignore[assignment]
+        steps = (connection.vm_steps - self._steps_start) * PROGRESS_STEPS
+        slow = self._elapsed >= SETTINGS.slow_query_seconds
+        label = statement_label(sql)
+        REGISTRY.statement_finished(label, self._elapsed, self._rows, steps, slow)
+        if slow and SETTINGS.logger is not None:
+            SETTINGS.logger.warning(
+                "Slow SQL %.1fms rows=%d steps~%d: %s",
+                self._elapsed * 1000,
+                self._rows,
+                steps,
+                " ".join(sql.split())[:500],
+            )
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection that hands out :class:`InstrumentedCursor` and counts VM work.
+
+    The progress handler samples every ``PROGRESS_STEPS`` VDBE instructions.
+    With ``trace_statements`` configured, a trace callback also counts every
+    statement SQLite starts, including trigger programs, which SQLite reports
+    under the statement that fired them. The callback receives the SQL with
+    its bound values expanded, so labelling it costs a regex pass per row
+    written; it is off unless asked for.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.vm_steps = 0
+        self.set_progress_handler(self._on_progress, PROGRESS_STEPS)
+        if SETTINGS.trace_statements:
+            self.set_trace_callback(self._on_trace)
+
+    def cursor(self, factory: Any = None) -> sqlite3.Cursor:  # type: ignore[override]
+        return super().cursor(factory or InstrumentedCursor)
+
+    # sqlite3.Connection.execute* run the statement on the C cursor directly,
+    # bypassing overridden cursor methods, so route them through cursor().
+    def execute(self, sql: str, parameters: Any = ()) -> sqlite3.Cursor:  # type: ignore[override]
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters: Any) -> sqlite3.Cursor:  # type: ignore[override]
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script: str) -> sqlite3.Cursor:  # type: ignore[override]
+        return self.cursor().executescript(sql_script)
+
+    def _on_progress(self) -> int:
+        self.vm_steps += 1
+        return 0
+
+    def _on_trace(self, sql: str) -> None:
+        REGISTRY.statement_traced(statement_label(sql))
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import cProfile
+import re
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+PROFILE_NAME_RE = re.compile(r"^[0-9]{8}-[0-9]{6}-[0-9]{6}_[A-Z]+_[A-Za-z0-9_.-]*_[0-9]+ms\.pstats$")
+
+
+class RequestProfiler:
+    """Wraps single requests in cProfile and keeps the newest ``keep`` dumps.
+
+    Only one request is profiled at a time: cProfile installs a profiler hook
+    that newer Pythons refuse to stack, and concurrent profiles would skew each
+    other anyway. Requests that ask while another profile runs are served
+    normally.
+    """
+
+    def __init__(self, directory: Path, keep: int = 50) -> None:
+        self.directory = directory
+        self.keep = keep
+        self._busy = threading.Lock()
+
+    def start(self) -> Optional[cProfile.Profile]:
+        if not self._busy.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except Exception:
+            self._busy.release()
+            raise
+        return profile
+
+    def stop(self, profile: cProfile.Profile, method: str, route: str, seconds: float) -> Path:
+        try:
+            profile.disable()
+            self.directory.mkdir(parents=True, exist_ok=True)
+            timestamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+            slug = re.sub(r"[^A-Za-z0-9_.-]+", "-", route).strip("-") or "root"
+            path = self.directory / f"{timestamp}_{method.upper()}_{slug}_{int(seconds * 1000)}ms.pstats"
+            profile.dump_stats(str(path))
+        finally:
+            self._busy.release()
+        self._prune()
+        return path
+
+    def list_profiles(self, limit: int = 50) -> List[Dict[str, Any]]:
+        if not self.directory.exists():
+            return []
+        entries = sorted(
+            (path for path in self.directory.iterdir() if PROFILE_NAME_RE.match(path.name)),
+            key=lambda path: path.name,
+            reverse=True,
+        )
+        return [
+            {"name": path.name, "size": path.stat().st_size}
+            for path in entries[:limit]
+        ]
+
+    def resolve(self, name: str) -> Optional[Path]:
+        if not PROFILE_NAME_RE.match(name):
+            return None
+        path = self.directory / name
+        return path if path.is_file() else None
+
+    def _prune(self) -> None:
+        profiles = sorted(
+            (path for path in self.directory.iterdir() if PROFILE_NAME_RE.match(path.name)),
+            key=lambda path: path.name,
+        )
+        for path in profiles[: max(0, len(profiles) - self.keep)]:
+            path.unlink(missing_ok=True)
@@ -0,0 +1,159 @@
+"""What an import or export cost: wall time per phase, memory and throughput.
+
+A :class:`RunUsage` is created when the run starts; code times its phases
+with ``with usage.phase("read"):`` (or :meth:`RunUsage.add` for time
+measured elsewhere), counts the rows it processed in ``rows``, and
+:meth:`RunUsage.finish` returns the summary that is stored in
+``import_run`` and returned in the receipt.
+
+Peak RSS comes from ``resource.getrusage`` and is the process high-water
+mark, so it only grows when a run needs more memory than any earlier one; it
+is None where ``resource`` is unavailable (Windows). Setting
+``TRAINING_IMPORT_TRACEMALLOC=1`` also records the peak of Python
+allocations during the run with ``tracemalloc``; that slows allocation-heavy
+code noticeably and overlapping runs share one peak, so it is off by default.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+TRACEMALLOC_ENABLED = os.environ.get("TRAINING_IMPORT_TRACEMALLOC", "0") == "1"
+
+SCHEMA_STATEMENTS = (
+    """
+    CREATE TABLE IF NOT EXISTS import_run (
+        run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        source_file TEXT,
+        target_id INTEGER,
+        dry_run INTEGER NOT NULL DEFAULT 0,
+        status TEXT NOT NULL,
+        rows INTEGER NOT NULL DEFAULT 0,
+        seconds REAL NOT NULL,
+        rows_per_second REAL,
+        phases TEXT NOT NULL DEFAULT '{}',
+        peak_rss_kb INTEGER,
+        python_peak_kb INTEGER,
+        error TEXT,
+        started_at TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_import_run_kind ON import_run(kind, run_id)",
+)
+
+
+def peak_rss_kb() -> Optional[int]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return int(peak / 1024) if sys.platform == "darwin" else int(peak)
+
+
+class RunUsage:
+    def __init__(self, kind: str, source_file: str = "", target_id: int = 0, dry_run: bool = False) -> None:
+        self.kind = kind
+        self.source_file = source_file
+        self.target_id = target_id
+        self.dry_run = dry_run
+        self.phases: Dict[str, float] = {}
+        self.rows = 0
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self._started = time.perf_counter()
+        self._tracing = TRACEMALLOC_ENABLED and not tracemalloc.is_tracing()
+        if self._tracing:
+            tracemalloc.start()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def finish(self, error: Optional[str] = None) -> Dict[str, Any]:
+        seconds = time.perf_counter() - self._started
+        python_peak_kb = None
+        if self._tracing:
+            python_peak_kb = tracemalloc.get_traced_memory()[1] // 1024
+            tracemalloc.stop()
+            self._tracing = False
+        return {
+            "kind": self.kind,
+            "source_file": self.source_file,
+            "target_id": self.target_id,
+            "dry_run": self.dry_run,
+            "status": "failed" if error else "ok",
+            "rows": self.rows,
+            "seconds": round(seconds, 4),
+            "rows_per_second": round(self.rows / seconds, 1) if seconds > 0 else None,
+            "phases": {name: round(value, 4) for name, value in self.phases.items()},
+            "peak_rss_kb": peak_rss_kb(),
+            "python_peak_kb": python_peak_kb,
+            "error": error,
+            "started_at": self.started_at,
+        }
+
+
+def record(conn: sqlite3.Connection, summary: Dict[str, Any]) -> int:
+    cursor = conn.execute(
+        """
+        INSERT INTO import_run (
+            kind, source_file, target_id, dry_run, status, rows, seconds, rows_per_second,
+            phases, peak_rss_kb, python_peak_kb, error, started_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            summary["kind"], summary["source_file"], summary["target_id"], int(summary["dry_run"]),
+            summary["status"], summary["rows"], summary["seconds"], summary["rows_per_second"],
+            json.dumps(summary["phases"]), summary["peak_rss_kb"], summary["python_peak_kb"],
+            (summary["error"] or "")[:1000] or None, summary["started_at"],
+        ),
+    )
+    return cursor.lastrowid
+
+
+def history(
+    conn: sqlite3.Connection, kind: Optional[str] = None, limit: int = 50, before_id: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """Recorded runs, newest first."""
+    conditions: List[str] = []
+    params: List[Any] = []
+    if kind:
+        conditions.append("kind = ?")
+        params.append(kind)
+    if before_id is not None:
+        conditions.append("run_id < ?")
+        params.append(before_id)
+    where_sql = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    rows = conn.execute(
+        f"""
+        SELECT run_id, kind, source_file, target_id, dry_run, status, rows, seconds, rows_per_second,
+               phases, peak_rss_kb, python_peak_kb, error, started_at
+        FROM import_run {where_sql}
+        ORDER BY run_id DESC
+        LIMIT ?
+        """,
+        (*params, limit),
+    ).fetchall()
+    result = []
+    for row in rows:
+        item = dict(row)
+        item["dry_run"] = bool(item["dry_run"])
+        item["phases"] = json.loads(item["phases"])
+        result.append(item)
+    return result
@@ -0,0 +1,120 @@
+"""Check that reads spanning archived years stay consistent with the hot database.
+
+Usage (from the project directory)::
+
+    python -m benchmarks.archive_check
+
+Builds a small database with a session two years back and one this year,
+archives the old year with ``main.archive_years`` and then merges the two
+people that registered the same trainee under different phones. Archives
+are read-only, so the archived enrollments keep the merged-away person id;
+the yearly stats (``/api/stats/year``), ``/api/stats/cohorts`` and the year
+export must still count that trainee once. The unfiltered session history
+must still list the archived session, also across keyset pages. Exits 1 on
+any mismatch.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import logging
+import sys
+import tempfile
+import zipfile
+from datetime import date
+from pathlib import Path
+from typing import Any, List, Optional
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+
+def run_checks(main) -> List[str]:
+    client = main.app.test_client()
+    old_year = str(date.today().year - 2)
+    this_year = str(date.today().year)
+
+    def create_session(start_date: str) -> int:
+        return main.run_write(
+            lambda conn: conn.execute(
+                "INSERT INTO training_session (title, start_date) VALUES (?, ?)", (start_date, start_date)
+            ).lastrowid
+        )
+
+    def ingest(session_id: int, lines: List[str]) -> None:
+        response = client.post(f"/api/enrollment/ingest?session_id={session_id}", data="\n".join(lines))
+        assert response.get_json()["ok"], response.get_json()
+
+    old_session = create_session(f"{old_year}-05-01")
+    new_session = create_session(f"{this_year}-01-02")
+    ingest(old_session, ['{"phone": "13800000001", "name": "张三"}', '{"phone": "13900000001", "name": "张三"}'])
+    ingest(new_session, ['{"phone": "13800000001", "name": "张三"}'])
+    main.archive_years([old_year])
+
+    with main.get_connection() as conn:
+        keep, duplicate = (
+            row[0]
+            for row in conn.execute(
+                "SELECT person_id FROM person WHERE phone_norm IN ('13800000001', '13900000001') ORDER BY phone_norm"
+            )
+        )
+    merged = client.post("/api/person/merge", json={"keep_person_id": keep, "merge_person_ids": [duplicate]})
+    assert merged.get_json()["ok"], merged.get_json()
+
+    failures: List[str] = []
+
+    def expect(name: str, actual: Any, expected: Any) -> None:
+        status = "ok" if actual == expected else "FAIL"
+        print(f"{name:40s} {actual!r:>10} {status}")
+        if actual != expected:
+            failures.append(f"{name}: expected {expected!r}, got {actual!r}")
+
+    stats = client.get(f"/api/stats/year?year={old_year}").get_json()["data"]
+    expect("stats total_enrollments", stats["total_enrollments"], 2)
+    expect("stats total_people", stats["total_people"], 1)
+    expect("stats repeat_people", stats["repeat_people"], 1)
+
+    cohorts = {item["cohort_year"]: item for item in client.get("/api/stats/cohorts").get_json()["data"]["cohorts"]}
+    expect("cohort size", cohorts.get(old_year, {}).get("size"), 1)
+    expect("cohort returns", [item["people"] for item in cohorts.get(old_year, {}).get("returns", [])], [1])
+    expect("cohorts", sorted(cohorts), [old_year])
+
+    with zipfile.ZipFile(main.build_exports(old_year)) as archive_zip:
+        summary = archive_zip.read(f"{old_year}_person_summary.csv").decode("utf-8-sig")
+        enrollments = archive_zip.read(f"{old_year}_enrollments.csv").decode("utf-8-sig")
+    summary_rows = list(csv.DictReader(io.StringIO(summary)))
+    expect("export summary rows", len(summary_rows), 1)
+    expect("export person_ids", {row["person_id"] for row in csv.DictReader(io.StringIO(enrollments))}, {str(keep)})
+
+    history = client.get("/api/session/history").get_json()["data"]
+    expect("history session_ids", [row["session_id"] for row in history["rows"]], [new_session, old_session])
+    first_page = client.get("/api/session/history?limit=1").get_json()["data"]
+    second_page = client.get(f"/api/session/history?limit=1&before_id={first_page['next_before_id']}").get_json()
+    expect("history second page", [row["session_id"] for row in second_page["data"]["rows"]], [old_session])
+    bad_limit = client.get("/api/session/history?limit=abc")
+    expect("history bad limit", (bad_limit.status_code, bad_limit.get_json()["ok"]), (200, False))
+    return failures
+
+
+def main_cli(argv: Optional[List[str]] = None) -> int:
+    sys.path.insert(0, str(PROJECT_DIR))
+    import main
+
+    with tempfile.TemporaryDirectory(prefix="training-archive-check-") as tmp:
+        work_dir = Path(tmp)
+        main.DB_PATH = work_dir / "training.db"
+        main.UPLOAD_DIR = work_dir / "uploads"
+        main.ARCHIVE_DIR = work_dir / "archive"
+        main.app.logger.setLevel(logging.ERROR)
+        main.initialize_database()
+        try:
+            failures = run_checks(main)
+        finally:
+            main.writer.stop()
+    for failure in failures:
+        print(failure)
+    print(f"{len(failures)} check(s) failed" if failures else "archived reads are consistent")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
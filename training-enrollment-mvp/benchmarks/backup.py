@@ -0,0 +1,154 @@
+"""Measure online backup throughput and what it costs concurrent requests.
+
+Usage (from the project directory)::
+
+    python -m benchmarks.backup                       # generated dataset, scale 0.2
+    python -m benchmarks.backup --scale 1 --reuse-db /tmp/bench.db
+    python -m benchmarks.backup --pages 64 256 1024 -1 --sleep-ms 0 5
+
+A reader thread requests ``/api/session/history`` and ``/api/stats/year`` and
+a writer thread submits small write jobs to the writer queue, first with no
+backup running (the baseline) and then while ``app.backup.create_backup``
+copies the database with each ``--pages``/``--sleep-ms`` combination.
+``-1`` pages is the single-step copy. Writes during a stepped copy make
+SQLite restart it, so the report also shows whether the copy fell back to a
+single step.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks import datagen
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+
+class Probe:
+    """Calls ``fn`` in a loop on its own thread and records each call's latency."""
+
+    def __init__(self, fn: Callable[[], Any], pause: float) -> None:
+        self.fn = fn
+        self.pause = pause
+        self.latencies: List[float] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            started = time.perf_counter()
+            self.fn()
+            self.latencies.append(time.perf_counter() - started)
+            time.sleep(self.pause)
+
+    def __enter__(self) -> "Probe":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def summary(self) -> Dict[str, float]:
+        values = sorted(self.latencies) or [0.0]
+        return {
+            "count": len(self.latencies),
+            "p50_ms": round(statistics.median(values) * 1000, 2),
+            "p95_ms": round(values[int(len(values) * 0.95) if len(values) > 1 else 0] * 1000, 2),
+            "max_ms": round(values[-1] * 1000, 2),
+        }
+
+
+def run_probes(main, year: str, work: Callable[[], Any], write_pause: float) -> Dict[str, Any]:
+    client = main.app.test_client()
+
+    def read() -> None:
+        client.get("/api/session/history?limit=50")
+        client.get(f"/api/stats/year?year={year}")
+
+    def write() -> None:
+        main.run_write(
+            lambda conn: conn.execute(
+                "UPDATE app_state SET updated_at = ? WHERE key = ?", (time.time(), main.LAST_BACKUP_KEY)
+            )
+        )
+
+    with Probe(read, 0.0) as reader, Probe(write, write_pause) as writer:
+        result = work()
+    return {"result": result, "read": reader.summary(), "write": writer.summary()}
+
+
+def main_cli(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=0.2, help="dataset size relative to the full benchmark")
+    parser.add_argument("--reuse-db", type=Path, help="cache the generated database here and reuse it")
+    parser.add_argument("--pages", type=int, nargs="+", default=[64, 256, 1024, -1])
+    parser.add_argument("--sleep-ms", type=float, nargs="+", default=[0.0, 5.0])
+    parser.add_argument("--write-every-ms", type=float, default=50.0, help="pause between probe writes")
+    parser.add_argument("--baseline-s", type=float, default=3.0)
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, str(PROJECT_DIR))
+    import main
+    from app import backup
+
+    spec = datagen.DatasetSpec().scaled(args.scale)
+    with tempfile.TemporaryDirectory(prefix="training-backup-bench-") as tmp:
+        work_dir = Path(tmp)
+        main.DB_PATH = work_dir / "training.db"
+        main.UPLOAD_DIR = work_dir / "uploads"
+        main.app.logger.setLevel(logging.ERROR)
+        if args.reuse_db and args.reuse_db.exists():
+            shutil.copyfile(args.reuse_db, main.DB_PATH)
+            main.initialize_database()
+        else:
+            datagen.generate_database(main.DB_PATH, spec, main.initialize_database)
+            if args.reuse_db:
+                shutil.copyfile(main.DB_PATH, args.reuse_db)
+        year = str(spec.end_year)
+        write_pause = args.write_every_ms / 1000
+        size_mb = main.DB_PATH.stat().st_size / 1024 / 1024
+        print(f"database {size_mb:.1f} MB")
+
+        baseline = run_probes(main, year, lambda: time.sleep(args.baseline_s), write_pause)
+        print(
+            f"{'baseline':>18s} {'':>22s} read p50/p95/max {_latency(baseline['read'])}"
+            f"  write {_latency(baseline['write'])}"
+        )
+        for pages in args.pages:
+            for sleep_ms in args.sleep_ms if pages > 0 else [0.0]:
+                measured = run_probes(
+                    main,
+                    year,
+                    lambda: backup.create_backup(main.DB_PATH, work_dir / "backups", pages, sleep_ms / 1000, keep=1),
+                    write_pause,
+                )
+                result = measured["result"]
+                throughput = result["size"] / 1024 / 1024 / result["seconds"]
+                label = f"pages={pages} sleep={sleep_ms:g}ms"
+                mode = "single-step" if result["single_step"] or pages < 0 else f"{result['steps']} steps"
+                print(
+                    f"{label:>18s} {result['seconds']:6.2f}s {throughput:6.1f}MB/s {mode:>8s}"
+                    f" read p50/p95/max {_latency(measured['read'])}  write {_latency(measured['write'])}",
+                    flush=True,
+                )
+        verification = backup.verify_backup(backup.resolve_backup(work_dir / "backups"))
+        print(f"latest snapshot verified: {verification['ok']} ({verification['integrity']})")
+        main.writer.stop()
+    return 0 if verification["ok"] else 1
+
+
+def _latency(summary: Dict[str, float]) -> str:
+    return f"{summary['p50_ms']:.1f}/{summary['p95_ms']:.1f}/{summary['max_ms']:.1f} ms"
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,47 @@
+"""Compare two benchmark result files: ``python -m benchmarks.compare old.json new.json``."""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+DEFAULT_THRESHOLD = 1.2
+
+
+def compare_reports(old: Dict[str, Any], new: Dict[str, Any], threshold: float = DEFAULT_THRESHOLD) -> int:
+    """Print per-benchmark median ratios; return 1 if any got slower than ``threshold``x."""
+    if old["meta"].get("dataset") != new["meta"].get("dataset"):
+        print("warning: datasets differ, ratios are not comparable")
+    print(f"{'benchmark':32s} {'old ms':>10s} {'new ms':>10s} {'ratio':>7s}")
+    regressions = []
+    for name, result in new["results"].items():
+        previous = old["results"].get(name)
+        if previous is None:
+            print(f"{name:32s} {'-':>10s} {result['median_s'] * 1000:10.1f} {'new':>7s}")
+            continue
+        ratio = result["median_s"] / previous["median_s"] if previous["median_s"] else float("inf")
+        marker = "  <-- slower" if ratio > threshold else ""
+        print(f"{name:32s} {previous['median_s'] * 1000:10.1f} {result['median_s'] * 1000:10.1f} {ratio:7.2f}{marker}")
+        if ratio > threshold:
+            regressions.append(name)
+    if regressions:
+        print(f"regressions (> {threshold:.2f}x): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("old", type=Path)
+    parser.add_argument("new", type=Path)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+    old = json.loads(args.old.read_text(encoding="utf-8"))
+    new = json.loads(args.new.read_text(encoding="utf-8"))
+    return compare_reports(old, new, args.threshold)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
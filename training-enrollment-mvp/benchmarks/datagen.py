@@ -0,0 +1,349 @@
+"""Deterministic synthetic data for the benchmark suite.
+
+Every generator takes a ``seed`` and only draws from its own ``random.Random``
+instance, so the same arguments always produce byte-identical inputs and the
+same database contents.
+"""
+from __future__ import annotations
+
+import csv
+import random
+import sqlite3
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+SURNAMES = "王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈姚卢姜崔钟谭陆汪范金石廖贾夏韦付方白邹孟熊秦邱江尹薛闫段雷侯龙史陶黎贺顾毛郝龚邵万钱严覃武戴莫孔向汤"
+GIVEN_CHARS = "伟芳娜秀英敏静丽强磊军洋勇艳杰娟涛明超秀兰霞平刚桂英华玉萍红娥玲芬燕彬鹏辉斌宇浩凯健俊帆帅旭宁龙林欣颖晨晓琳雪慧婷倩佳怡梦瑶思雨子涵一诺欣怡浩然梓轩"
+CITIES = ["杭州", "宁波", "温州", "嘉兴", "湖州", "绍兴", "金华", "衢州", "舟山", "台州", "丽水", "上海", "南京", "苏州", "合肥", "福州"]
+ORG_KINDS = ["人民医院", "中医院", "疾控中心", "卫生院", "社区卫生服务中心", "妇幼保健院", "卫健委", "第一中学", "职业技术学院", "供电公司"]
+TITLES = ["科员", "副科长", "科长", "主治医师", "副主任医师", "主任医师", "护士长", "教师", "工程师", "主任"]
+ROOMS = ["单间", "标间", "不住宿", "合住", ""]
+PHONE_PREFIXES = ["130", "131", "132", "133", "135", "136", "137", "138", "139", "150", "151", "152", "155", "156", "157", "158", "159", "176", "177", "180", "181", "185", "186", "187", "188", "189", "198", "199"]
+COURSE_TOPICS = ["政策解读", "案例分析", "专题讲座", "分组研讨", "现场教学", "实操演练", "经验交流", "结业考核"]
+ENROLLMENT_SHEET_HEADERS = (
+    ["序号", "姓名", "手机号", "工作单位", "地区", "职务", "住宿"],
+    ["编号", "名字", "联系电话", "单位", "区域", "岗位", "住宿偏好"],
+    ["序号", "姓名", "手机", "机构", "省市", "职务/职称", "房间"],
+)
+FINANCE_HEADERS = [
+    "编号", "开始答题时间", "结束答题时间", "答题时长", "1.姓名", "2.手机", "3.身份证号",
+    "4.工作单位", "5.职务/职称", "7.银行卡号", "8.开户行", "地理位置市", "用户类型", "昵称",
+]
+
+
+@dataclass(frozen=True)
+class DatasetSpec:
+    persons: int = 100_000
+    enrollments: int = 1_000_000
+    years: int = 10
+    end_year: int = 2025
+    finance_records: int = 50_000
+    courses_per_session: int = 6
+    surveys_per_course: int = 10
+    today_courses: int = 20
+    seed: int = 20240601
+
+    def scaled(self, factor: float) -> "DatasetSpec":
+        return DatasetSpec(
+            persons=max(100, int(self.persons * factor)),
+            enrollments=max(1_000, int(self.enrollments * factor)),
+            years=self.years,
+            end_year=self.end_year,
+            finance_records=max(100, int(self.finance_records * factor)),
+            courses_per_session=self.courses_per_session,
+            surveys_per_course=self.surveys_per_course,
+            today_courses=self.today_courses,
+            seed=self.seed,
+        )
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class Faker:
+    def __init__(self, seed: int) -> None:
+        self.rng = random.Random(seed)
+        self.orgs = [
+            f"{self.rng.choice(CITIES)}市{self.rng.choice(['', '第一', '第二', '第三'])}{self.rng.choice(ORG_KINDS)}"
+            for _ in range(800)
+        ]
+
+    def name(self) -> str:
+        given = "".join(self.rng.choice(GIVEN_CHARS) for _ in range(self.rng.choice((1, 2, 2))))
+        return self.rng.choice(SURNAMES) + given
+
+    def phone(self) -> str:
+        return self.rng.choice(PHONE_PREFIXES) + f"{self.rng.randrange(10 ** 8):08d}"
+
+    def org(self) -> str:
+        return self.rng.choice(self.orgs)
+
+    def id_card(self) -> str:
+        birthday = date(1960, 1, 1) + timedelta(days=self.rng.randrange(365 * 40))
+        return f"33{self.rng.randrange(10 ** 4):04d}{birthday:%Y%m%d}{self.rng.randrange(10 ** 4):04d}"
+
+    def bank_card(self) -> str:
+        return "6222" + "".join(str(self.rng.randrange(10)) for _ in range(15))
+
+
+def generate_database(db_path: Path, spec: DatasetSpec, initialize) -> None:
+    """Fill ``db_path`` with ``spec``-sized data.
+
+    ``initialize`` creates the application schema (``main.initialize_database``
+    with ``main.DB_PATH`` pointed at ``db_path``) so the data always matches the
+    schema, indexes and triggers of the commit under test.
+    """
+    faker = Faker(spec.seed)
+    rng = faker.rng
+    initialize()
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA synchronous = OFF")
+    try:
+        people = []
+        seen_phones = set()
+        while len(people) < spec.persons:
+            phone = faker.phone()
+            if phone in seen_phones:
+                continue
+            seen_phones.add(phone)
+            people.append((phone, faker.name(), faker.org()))
+        conn.executemany(
+            "INSERT INTO person (phone_norm, name_latest, org_text_latest) VALUES (?, ?, ?)",
+            people,
+        )
+
+        session_count = max(spec.years, spec.enrollments // 250)
+        start_year = spec.end_year - spec.years + 1
+        sessions = []
+        for index in range(session_count):
+            year = start_year + index * spec.years // session_count
+            start = date(year, 1, 1) + timedelta(days=rng.randrange(350))
+            sessions.append(
+                (
+                    f"{year}年第{index + 1}期{rng.choice(COURSE_TOPICS)}培训班",
+                    start.isoformat(),
+                    (start + timedelta(days=rng.randrange(1, 6))).isoformat(),
+                    f"{rng.choice(CITIES)}市培训中心",
+                    "提升业务能力",
+                    f"{start.isoformat()}T08:00:00",
+                )
+            )
+        conn.executemany(
+            """
+            INSERT INTO training_session (title, start_date, end_date, location_text, training_goal, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            sessions,
+        )
+
+        conn.executemany(
+            """
+            INSERT INTO enrollment (
+                session_id, person_id, enrolled_at, name_snapshot, org_text, region_text,
+                title_text, remote_id_snapshot, room_preference, source_file, source_sheet, stat_year
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            _enrollment_rows(rng, spec, people, sessions),
+        )
+
+        courses = []
+        today = date.today()
+        for session_id, session in enumerate(sessions, start=1):
+            start = date.fromisoformat(session[1])
+            for slot in range(spec.courses_per_session):
+                day = start + timedelta(days=slot // 2)
+                hour = 9 if slot % 2 == 0 else 14
+                courses.append(_course_row(rng, session_id, day, hour, session[3]))
+        for slot in range(spec.today_courses):
+            courses.append(_course_row(rng, session_count, today, 8 + slot % 10, "培训中心"))
+        conn.executemany(
+            """
+            INSERT INTO course (title, teacher, start_at, end_at, location, session_id, source_file, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, 'bench.docx', ?)
+            """,
+            courses,
+        )
+
+        conn.executemany(
+            """
+            INSERT INTO survey_response (
+                course_id, satisfaction_score, gain_text, suggestion_text, recommend_score, submitted_at
+            ) VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (
+                (
+                    course_id,
+                    rng.randint(3, 5),
+                    "收获很大",
+                    "",
+                    rng.randint(6, 10),
+                    courses[course_id - 1][3] or courses[course_id - 1][2],
+                )
+                for course_id in range(1, len(courses) + 1)
+                for _ in range(rng.randrange(spec.surveys_per_course * 2 + 1))
+            ),
+        )
+
+        conn.executemany(
+            """
+            INSERT INTO finance_record (
+                record_no, start_time, end_time, duration_text, name, phone, id_card, org_name,
+                job_title, bank_card, bank_name, city_name, user_type, nickname, source_file,
+                updated_at, raw_json
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'bench.csv', ?, '{}')
+            """,
+            (
+                (row[0], row[1], row[2], row[3], row[4], row[5], row[6], row[7], row[8], row[9], row[10], row[11], row[12], row[13], row[1])
+                for row in _finance_rows(faker, spec.finance_records, start_year, spec.years)
+            ),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _enrollment_rows(
+    rng: random.Random,
+    spec: DatasetSpec,
+    people: Sequence[Tuple[str, str, str]],
+    sessions: Sequence[tuple],
+) -> Iterator[tuple]:
+    # Squaring a uniform draw skews towards low person ids, which gives a
+    # realistic long tail of repeat trainees for the repeat/top-N statistics.
+    session_count = len(sessions)
+    for index in range(spec.enrollments):
+        session_id = index * session_count // spec.enrollments + 1
+        person_index = int(len(people) * rng.random() ** 2)
+        phone, name, org = people[person_index]
+        yield (
+            session_id,
+            person_index + 1,
+            f"{sessions[session_id - 1][1]}T08:00:00",
+            name,
+            org,
+            rng.choice(CITIES),
+            rng.choice(TITLES),
+            None,
+            rng.choice(ROOMS) or None,
+            "bench.xlsx",
+            "Sheet1",
+            sessions[session_id - 1][1][:4],
+        )
+
+
+def _course_row(rng: random.Random, session_id: int, day: date, hour: int, location: str) -> tuple:
+    start = datetime(day.year, day.month, day.day, hour, 0)
+    return (
+        rng.choice(COURSE_TOPICS),
+        rng.choice(SURNAMES) + "老师",
+        start.isoformat(timespec="seconds"),
+        (start + timedelta(hours=3)).isoformat(timespec="seconds"),
+        location,
+        session_id,
+        start.isoformat(timespec="seconds"),
+    )
+
+
+def _finance_rows(faker: Faker, count: int, start_year: int, years: int) -> Iterator[List[str]]:
+    rng = faker.rng
+    for index in range(count):
+        started = datetime(start_year + rng.randrange(years), 1, 1) + timedelta(minutes=rng.randrange(525_000))
+        yield [
+            f"F{index + 1:08d}",
+            started.strftime("%Y-%m-%d %H:%M:%S"),
+            (started + timedelta(minutes=3)).strftime("%Y-%m-%d %H:%M:%S"),
+            "3分钟",
+            faker.name(),
+            faker.phone(),
+            faker.id_card(),
+            faker.org(),
+            rng.choice(TITLES),
+            faker.bank_card(),
+            rng.choice(["工商银行", "农业银行", "建设银行", "中国银行", "交通银行"]) + rng.choice(CITIES) + "支行",
+            rng.choice(CITIES),
+            "普通用户",
+            "",
+        ]
+
+
+def write_enrollment_workbook(path: Path, rows: int, seed: int, sheets: int = 3) -> Path:
+    """Write a multi-sheet registration workbook like the ones organisers send.
+
+    Sheets use different header aliases, some store phones as numbers, about 2%
+    of phones are invalid, blank rows are sprinkled in, and one notes sheet has
+    no phone column at all.
+    """
+    from openpyxl import Workbook
+
+    faker = Faker(seed)
+    rng = faker.rng
+    workbook = Workbook(write_only=True)
+    per_sheet = max(1, rows // sheets)
+    for sheet_index in range(sheets):
+        sheet = workbook.create_sheet(f"第{sheet_index + 1}组")
+        headers = ENROLLMENT_SHEET_HEADERS[sheet_index % len(ENROLLMENT_SHEET_HEADERS)]
+        sheet.append(headers)
+        numeric_phones = sheet_index % 2 == 1
+        for index in range(per_sheet):
+            if rng.random() < 0.01:
+                sheet.append([None] * len(headers))
+                continue
+            phone: object = faker.phone()
+            if rng.random() < 0.02:
+                phone = str(phone)[:7]
+            elif numeric_phones:
+                phone = int(str(phone))
+            elif rng.random() < 0.1:
+                phone = f"+86 {str(phone)[:3]}-{str(phone)[3:7]}-{str(phone)[7:]}"
+            sheet.append([
+                index + 1,
+                faker.name(),
+                phone,
+                faker.org(),
+                rng.choice(CITIES),
+                rng.choice(TITLES),
+                rng.choice(ROOMS),
+            ])
+    notes = workbook.create_sheet("填表说明")
+    notes.append(["说明"])
+    notes.append(["请按模板填写，手机号为必填项。"])
+    workbook.save(path)
+    return path
+
+
+def write_finance_csv(path: Path, rows: int, seed: int, start_year: int = 2024, years: int = 2) -> Path:
+    faker = Faker(seed)
+    with path.open("w", encoding="utf-8-sig", newline="") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(FINANCE_HEADERS)
+        for row in _finance_rows(faker, rows, start_year, years):
+            writer.writerow(row)
+    return path
+
+
+def write_course_docx(path: Path, days: int, seed: int, start: Optional[date] = None) -> Path:
+    """Write a Word schedule whose date column is vertically merged per day."""
+    from docx import Document
+
+    rng = random.Random(seed)
+    start = start or date(2025, 3, 3)
+    document = Document()
+    document.add_paragraph("培训日程安排")
+    slots = [("08:30-09:00", "报到"), ("09:00-11:30", None), ("14:00-17:00", None)]
+    table = document.add_table(rows=1, cols=4)
+    for cell, text in zip(table.rows[0].cells, ["日期", "时间", "课程内容", "授课教师"]):
+        cell.text = text
+    for day_index in range(days):
+        day = start + timedelta(days=day_index)
+        first_row = len(table.rows)
+        for time_text, fixed in slots:
+            cells = table.add_row().cells
+            cells[1].text = time_text
+            cells[2].text = fixed or f"{rng.choice(COURSE_TOPICS)}（{day_index + 1}）"
+            cells[3].text = "" if fixed else rng.choice(SURNAMES) + "教授"
+        merged = table.cell(first_row, 0).merge(table.cell(len(table.rows) - 1, 0))
+        merged.text = f"{day.month}月{day.day}日"
+    document.save(path)
+    return path
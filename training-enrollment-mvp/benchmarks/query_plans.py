@@ -0,0 +1,179 @@
+"""Check that the hot queries still use indexes.
+
+Usage (from the project directory)::
+
+    python -m benchmarks.query_plans                 # generated fixture, scale 0.02
+    python -m benchmarks.query_plans --verbose       # print every plan
+    python -m benchmarks.query_plans --reuse-db /tmp/plans.db
+
+Each case calls the real code path (``fetch_yearly_stats``, ``build_exports``,
+the today-task, history and finance list queries, ``create_today_tasks`` and
+the ``app/db/queries.py`` helpers) against a populated database while every
+statement SQLite runs is captured with a trace callback. Each captured
+statement is then run through ``EXPLAIN QUERY PLAN``; a plain ``SCAN`` of a
+table (one not backed by an index) fails the check unless the case lists it
+in ``ALLOWED_SCANS`` with the reason. The exit status is 1 on any failure,
+so the script can gate changes to those queries.
+
+Statements are captured on connections opened while a case runs; writes
+that go through the already-running writer thread are not planned.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+from datetime import date
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from benchmarks import datagen
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+# (case, table or alias) -> why a full scan is expected there.
+ALLOWED_SCANS: Dict[Tuple[str, str], str] = {
+    ("session_history", "training_session"): "ORDER BY session_id DESC LIMIT walks the rowid b-tree",
+    ("finance_list_keyword", "finance_record"): "substring LIKE '%kw%' cannot use an index",
+}
+
+_PLANNED_PREFIXES = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+_SCAN_RE = re.compile(r"^SCAN (\S+)(?: AS \S+)?$")
+_CTE_RE = re.compile(r"(\w+)\s+AS\s+(?:NOT\s+)?(?:MATERIALIZED\s+)?\(", re.IGNORECASE)
+
+
+def capture_statements(fn: Callable[[], Any]) -> List[str]:
+    """Run ``fn`` and return the SQL of every top-level statement it executed."""
+    captured: List[str] = []
+    real_connect = sqlite3.connect
+
+    def connect(*args: Any, **kwargs: Any) -> sqlite3.Connection:
+        conn = real_connect(*args, **kwargs)
+        conn.set_trace_callback(captured.append)
+        return conn
+
+    sqlite3.connect = connect
+    try:
+        fn()
+    finally:
+        sqlite3.connect = real_connect
+    statements = []
+    for sql in captured:
+        text = sql.strip()
+        if text.upper().startswith(_PLANNED_PREFIXES) and text not in statements:
+            statements.append(text)
+    return statements
+
+
+def full_scans(conn: sqlite3.Connection, sql: str) -> Tuple[List[str], List[str]]:
+    """``(plan lines, names scanned without an index)`` for ``sql``."""
+    ctes = {name.lower() for name in _CTE_RE.findall(sql)}
+    plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+    scans = []
+    for detail in plan:
+        match = _SCAN_RE.match(detail)
+        if not match:
+            continue
+        name = match.group(1).split(".")[-1]
+        if name == "CONSTANT" or name.startswith("(") or name.lower() in ctes:
+            continue
+        scans.append(name)
+    return plan, scans
+
+
+def build_cases(main, queries, year: str) -> List[Tuple[str, Callable[[], Any]]]:
+    def with_connection(fn: Callable[[sqlite3.Connection], Any]) -> Callable[[], Any]:
+        def run() -> Any:
+            with main.get_connection() as conn:
+                return fn(conn)
+
+        return run
+
+    return [
+        ("fetch_yearly_stats", lambda: main.fetch_yearly_stats(year)),
+        ("build_exports", lambda: main.build_exports(year)),
+        ("list_today_tasks", with_connection(main.query_today_tasks)),
+        ("session_history", with_connection(lambda conn: main.query_session_history(conn, 50))),
+        ("session_history_page", with_connection(lambda conn: main.query_session_history(conn, 50, 10_000_000))),
+        ("session_history_year", with_connection(lambda conn: main.query_session_history(conn, 50, None, year))),
+        ("finance_list", with_connection(lambda conn: main.query_finance_list(conn, "", 3, 20))),
+        ("finance_list_keyword", with_connection(lambda conn: main.query_finance_list(conn, "张", 1, 20))),
+        ("create_today_tasks", main.create_today_tasks),
+        ("count_enrollments_for_year", lambda: queries.count_enrollments_for_year(int(year))),
+        ("count_unique_people_for_year", lambda: queries.count_unique_people_for_year(int(year))),
+        ("count_repeat_people_for_year", lambda: queries.count_repeat_people_for_year(int(year))),
+        ("top_learners_for_year", lambda: queries.top_learners_for_year(int(year), 5)),
+    ]
+
+
+def check(db_path: Path, cases: Sequence[Tuple[str, Callable[[], Any]]], verbose: bool = False) -> int:
+    failures = 0
+    conn = sqlite3.connect(db_path)
+    try:
+        for name, fn in cases:
+            statements = capture_statements(fn)
+            bad: List[Tuple[str, List[str], List[str]]] = []
+            for sql in statements:
+                plan, scans = full_scans(conn, sql)
+                unexpected = [table for table in scans if (name, table) not in ALLOWED_SCANS]
+                if unexpected:
+                    bad.append((sql, plan, unexpected))
+                if verbose:
+                    print(f"--- {name}\n{_one_line(sql)}\n    " + "\n    ".join(plan))
+            status = "FAIL" if bad else "ok"
+            print(f"{name:32s} {len(statements):3d} statements  {status}")
+            for sql, plan, unexpected in bad:
+                failures += 1
+                print(f"    full scan of {', '.join(unexpected)} in: {_one_line(sql)}")
+                print("    " + "\n    ".join(plan))
+            if not statements:
+                failures += 1
+                print("    no statements captured")
+    finally:
+        conn.close()
+    return failures
+
+
+def _one_line(sql: str, width: int = 160) -> str:
+    text = " ".join(sql.split())
+    return text if len(text) <= width else text[: width - 3] + "..."
+
+
+def main_cli(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=0.02, help="fixture size relative to the full benchmark")
+    parser.add_argument("--reuse-db", type=Path, help="cache the generated fixture here and reuse it")
+    parser.add_argument("--verbose", action="store_true", help="print the plan of every statement")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, str(PROJECT_DIR))
+    import main
+    from app.db import database, queries
+
+    spec = datagen.DatasetSpec().scaled(args.scale)
+    with tempfile.TemporaryDirectory(prefix="training-plans-") as tmp:
+        work_dir = Path(tmp)
+        main.DB_PATH = database.DB_PATH = work_dir / "training.db"
+        main.UPLOAD_DIR = work_dir / "uploads"
+        main.ARCHIVE_DIR = work_dir / "archive"
+        main.app.logger.setLevel(logging.ERROR)
+        if args.reuse_db and args.reuse_db.exists():
+            shutil.copyfile(args.reuse_db, main.DB_PATH)
+            main.initialize_database()
+        else:
+            datagen.generate_database(main.DB_PATH, spec, main.initialize_database)
+            if args.reuse_db:
+                shutil.copyfile(main.DB_PATH, args.reuse_db)
+        year = str(min(spec.end_year, date.today().year))
+        failures = check(main.DB_PATH, build_cases(main, queries, year), args.verbose)
+        main.writer.stop()
+    print(f"{failures} statement(s) with unexpected full scans" if failures else "all hot queries use indexes")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,67 @@
+"""Compare the Excel reader backends and check which one ``auto`` should use.
+
+Usage (from the project directory)::
+
+    python -m benchmarks.readers                 # 30k-row generated workbook
+    python -m benchmarks.readers --rows 100000
+    python -m benchmarks.readers --file 报名表.xlsx
+
+Every installed backend reads the same workbook; results must be identical.
+The fastest backend is reported and compared with what ``auto`` resolves to;
+the exit status is 1 when ``readers.AUTO_ORDER`` would pick a slower one, so
+the order can be updated from real measurements.
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.importer import readers
+from benchmarks import datagen
+
+
+def measure_backends(path: Path, repeat: int = 3) -> Dict[str, float]:
+    """Median seconds per installed backend; raises if any backend reads different data."""
+    timings: Dict[str, float] = {}
+    reference = None
+    for backend in readers.available_backends():
+        runs: List[float] = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            sheets = readers.read_workbook(path, backend)
+            runs.append(time.perf_counter() - started)
+        result = {name: (sheet.columns, sheet.rows) for name, sheet in sheets.items()}
+        if reference is None:
+            reference = result
+        elif result != reference:
+            raise RuntimeError(f"backend {backend} read different cell values")
+        timings[backend] = statistics.median(runs)
+    return timings
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=30_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--file", type=Path, help="measure an existing workbook instead of a generated one")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="training_readers_") as tmp:
+        path = args.file or datagen.write_enrollment_workbook(Path(tmp) / "enrollments.xlsx", args.rows, datagen.DatasetSpec().seed + 1)
+        timings = measure_backends(path, args.repeat)
+        auto = readers.resolve_backend(path, "auto")
+
+    for backend, seconds in sorted(timings.items(), key=lambda item: item[1]):
+        print(f"  {backend:10s} {seconds * 1000:10.1f} ms")
+    fastest = min(timings, key=timings.get)
+    print(f"fastest: {fastest}, auto: {auto}")
+    return 0 if auto == fastest else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
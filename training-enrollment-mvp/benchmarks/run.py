@@ -0,0 +1,209 @@
+"""Time the hot paths of main.py against a generated dataset.
+
+Usage (from the project directory)::
+
+    python -m benchmarks.run                      # full size: 100k persons, 1M enrollments
+    python -m benchmarks.run --scale 0.05         # quick run
+    python -m benchmarks.run --compare benchmarks/results/<old>.json
+
+Results are written to ``benchmarks/results/<commit>.json``; use
+``python -m benchmarks.compare old.json new.json`` to diff two runs.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from app.importer import readers
+from benchmarks import datagen, startup
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PROJECT_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    durations: List[float] = []
+    result: Any = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        durations.append(time.perf_counter() - started)
+    return {
+        "runs": repeat,
+        "min_s": round(min(durations), 6),
+        "median_s": round(statistics.median(durations), 6),
+        "mean_s": round(statistics.fmean(durations), 6),
+        "detail": summarize(result),
+    }
+
+
+def summarize(result: Any) -> Any:
+    if isinstance(result, dict):
+        return {
+            key: (len(value) if isinstance(value, list) else value)
+            for key, value in result.items()
+            if isinstance(value, (int, float, str, list)) or value is None
+        }
+    if hasattr(result, "getbuffer"):
+        return {"bytes": result.getbuffer().nbytes}
+    if isinstance(result, list):
+        return {"items": len(result)}
+    return None
+
+
+def prepare(work_dir: Path, spec: datagen.DatasetSpec, rows: int, reuse: Optional[Path]):
+    import main
+
+    main.DB_PATH = work_dir / "training.db"
+    main.UPLOAD_DIR = work_dir / "uploads"
+    main.app.logger.setLevel(logging.ERROR)
+
+    started = time.perf_counter()
+    if reuse and reuse.exists():
+        shutil.copyfile(reuse, main.DB_PATH)
+        main.initialize_database()
+    else:
+        datagen.generate_database(main.DB_PATH, spec, main.initialize_database)
+        if reuse:
+            reuse.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(main.DB_PATH, reuse)
+    generation_s = time.perf_counter() - started
+
+    inputs = {
+        "workbook": datagen.write_enrollment_workbook(work_dir / "enrollments.xlsx", rows, spec.seed + 1),
+        "finance": datagen.write_finance_csv(work_dir / "finance.csv", rows, spec.seed + 2),
+        "schedule": datagen.write_course_docx(work_dir / "schedule.docx", days=30, seed=spec.seed + 3),
+    }
+    return main, inputs, generation_s
+
+
+def run_suite(main, inputs: Dict[str, Path], spec: datagen.DatasetSpec, repeat: int) -> Dict[str, Any]:
+    client = main.app.test_client()
+    year = str(spec.end_year)
+
+    def api(path: str) -> Callable[[], Any]:
+        def call() -> Any:
+            response = client.get(path)
+            if response.status_code != 200:
+                raise RuntimeError(f"{path} -> HTTP {response.status_code}")
+            return response.get_json().get("data")
+
+        return call
+
+    def yearly_summary(year: str, top_n: int) -> Any:
+        with main.get_connection() as conn:
+            return main.analytics.yearly_summary(conn, year, top_n)
+
+    def read_workbook(backend: str) -> Any:
+        sheets = readers.read_workbook(inputs["workbook"], backend)
+        return {name: len(sheet.rows) for name, sheet in sheets.items()}
+
+    def import_excel() -> Any:
+        with main.get_connection() as conn:
+            session_id = conn.execute(
+                "INSERT INTO training_session (title, start_date, created_at) VALUES ('bench', ?, ?)",
+                (f"{year}-06-01", datetime.now().isoformat(timespec="seconds")),
+            ).lastrowid
+        return main.import_excel(str(inputs["workbook"]), inputs["workbook"].name, session_id)
+
+    # Read-only benchmarks run first so imports do not change what they measure.
+    cases: List[tuple] = [
+        ("startup_import_main", lambda: {"import_us": startup.import_profile("main")[0]}),
+        ("fetch_yearly_stats", lambda: main.fetch_yearly_stats(year)),
+        ("yearly_summary_top100", lambda: yearly_summary(year, 100)),
+        ("build_exports", lambda: main.build_exports(year)),
+        ("finance_list", api("/api/finance/list?page=1&page_size=20")),
+        ("finance_list_search", api("/api/finance/list?q=%E5%BC%A0&page=1")),
+        ("list_today_tasks", api("/api/tasks/today")),
+        ("session_history", api("/api/session/history")),
+        ("bootstrap", api(f"/api/bootstrap?year={year}")),
+        ("stats_cohorts", api("/api/stats/cohorts")),
+    ] + [
+        (f"read_workbook_{backend}", lambda backend=backend: read_workbook(backend))
+        for backend in readers.available_backends()
+    ] + [
+        ("parse_course_rows_from_word", lambda: main.parse_course_rows_from_word(str(inputs["schedule"]), 2025)),
+        ("import_excel", import_excel),
+        ("import_finance_csv", lambda: main.import_finance_file(str(inputs["finance"]), inputs["finance"].name)),
+    ]
+    results: Dict[str, Any] = {}
+    for name, fn in cases:
+        results[name] = measure(fn, repeat)
+        print(f"{name:32s} median {results[name]['median_s'] * 1000:10.1f} ms", flush=True)
+    return results
+
+
+def main_cli(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply dataset sizes (default 1.0)")
+    parser.add_argument("--rows", type=int, default=30_000, help="rows in generated import files")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=datagen.DatasetSpec.seed)
+    parser.add_argument("--output", type=Path, help="result JSON path (default benchmarks/results/<commit>.json)")
+    parser.add_argument("--reuse-db", type=Path, help="cache the generated database here and reuse it")
+    parser.add_argument("--compare", type=Path, help="previous result JSON to compare against")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, str(PROJECT_DIR))
+    spec = datagen.DatasetSpec(seed=args.seed).scaled(args.scale)
+    rows = args.rows
+
+    with tempfile.TemporaryDirectory(prefix="training-bench-") as tmp:
+        main, inputs, generation_s = prepare(Path(tmp), spec, rows, args.reuse_db)
+        print(f"dataset ready in {generation_s:.1f}s ({spec.persons} persons, {spec.enrollments} enrollments)")
+        results = run_suite(main, inputs, spec, args.repeat)
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "dataset": spec.as_dict(),
+            "import_rows": rows,
+            "generation_s": round(generation_s, 3),
+            "run_date": date.today().isoformat(),
+        },
+        "results": results,
+    }
+    output = args.output or RESULTS_DIR / f"{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"results written to {output}")
+
+    if args.compare:
+        from benchmarks.compare import compare_reports
+
+        return compare_reports(json.loads(args.compare.read_text(encoding="utf-8")), report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,80 @@
+"""Measure how long ``import main`` takes in a fresh interpreter.
+
+Usage (from the project directory)::
+
+    python -m benchmarks.startup               # median of 5 runs + slowest modules
+    python -m benchmarks.startup --top 25
+
+Each run starts ``python -X importtime -c "import main"`` and parses the
+cumulative times it prints to stderr, so the numbers match what a restart of
+the server pays before it can listen.
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+
+def import_profile(module: str = "main") -> Tuple[int, Dict[str, int]]:
+    """Run one fresh import of ``module``.
+
+    Returns the cumulative time of the whole import and of each module it
+    imports directly, in microseconds.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    children: Dict[str, int] = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, raw_name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue
+        # Each nesting level indents the name by two spaces and a module is
+        # printed after everything it imported, so direct children of the
+        # target are the depth-1 lines collected before its own line.
+        depth = (len(raw_name) - len(raw_name.lstrip()) - 1) // 2
+        name = raw_name.strip()
+        if depth == 0:
+            if name == module:
+                return int(cumulative), children
+            children = {}
+        elif depth == 1:
+            children[name] = int(cumulative)
+    raise RuntimeError(f"no importtime line for {module}")
+
+
+def measure(repeat: int = 5, module: str = "main") -> Tuple[float, Dict[str, int]]:
+    """Median import time in seconds and the slowest run's per-module breakdown."""
+    runs = [import_profile(module) for _ in range(repeat)]
+    totals = [total for total, _ in runs]
+    return statistics.median(totals) / 1_000_000, runs[totals.index(max(totals))][1]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="number of slowest direct imports to list")
+    parser.add_argument("--module", default="main")
+    args = parser.parse_args(argv)
+
+    median_s, breakdown = measure(args.repeat, args.module)
+    print(f"import {args.module}: median {median_s * 1000:.1f} ms over {args.repeat} runs")
+    for name, micros in sorted(breakdown.items(), key=lambda item: item[1], reverse=True)[: args.top]:
+        print(f"  {name:40s} {micros / 1000:8.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
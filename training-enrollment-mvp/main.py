@@ -1,51 +1,100 @@
 import hashlib
+import importlib
+import importlib.util
+import argparse
 import io
 import json
 import csv
+import functools
 import os
 import re
 import sqlite3
+import tempfile
+import time
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import base64
 import logging
+import socket
+import threading
 import urllib.error
 import urllib.parse
 import urllib.request
 from logging.handlers import RotatingFileHandler
 from datetime import date, datetime, timedelta
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
 
-import pandas as pd
-import qrcode
-from docx import Document
-from flask import Flask, jsonify, render_template, request, send_file
+from flask import Flask, Response, g, jsonify, make_response, render_template, request, send_file
 
-try:
-    import PIL  # noqa: F401
-    QR_PIL_AVAILABLE = True
-except Exception:
-    QR_PIL_AVAILABLE = False
+from app import backup, blobstore, httpcache, logtail, metrics, usage
+from app.db import analytics, archive
+from app.db.writer import SQLiteWriter
+from app.importer import checkpoint, delta, readers
+from app.profiling import RequestProfiler
+
+# pandas, python-docx and qrcode are imported inside the functions that use
+# them so the server starts without paying for them; see prewarm_imports().
+QR_PIL_AVAILABLE = importlib.util.find_spec("PIL") is not None
+PREWARM_MODULES = ("pandas", "openpyxl", "docx", "qrcode", "PIL.Image")
 
 BASE_DIR = Path(__file__).resolve().parent
 DB_PATH = BASE_DIR / "training.db"
 UPLOAD_DIR = BASE_DIR / "uploads"
 LOG_DIR = BASE_DIR / "logs"
+ARCHIVE_DIR = Path(os.environ.get("TRAINING_ARCHIVE_DIR", BASE_DIR / "archive"))
 LOG_PATH = LOG_DIR / "app.log"
+LOG_BACKUP_COUNT = 3
+
+SLOW_QUERY_MS = float(os.environ.get("TRAINING_SLOW_QUERY_MS", "200"))
+SQL_METRICS_ENABLED = os.environ.get("TRAINING_SQL_METRICS", "1") != "0"
+SQL_TRACE_ENABLED = os.environ.get("TRAINING_SQL_TRACE", "0") == "1"
+PROFILING_ENABLED = os.environ.get("TRAINING_PROFILING", "0") == "1"
+PROFILE_DIR = LOG_DIR / "profiles"
+PREWARM_ENABLED = os.environ.get("TRAINING_PREWARM", "1") != "0"
+# Survey links and QR codes point here; set it to the LAN address when
+# serving phones on other machines.
+PUBLIC_BASE_URL = os.environ.get("TRAINING_PUBLIC_URL", "http://127.0.0.1:5000").rstrip("/")
+SQLITE_BUSY_TIMEOUT = float(os.environ.get("TRAINING_SQLITE_TIMEOUT", "30"))
+# Unreferenced uploads are deleted once unused for this long; the check runs
+# every UPLOAD_GC_INTERVAL_HOURS (0 disables the background run).
+UPLOAD_RETENTION_DAYS = float(os.environ.get("TRAINING_UPLOAD_RETENTION_DAYS", "7"))
+UPLOAD_GC_INTERVAL_HOURS = float(os.environ.get("TRAINING_UPLOAD_GC_HOURS", "24"))
+# Online snapshots (app/backup.py): one every BACKUP_INTERVAL_HOURS (0 disables
+# the background run), BACKUP_KEEP kept, copied BACKUP_PAGES pages at a time
+# with BACKUP_STEP_SLEEP_MS between steps.
+# Imports commit every IMPORT_CHUNK_ROWS rows and record a checkpoint; a
+# "running" checkpoint not advanced for IMPORT_STALE_SECONDS is taken to be
+# from a crashed import and may be resumed.
+IMPORT_CHUNK_ROWS = int(os.environ.get("TRAINING_IMPORT_CHUNK_ROWS", "5000"))
+IMPORT_STALE_SECONDS = 300
+BACKUP_DIR = Path(os.environ.get("TRAINING_BACKUP_DIR", BASE_DIR / "backups"))
+BACKUP_INTERVAL_HOURS = float(os.environ.get("TRAINING_BACKUP_HOURS", "24"))
+BACKUP_KEEP = int(os.environ.get("TRAINING_BACKUP_KEEP", "7"))
+BACKUP_PAGES = int(os.environ.get("TRAINING_BACKUP_PAGES", "64"))
+BACKUP_STEP_SLEEP_MS = float(os.environ.get("TRAINING_BACKUP_STEP_SLEEP_MS", "5"))
 
 app = Flask(__name__)
+metrics.configure(SLOW_QUERY_MS, app.logger, SQL_TRACE_ENABLED)
+profiler = RequestProfiler(PROFILE_DIR)
 
-LATEST_SESSION_ID: Optional[int] = None
+LATEST_SESSION_KEY = "latest_session_id"
+DATA_VERSION_KEY = "data_version"
+LAST_BACKUP_KEY = "last_backup_at"
 
 
 def setup_logging() -> None:
     LOG_DIR.mkdir(exist_ok=True)
-    handler = RotatingFileHandler(LOG_PATH, maxBytes=1_000_000, backupCount=3, encoding="utf-8")
+    handler = RotatingFileHandler(
+        LOG_PATH, maxBytes=1_000_000, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+    )
     handler.setFormatter(
         logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
     )
     app.logger.setLevel(logging.INFO)
     app.logger.handlers.clear()
+    app.logger.propagate = False
     app.logger.addHandler(handler)
     app.logger.addHandler(logging.StreamHandler())
 
@@ -58,18 +107,99 @@ def is_excel_filename(filename: str) -> bool:
     return Path(filename).suffix.lower() in ALLOWED_EXCEL_EXTENSIONS
 
 
+def is_enrollment_filename(filename: str) -> bool:
+    return is_excel_filename(filename) or Path(filename).suffix.lower() in readers.CSV_SUFFIXES
+
+
 def is_word_filename(filename: str) -> bool:
     return Path(filename).suffix.lower() in ALLOWED_WORD_EXTENSIONS
 
 
 def get_connection() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
+    factory = metrics.InstrumentedConnection if SQL_METRICS_ENABLED else sqlite3.Connection
+    # uri=True lets archive.attach_years() ATTACH archives with ?mode=ro.
+    conn = sqlite3.connect(DB_PATH, timeout=SQLITE_BUSY_TIMEOUT, factory=factory, uri=True)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+@contextmanager
+def read_snapshot(years: Iterable[str] = ()) -> Iterator[Tuple[sqlite3.Connection, List[str]]]:
+    """A read-only connection pinned to one snapshot, with the archives of ``years`` attached.
+
+    For long reads (exports, analytics): every statement sees the same
+    committed state, so an import committing midway is either fully visible
+    or not at all, and in WAL mode the open read transaction never blocks
+    the writer. Yields ``(conn, schemas)`` for archive.union_all().
+    """
+    factory = metrics.InstrumentedConnection if SQL_METRICS_ENABLED else sqlite3.Connection
+    conn = sqlite3.connect(
+        f"file:{urllib.parse.quote(str(Path(DB_PATH).resolve()))}?mode=ro",
+        timeout=SQLITE_BUSY_TIMEOUT,
+        factory=factory,
+        uri=True,
+    )
     conn.row_factory = sqlite3.Row
+    try:
+        # ATTACH is not allowed inside a transaction.
+        schemas = archive.attach_years(conn, ARCHIVE_DIR, years)
+        conn.execute("BEGIN")
+        # A deferred transaction takes its snapshot at the first read.
+        conn.execute("SELECT 1 FROM main.app_state LIMIT 1").fetchone()
+        yield conn, schemas
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def get_write_connection() -> sqlite3.Connection:
+    conn = get_connection()
+    # WAL keeps readers unblocked while the writer commits; NORMAL skips the
+    # fsync per commit that WAL makes unnecessary for durability of the DB file.
+    conn.execute("PRAGMA synchronous=NORMAL")
     return conn
 
 
+T = TypeVar("T")
+
+
+def bump_data_version(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        "UPDATE app_state SET value = CAST(value AS INTEGER) + 1, updated_at = ? WHERE key = ?",
+        (datetime.now().isoformat(timespec="seconds"), DATA_VERSION_KEY),
+    )
+
+
+# Set by writer jobs that change enrollment rows or session start dates, i.e.
+# anything per-year enrollment analytics read; the batch's commit then bumps
+# app_state.enrollment_version once. A job that sets it and then fails only
+# costs one spurious cache invalidation.
+enrollment_changed = threading.Event()
+
+
+def before_commit(conn: sqlite3.Connection) -> None:
+    bump_data_version(conn)
+    if enrollment_changed.is_set():
+        enrollment_changed.clear()
+        analytics.bump_enrollment_version(conn)
+
+
+writer = SQLiteWriter(get_write_connection, logger=app.logger, before_commit=before_commit)
+
+
+def run_write(fn: Callable[[sqlite3.Connection], T]) -> T:
+    """Run ``fn(conn)`` on the single writer thread and return its result.
+
+    All INSERT/UPDATE/DELETE statements go through here so concurrent requests
+    queue instead of failing with ``database is locked``. ``fn`` runs inside a
+    transaction shared with other queued jobs and must not commit.
+    """
+    return writer.run(fn)
+
+
 def initialize_database() -> None:
     with get_connection() as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS person (
@@ -95,11 +225,10 @@ def initialize_database() -> None:
             )
             """
         )
-        columns = {
-            row["name"] for row in conn.execute("PRAGMA table_info(training_session)").fetchall()
-        }
-        if "training_goal" not in columns:
-            conn.execute("ALTER TABLE training_session ADD COLUMN training_goal TEXT")
+        add_column_if_missing(conn, "training_session", "training_goal", "TEXT")
+        # Set when a duplicate person is merged; the row is kept so its phone
+        # still resolves to the surviving person on later imports.
+        add_column_if_missing(conn, "person", "merged_into", "INTEGER")
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS enrollment (
@@ -192,6 +321,175 @@ def initialize_database() -> None:
             )
             """
         )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS app_state (
+                key TEXT PRIMARY KEY,
+                value TEXT,
+                updated_at TEXT
+            )
+            """
+        )
+        conn.execute(
+            "INSERT OR IGNORE INTO app_state (key, value, updated_at) VALUES (?, '0', ?)",
+            (DATA_VERSION_KEY, datetime.now().isoformat(timespec="seconds")),
+        )
+        conn.execute(
+            "INSERT OR IGNORE INTO app_state (key, value, updated_at) VALUES ('enrollment_version', '0', ?)",
+            (datetime.now().isoformat(timespec="seconds"),),
+        )
+        conn.execute(
+            "INSERT OR IGNORE INTO app_state (key, value, updated_at) VALUES (?, '', ?)",
+            (LAST_BACKUP_KEY, datetime.now().isoformat(timespec="seconds")),
+        )
+        for statement in blobstore.SCHEMA_STATEMENTS:
+            conn.execute(statement)
+        conn.execute(archive.REGISTRY_SCHEMA)
+        conn.execute(checkpoint.SCHEMA)
+        for statement in usage.SCHEMA_STATEMENTS:
+            conn.execute(statement)
+        # A restart may ship different response shapes; invalidate cached lists.
+        bump_data_version(conn)
+        initialize_counters(conn)
+
+
+def add_column_if_missing(conn: sqlite3.Connection, table: str, column: str, definition: str) -> bool:
+    columns = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+    if column in columns:
+        return False
+    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return True
+
+
+def get_state(conn: sqlite3.Connection, key: str) -> Optional[str]:
+    row = conn.execute("SELECT value FROM app_state WHERE key = ?", (key,)).fetchone()
+    return row["value"] if row else None
+
+
+def set_state(conn: sqlite3.Connection, key: str, value: Optional[str]) -> None:
+    conn.execute(
+        """
+        INSERT INTO app_state (key, value, updated_at) VALUES (?, ?, ?)
+        ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+        """,
+        (key, value, datetime.now().isoformat(timespec="seconds")),
+    )
+
+
+COUNTER_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_survey_response_count_insert
+    AFTER INSERT ON survey_response
+    BEGIN
+        UPDATE course SET survey_response_count = survey_response_count + 1
+        WHERE course_id = NEW.course_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_survey_response_count_delete
+    AFTER DELETE ON survey_response
+    BEGIN
+        UPDATE course SET survey_response_count = survey_response_count - 1
+        WHERE course_id = OLD.course_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_enrollment_count_insert
+    AFTER INSERT ON enrollment
+    BEGIN
+        UPDATE training_session SET enrollment_count = enrollment_count + 1
+        WHERE session_id = NEW.session_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_enrollment_count_delete
+    AFTER DELETE ON enrollment
+    BEGIN
+        UPDATE training_session SET enrollment_count = enrollment_count - 1
+        WHERE session_id = OLD.session_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_enrollment_count_move
+    AFTER UPDATE OF session_id ON enrollment
+    WHEN NEW.session_id IS NOT OLD.session_id
+    BEGIN
+        UPDATE training_session SET enrollment_count = enrollment_count - 1
+        WHERE session_id = OLD.session_id;
+        UPDATE training_session SET enrollment_count = enrollment_count + 1
+        WHERE session_id = NEW.session_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_course_effective_at_insert
+    AFTER INSERT ON course
+    BEGIN
+        UPDATE course SET effective_at = COALESCE(NEW.end_at, NEW.start_at, NEW.created_at)
+        WHERE course_id = NEW.course_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_course_effective_at_update
+    AFTER UPDATE OF start_at, end_at, created_at ON course
+    BEGIN
+        UPDATE course SET effective_at = COALESCE(NEW.end_at, NEW.start_at, NEW.created_at)
+        WHERE course_id = NEW.course_id;
+    END
+    """,
+)
+
+# Replaced by enrollment_changed: a per-row UPDATE of app_state for every
+# enrollment written cost more than the cache it invalidated saved.
+DROPPED_TRIGGERS = tuple(
+    f"DROP TRIGGER IF EXISTS trg_enrollment_version_{name}"
+    for name in ("insert", "delete", "update", "session_update", "session_delete")
+)
+
+
+def initialize_counters(conn: sqlite3.Connection) -> None:
+    # Counters are kept in sync by triggers inside the writing transaction;
+    # freshly added columns are backfilled once from the source tables.
+    if add_column_if_missing(conn, "course", "survey_response_count", "INTEGER NOT NULL DEFAULT 0"):
+        conn.execute(
+            """
+            UPDATE course
+            SET survey_response_count = (
+                SELECT COUNT(1) FROM survey_response sr WHERE sr.course_id = course.course_id
+            )
+            """
+        )
+    if add_column_if_missing(conn, "course", "effective_at", "TEXT"):
+        conn.execute("UPDATE course SET effective_at = COALESCE(end_at, start_at, created_at)")
+    if add_column_if_missing(conn, "training_session", "enrollment_count", "INTEGER NOT NULL DEFAULT 0"):
+        conn.execute(
+            """
+            UPDATE training_session
+            SET enrollment_count = (
+                SELECT COUNT(1) FROM enrollment e WHERE e.session_id = training_session.session_id
+            )
+            """
+        )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_course_effective_at ON course(effective_at DESC, course_id DESC)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_training_session_start_date ON training_session(start_date)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_course_start_at ON course(start_at)")
+    # Matches the ORDER BY of query_finance_list so a page is read in index order.
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_finance_record_recent "
+        "ON finance_record(COALESCE(start_time, updated_at) DESC, record_id DESC)"
+    )
+    if add_column_if_missing(conn, "enrollment", "stat_year", "TEXT"):
+        conn.execute(f"UPDATE enrollment SET stat_year = {analytics.STAT_YEAR_SQL}")
+    # Not backfilled: delta imports hash older rows from their columns when comparing.
+    add_column_if_missing(conn, "enrollment", "row_hash", "TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_enrollment_person ON enrollment(person_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_enrollment_session ON enrollment(session_id)")
+    conn.execute(analytics.STAT_YEAR_INDEX)
+    for statement in DROPPED_TRIGGERS + COUNTER_TRIGGERS + analytics.STAT_YEAR_TRIGGERS + blobstore.REF_TRIGGERS:
+        conn.execute(statement)
 
 
 def normalize_phone(value: Any) -> Optional[str]:
@@ -222,11 +520,138 @@ def guess_column(columns: List[str], keywords: List[str]) -> Optional[str]:
     return None
 
 
-def row_has_data(values: List[Any]) -> bool:
+ENROLLMENT_FIELD_KEYWORDS: Dict[str, List[str]] = {
+    "phone": ["手机", "手机号", "电话", "mobile", "phone"],
+    "name": ["姓名", "name"],
+    "org_text": ["单位", "机构", "company", "org"],
+    "region_text": ["地区", "区域", "省", "市", "region"],
+    "title_text": ["职务", "岗位", "title"],
+    "remote_id_snapshot": ["工号", "编号", "学号", "id"],
+    "room_preference": ["住宿", "房间", "room"],
+}
+
+
+def map_enrollment_columns(columns: List[str]) -> Dict[str, Optional[str]]:
+    return {field: guess_column(columns, keywords) for field, keywords in ENROLLMENT_FIELD_KEYWORDS.items()}
+
+
+def upsert_person(conn: sqlite3.Connection, phone_norm: str, name: str, org_text: str) -> Tuple[int, bool]:
+    """Return ``(person_id, created)`` and refresh the latest name/org.
+
+    A phone that belongs to a merged duplicate resolves to the person it was
+    merged into.
+    """
+    person_row = conn.execute(
+        "SELECT COALESCE(merged_into, person_id) AS person_id FROM person WHERE phone_norm = ?",
+        (phone_norm,),
+    ).fetchone()
+    if person_row:
+        conn.execute(
+            """
+            UPDATE person
+            SET name_latest = ?, org_text_latest = ?
+            WHERE person_id = ?
+            """,
+            (name or None, org_text or None, person_row["person_id"]),
+        )
+        return person_row["person_id"], False
+    cursor = conn.execute(
+        """
+        INSERT INTO person (phone_norm, name_latest, org_text_latest)
+        VALUES (?, ?, ?)
+        """,
+        (phone_norm, name or None, org_text or None),
+    )
+    return cursor.lastrowid, True
+
+
+def insert_enrollment(
+    conn: sqlite3.Connection,
+    session_id: int,
+    person_id: int,
+    fields: Dict[str, Any],
+    source_file: str,
+    source_sheet: Optional[str],
+    row_hash: Optional[str] = None,
+) -> int:
+    enrollment_changed.set()
+    enrolled_at = datetime.now().isoformat(timespec="seconds")
+    cursor = conn.execute(
+        f"""
+        INSERT INTO enrollment (
+            session_id,
+            person_id,
+            enrolled_at,
+            name_snapshot,
+            org_text,
+            region_text,
+            title_text,
+            remote_id_snapshot,
+            room_preference,
+            source_file,
+            source_sheet,
+            row_hash,
+            stat_year
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, {analytics.STAT_YEAR_VALUE_SQL})
+        """,
+        (
+            session_id,
+            person_id,
+            enrolled_at,
+            fields.get("name") or None,
+            fields.get("org_text") or None,
+            fields.get("region_text") or None,
+            fields.get("title_text") or None,
+            fields.get("remote_id_snapshot") or None,
+            fields.get("room_preference") or None,
+            source_file,
+            source_sheet,
+            row_hash,
+            session_id,
+            enrolled_at,
+        ),
+    )
+    return cursor.lastrowid
+
+
+def update_enrollment(
+    conn: sqlite3.Connection,
+    enrollment_id: int,
+    fields: Dict[str, Any],
+    source_file: str,
+    source_sheet: Optional[str],
+    row_hash: str,
+) -> None:
+    """Rewrite the imported fields of one enrollment, keeping its id and ``enrolled_at``."""
+    enrollment_changed.set()
+    conn.execute(
+        """
+        UPDATE enrollment
+        SET name_snapshot = ?, org_text = ?, region_text = ?, title_text = ?,
+            remote_id_snapshot = ?, room_preference = ?, source_file = ?, source_sheet = ?, row_hash = ?
+        WHERE enrollment_id = ?
+        """,
+        (
+            fields.get("name") or None,
+            fields.get("org_text") or None,
+            fields.get("region_text") or None,
+            fields.get("title_text") or None,
+            fields.get("remote_id_snapshot") or None,
+            fields.get("room_preference") or None,
+            source_file,
+            source_sheet,
+            row_hash,
+            enrollment_id,
+        ),
+    )
+
+
+def row_has_data(values: Sequence[Any]) -> bool:
     for value in values:
         if value is None:
             continue
-        if isinstance(value, float) and pd.isna(value):
+        if isinstance(value, float) and value != value:
             continue
         if str(value).strip() != "":
             return True
@@ -234,14 +659,115 @@ def row_has_data(values: List[Any]) -> bool:
 
 
 def save_upload(file_storage) -> Tuple[str, str]:
+    """Store an upload in the content-addressed blob store; return ``(blob_key, path)``.
+
+    The blob is registered (or its last use refreshed) right away so garbage
+    collection leaves it alone until the import that follows references it.
+    Identical content is only hashed, not written again.
+    """
     UPLOAD_DIR.mkdir(exist_ok=True)
     filename = file_storage.filename or "upload"
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", filename)
-    saved_name = f"{timestamp}_{safe_name}"
-    file_path = UPLOAD_DIR / saved_name
-    file_storage.save(file_path)
-    return saved_name, str(file_path)
+    suffix = re.sub(r"[^A-Za-z0-9.]", "", Path(filename).suffix)[:16]
+    stream = file_storage.stream
+    for _ in range(2):
+        key, sha256, size = blobstore.put(UPLOAD_DIR, stream, suffix)
+        now = datetime.now().isoformat(timespec="seconds")
+        if run_write(lambda conn: blobstore.register(conn, UPLOAD_DIR, key, sha256, size, filename, now)):
+            return key, str(blobstore.blob_path(UPLOAD_DIR, key))
+        # Collected between put() and register(); write it again.
+        stream.seek(0)
+    raise RuntimeError(f"上传文件保存失败：{filename}")
+
+
+def collect_upload_garbage(retention_days: float = UPLOAD_RETENTION_DAYS) -> Dict[str, Any]:
+    """Delete uploads nothing references any more and that were last used before the retention window."""
+    cutoff = (datetime.now() - timedelta(days=retention_days)).isoformat(timespec="seconds")
+    result: Dict[str, Any] = run_write(lambda conn: blobstore.delete_unreferenced(conn, UPLOAD_DIR, cutoff))
+    result["tmp_removed"] = blobstore.sweep_tmp(UPLOAD_DIR)
+    app.logger.info(
+        "Upload GC removed %d blobs (%d bytes), %d temp files",
+        result["deleted"], result["freed_bytes"], result["tmp_removed"],
+    )
+    return result
+
+
+def upload_gc_loop(interval_hours: float) -> None:
+    while True:
+        try:
+            collect_upload_garbage()
+        except Exception:
+            app.logger.exception("Upload GC failed")
+        time.sleep(interval_hours * 3600)
+
+
+def start_upload_gc() -> None:
+    if UPLOAD_GC_INTERVAL_HOURS <= 0:
+        return
+    threading.Thread(target=upload_gc_loop, args=(UPLOAD_GC_INTERVAL_HOURS,), name="upload-gc", daemon=True).start()
+
+
+def create_backup() -> Dict[str, Any]:
+    result = backup.create_backup(
+        DB_PATH, BACKUP_DIR, BACKUP_PAGES, BACKUP_STEP_SLEEP_MS / 1000, BACKUP_KEEP, ARCHIVE_DIR
+    )
+    app.logger.info(
+        "Backup %s: %d bytes in %.1fs (%d steps), %d archive(s), removed %s",
+        result["file"], result["size"], result["seconds"], result["steps"], len(result["archives"]),
+        result["removed"],
+    )
+    missing = [entry["year"] for entry in result["archives"] if entry.get("missing")]
+    if missing:
+        app.logger.warning("Backup %s: archive files missing for %s", result["file"], missing)
+    return result
+
+
+def claim_backup_slot(interval_hours: float) -> bool:
+    """Record a scheduled backup as started unless one started within the interval.
+
+    Every worker process runs the loop; the conditional UPDATE in app_state
+    lets only one of them take each slot.
+    """
+    now = datetime.now()
+    cutoff = (now - timedelta(hours=interval_hours)).isoformat(timespec="seconds")
+
+    def claim(conn: sqlite3.Connection) -> bool:
+        cursor = conn.execute(
+            "UPDATE app_state SET value = ?, updated_at = ? WHERE key = ? AND value < ?",
+            (now.isoformat(timespec="seconds"), now.isoformat(timespec="seconds"), LAST_BACKUP_KEY, cutoff),
+        )
+        return cursor.rowcount == 1
+
+    return run_write(claim)
+
+
+def backup_loop(interval_hours: float) -> None:
+    check_seconds = min(interval_hours * 3600, 600)
+    while True:
+        try:
+            if claim_backup_slot(interval_hours):
+                create_backup()
+        except Exception:
+            app.logger.exception("Backup failed")
+        time.sleep(check_seconds)
+
+
+def start_backups() -> None:
+    if BACKUP_INTERVAL_HOURS <= 0:
+        return
+    threading.Thread(target=backup_loop, args=(BACKUP_INTERVAL_HOURS,), name="backup", daemon=True).start()
+
+
+@contextmanager
+def temporary_upload(file_storage):
+    """Save an upload to a temporary file (for dry runs) and delete it afterwards."""
+    suffix = Path(file_storage.filename or "").suffix
+    handle, file_path = tempfile.mkstemp(suffix=suffix, prefix="training_upload_")
+    os.close(handle)
+    try:
+        file_storage.save(file_path)
+        yield file_path
+    finally:
+        os.remove(file_path)
 
 
 def compute_sha256(file_path: str) -> str:
@@ -252,10 +778,168 @@ def compute_sha256(file_path: str) -> str:
     return sha256.hexdigest()
 
 
+def conditional_on_data_version(view):
+    """Answer ``304 Not Modified`` while no write has committed since the client's copy.
+
+    The ETag combines ``app_state.data_version``, bumped once per writer
+    commit, with today's date for views whose output depends on it. The
+    version is read before the view runs, so a write racing with the view
+    only causes one extra full response.
+    """
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        with get_connection() as conn:
+            version = get_state(conn, DATA_VERSION_KEY) or "0"
+        etag = f'W/"{version}-{date.today():%Y%m%d}"'
+        if httpcache.etag_matches(request.headers.get("If-None-Match"), etag):
+            response = app.response_class(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    return wrapper
+
+
 def json_response(ok: bool, data: Any = None, error: Optional[str] = None):
     return jsonify({"ok": ok, "data": data, "error": error})
 
 
+@app.before_request
+def start_request_metrics():
+    g.metrics_started = time.perf_counter()
+    metrics.REGISTRY.request_started()
+    if PROFILING_ENABLED and profile_requested():
+        g.profile = profiler.start()
+
+
+@app.after_request
+def record_request_metrics(response):
+    profile_name = finish_request_profile()
+    if profile_name:
+        response.headers["X-Profile-File"] = profile_name
+    finish_request_metrics(response.status_code)
+    return response
+
+
+# Registered after record_request_metrics so it runs first and the
+# compression time is included in the request latency.
+@app.after_request
+def compress_response(response):
+    return httpcache.compress_response(response, request.headers.get("Accept-Encoding", ""))
+
+
+@app.teardown_request
+def teardown_request_metrics(exc: Optional[BaseException]):
+    finish_request_profile()
+    finish_request_metrics(500)
+
+
+def profile_requested() -> bool:
+    return (
+        request.headers.get("X-Profile", "") == "1"
+        or request.args.get("_profile", "") == "1"
+    )
+
+
+def finish_request_profile() -> Optional[str]:
+    profile = g.pop("profile", None)
+    if profile is None:
+        return None
+    route = request.url_rule.rule if request.url_rule else request.path
+    elapsed = time.perf_counter() - g.get("metrics_started", time.perf_counter())
+    path = profiler.stop(profile, request.method, route, elapsed)
+    app.logger.info("Profiled %s %s in %.1fms -> %s", request.method, request.path, elapsed * 1000, path.name)
+    return path.name
+
+
+def finish_request_metrics(status: int) -> None:
+    started = g.pop("metrics_started", None)
+    if started is None:
+        return
+    route = request.url_rule.rule if request.url_rule else "<unmatched>"
+    metrics.REGISTRY.request_finished(request.method, route, status, time.perf_counter() - started)
+
+
+@app.route("/api/metrics")
+def metrics_endpoint():
+    return Response(
+        metrics.REGISTRY.render_prometheus(),
+        mimetype="text/plain; version=0.0.4",
+    )
+
+
+@app.route("/api/profiles")
+def list_profiles():
+    if not PROFILING_ENABLED:
+        return json_response(False, error="未启用性能分析（TRAINING_PROFILING=1）。")
+    limit = min(200, max(1, int(request.args.get("limit", "50"))))
+    return json_response(True, profiler.list_profiles(limit))
+
+
+@app.route("/api/profiles/<name>")
+def download_profile(name: str):
+    if not PROFILING_ENABLED:
+        return json_response(False, error="未启用性能分析（TRAINING_PROFILING=1）。")
+    path = profiler.resolve(name)
+    if path is None:
+        return json_response(False, error="分析文件不存在。")
+    return send_file(path, as_attachment=True, download_name=name, mimetype="application/octet-stream")
+
+
+@app.route("/api/uploads/usage")
+def uploads_usage():
+    with get_connection() as conn:
+        return json_response(True, blobstore.usage(conn))
+
+
+@app.route("/api/backups")
+def backups_list():
+    return json_response(True, backup.list_backups(BACKUP_DIR))
+
+
+@app.route("/api/backups", methods=["POST"])
+def backups_create():
+    return json_response(True, create_backup())
+
+
+@app.route("/api/backups/verify", methods=["POST"])
+def backups_verify():
+    name = request.values.get("file", "").strip()
+    if name and (Path(name).name != name or not name.startswith(backup.PREFIX)):
+        return json_response(False, error="备份文件名非法。")
+    try:
+        path = backup.resolve_backup(BACKUP_DIR, name or None)
+    except FileNotFoundError:
+        return json_response(False, error="还没有备份。")
+    result = backup.verify_backup(path)
+    return json_response(result["ok"], result, None if result["ok"] else "备份校验未通过。")
+
+
+@app.route("/api/archive/years")
+def archive_years_list():
+    with get_connection() as conn:
+        rows = conn.execute(
+            "SELECT year, file_name, sessions, enrollments, archived_at FROM archive_year ORDER BY year"
+        ).fetchall()
+    return json_response(True, [dict(row) for row in rows])
+
+
+@app.route("/api/uploads/gc", methods=["POST"])
+def uploads_gc():
+    try:
+        retention_days = float(request.values.get("days", UPLOAD_RETENTION_DAYS))
+    except ValueError:
+        return json_response(False, error="days 非法。")
+    if retention_days < 0:
+        return json_response(False, error="days 不能为负数。")
+    return json_response(True, collect_upload_garbage(retention_days))
+
+
 @app.errorhandler(Exception)
 def handle_exception(exc: Exception):
     app.logger.exception("Unhandled exception on %s %s", request.method, request.path)
@@ -290,7 +974,8 @@ def create_session():
         notice_sha256 = compute_sha256(file_path)
 
     created_at = datetime.now().isoformat(timespec="seconds")
-    with get_connection() as conn:
+
+    def insert_session(conn: sqlite3.Connection) -> int:
         cursor = conn.execute(
             """
             INSERT INTO training_session
@@ -308,10 +993,12 @@ def create_session():
                 created_at,
             ),
         )
-        session_id = cursor.lastrowid
+        set_state(conn, LATEST_SESSION_KEY, str(cursor.lastrowid))
+        if notice_filename:
+            blobstore.add_ref(conn, notice_filename, "training_session", cursor.lastrowid)
+        return cursor.lastrowid
 
-    global LATEST_SESSION_ID
-    LATEST_SESSION_ID = session_id
+    session_id = run_write(insert_session)
     return json_response(True, {"session_id": session_id})
 
 
@@ -348,23 +1035,26 @@ def update_session():
     with get_connection() as conn:
         existing = conn.execute(
             """
-            SELECT notice_filename, notice_sha256
+            SELECT notice_filename, notice_sha256, start_date
             FROM training_session
             WHERE session_id = ?
             """,
             (session_id,),
         ).fetchone()
-        if not existing:
-            return json_response(False, error="期次不存在。")
+    if not existing:
+        return json_response(False, error="期次不存在。")
 
-        notice_filename = existing["notice_filename"]
-        notice_sha256 = existing["notice_sha256"]
-        notice_file = request.files.get("notice_file")
-        if notice_file and notice_file.filename:
-            notice_filename, file_path = save_upload(notice_file)
-            notice_sha256 = compute_sha256(file_path)
+    notice_filename = existing["notice_filename"]
+    notice_sha256 = existing["notice_sha256"]
+    notice_file = request.files.get("notice_file")
+    if notice_file and notice_file.filename:
+        notice_filename, file_path = save_upload(notice_file)
+        notice_sha256 = compute_sha256(file_path)
 
-        conn.execute(
+    def write_session(conn: sqlite3.Connection) -> bool:
+        if start_date != existing["start_date"]:
+            enrollment_changed.set()
+        cursor = conn.execute(
             """
             UPDATE training_session
             SET title = ?, start_date = ?, end_date = ?, location_text = ?, training_goal = ?,
@@ -382,9 +1072,17 @@ def update_session():
                 session_id,
             ),
         )
-
-    global LATEST_SESSION_ID
-    LATEST_SESSION_ID = session_id
+        if cursor.rowcount == 0:
+            return False
+        set_state(conn, LATEST_SESSION_KEY, str(session_id))
+        if notice_filename != existing["notice_filename"]:
+            if existing["notice_filename"]:
+                blobstore.drop_ref(conn, existing["notice_filename"], "training_session", session_id)
+            blobstore.add_ref(conn, notice_filename, "training_session", session_id)
+        return True
+
+    if not run_write(write_session):
+        return json_response(False, error="期次不存在。")
     return json_response(True, {"session_id": session_id})
 
 
@@ -394,12 +1092,18 @@ def resolve_session_id(session_id_value: Optional[str]) -> Optional[int]:
             return int(session_id_value)
         except ValueError:
             return None
-    return LATEST_SESSION_ID
+    # Stored in the database rather than a module global so every worker
+    # thread or process sees the session most recently created or edited.
+    with get_connection() as conn:
+        value = get_state(conn, LATEST_SESSION_KEY)
+    return int(value) if value and value.isdigit() else None
 
 
 def extract_notice_text(file_path: str) -> str:
     suffix = Path(file_path).suffix.lower()
     if suffix == ".docx":
+        from docx import Document
+
         doc = Document(file_path)
         lines: List[str] = []
         for p in doc.paragraphs:
@@ -515,9 +1219,9 @@ def parse_notice_api():
     if not api_key:
         return json_response(False, error="请填写百度千帆 API Key（Bearer）。")
 
-    _, file_path = save_upload(notice_file)
     try:
-        notice_text = extract_notice_text(file_path)
+        with temporary_upload(notice_file) as file_path:
+            notice_text = extract_notice_text(file_path)
         if not notice_text.strip():
             return json_response(False, error="通知文件未读取到有效文本，请检查文档内容。")
         parsed = parse_notice_with_baidu_llm(notice_text, api_key)
@@ -536,140 +1240,364 @@ def parse_notice_api():
         return json_response(False, error=f"解析失败：{exc}")
 
 
-def import_excel(file_path: str, source_file: str, session_id: int) -> Dict[str, Any]:
-    sheets = pd.read_excel(file_path, sheet_name=None, dtype=str, engine="openpyxl")
-    sheet_count = len(sheets)
-    valid_rows = 0
-    new_person_count = 0
-    new_enrollment_count = 0
-    exceptions: List[Dict[str, Any]] = []
+def iter_enrollment_sheets(sheets: Dict[str, readers.Sheet], exceptions: List[Dict[str, Any]]):
+    """Yield ``(sheet_name, row_index, phone_norm, fields)`` for every usable row of ``sheets``.
 
-    with get_connection() as conn:
-        try:
-            for sheet_name, df in sheets.items():
-                if df is None or df.empty:
-                    continue
-                df = df.fillna("")
-                columns = list(df.columns)
-                phone_col = guess_column(
-                    columns, ["手机", "手机号", "电话", "mobile", "phone"]
+    Sheets without a phone column and rows with an empty or invalid phone are
+    recorded in ``exceptions`` and skipped. Shared by real and dry-run imports
+    so both report exactly the same rows.
+    """
+    for sheet_name, sheet in sheets.items():
+        if not sheet.rows:
+            continue
+        columns = sheet.columns
+        column_map = map_enrollment_columns(columns)
+        phone_col = column_map["phone"]
+        if not phone_col:
+            exceptions.append(
+                {
+                    "sheet": sheet_name,
+                    "row": None,
+                    "reason": "未找到手机号列",
+                }
+            )
+            continue
+
+        column_index = {col: idx for idx, col in enumerate(columns)}
+        for row_index, row in enumerate(sheet.rows, start=2):
+            if not row_has_data(row):
+                continue
+            phone_raw = row[column_index[phone_col]]
+            phone_norm = normalize_phone(phone_raw)
+            if not phone_norm:
+                exceptions.append(
+                    {
+                        "sheet": sheet_name,
+                        "row": row_index,
+                        "reason": "手机号空或非法",
+                    }
                 )
-                if not phone_col:
-                    exceptions.append(
-                        {
-                            "sheet": sheet_name,
-                            "row": None,
-                            "reason": "未找到手机号列",
-                        }
-                    )
-                    continue
-
-                name_col = guess_column(columns, ["姓名", "name"])
-                org_col = guess_column(columns, ["单位", "机构", "company", "org"])
-                region_col = guess_column(columns, ["地区", "区域", "省", "市", "region"])
-                title_col = guess_column(columns, ["职务", "岗位", "title"])
-                remote_id_col = guess_column(columns, ["工号", "编号", "学号", "id"])
-                room_col = guess_column(columns, ["住宿", "房间", "room"])
-
-                column_index = {col: idx for idx, col in enumerate(columns)}
-                for row_index, row in enumerate(
-                    df.itertuples(index=False, name=None), start=2
-                ):
-                    values = list(row)
-                    if not row_has_data(values):
-                        continue
-                    phone_raw = row[column_index[phone_col]]
-                    phone_norm = normalize_phone(phone_raw)
-                    if not phone_norm:
-                        exceptions.append(
-                            {
-                                "sheet": sheet_name,
-                                "row": row_index,
-                                "reason": "手机号空或非法",
-                            }
-                        )
-                        continue
-
-                    name = row[column_index[name_col]] if name_col else ""
-                    org_text = row[column_index[org_col]] if org_col else ""
-                    region_text = row[column_index[region_col]] if region_col else ""
-                    title_text = row[column_index[title_col]] if title_col else ""
-                    remote_id_snapshot = (
-                        row[column_index[remote_id_col]] if remote_id_col else ""
-                    )
-                    room_preference = row[column_index[room_col]] if room_col else ""
+                continue
 
-                    cursor = conn.execute(
-                        "SELECT person_id FROM person WHERE phone_norm = ?",
-                        (phone_norm,),
-                    )
-                    person_row = cursor.fetchone()
-                    if person_row:
-                        person_id = person_row["person_id"]
-                        conn.execute(
-                            """
-                            UPDATE person
-                            SET name_latest = ?, org_text_latest = ?
-                            WHERE person_id = ?
-                            """,
-                            (name or None, org_text or None, person_id),
-                        )
-                    else:
-                        cursor = conn.execute(
-                            """
-                            INSERT INTO person (phone_norm, name_latest, org_text_latest)
-                            VALUES (?, ?, ?)
-                            """,
-                            (phone_norm, name or None, org_text or None),
-                        )
-                        person_id = cursor.lastrowid
-                        new_person_count += 1
-
-                    conn.execute(
-                        """
-                        INSERT INTO enrollment (
-                            session_id,
-                            person_id,
-                            enrolled_at,
-                            name_snapshot,
-                            org_text,
-                            region_text,
-                            title_text,
-                            remote_id_snapshot,
-                            room_preference,
-                            source_file,
-                            source_sheet
-                        )
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        """,
-                        (
-                            session_id,
-                            person_id,
-                            datetime.now().isoformat(timespec="seconds"),
-                            name or None,
-                            org_text or None,
-                            region_text or None,
-                            title_text or None,
-                            remote_id_snapshot or None,
-                            room_preference or None,
-                            source_file,
-                            sheet_name,
-                        ),
-                    )
-                    new_enrollment_count += 1
-                    valid_rows += 1
-            conn.commit()
-        except Exception:
-            conn.rollback()
-            raise
+            fields = {
+                field: row[column_index[col]] if col else ""
+                for field, col in column_map.items()
+                if field != "phone"
+            }
+            yield sheet_name, row_index, phone_norm, fields
 
-    return {
+
+def record_run_usage(run_usage: usage.RunUsage, error: Optional[str] = None) -> Dict[str, Any]:
+    """Finish ``run_usage`` and store it in import_run; a failure to store is only logged."""
+    summary = run_usage.finish(error)
+    try:
+        summary["run_id"] = run_write(lambda conn: usage.record(conn, summary))
+    except Exception:
+        app.logger.exception("Recording %s run usage failed", run_usage.kind)
+    return summary
+
+
+def run_chunked_import(
+    kind: str,
+    source_file: str,
+    target_id: int,
+    items: Iterable[Tuple[Optional[str], Optional[int], Any]],
+    write_chunk: Callable[[sqlite3.Connection, List[Any]], Dict[str, int]],
+    counters: Dict[str, int],
+    on_claim: Optional[Callable[[sqlite3.Connection], None]] = None,
+    on_finish: Optional[Callable[[sqlite3.Connection], None]] = None,
+    run_usage: Optional[usage.RunUsage] = None,
+    resume: bool = True,
+) -> Dict[str, Any]:
+    """Write ``items`` (``(sheet, row_index, payload)``) in writer jobs of IMPORT_CHUNK_ROWS.
+
+    Each job writes one chunk and advances the import's checkpoint, so the
+    rows and the progress record commit together and the transaction stays
+    bounded. If the same file was imported into the same target before and
+    did not finish, the rows it already committed are skipped and the
+    receipt ``counters`` (updated in place with what ``write_chunk``
+    returns) continue from the saved ones. On failure the checkpoint is
+    marked failed and the error says where a retry will resume. With
+    ``resume=False`` a retry starts from the first row again, for imports
+    whose later chunks depend on state built by the earlier ones.
+
+    With ``run_usage``, time spent producing items counts as ``normalize``
+    and writer time outside ``write_chunk`` (queueing and COMMIT) as
+    ``commit``; ``write_chunk`` times its own phases.
+    """
+    key = checkpoint.import_key(kind, source_file, target_id)
+
+    def claim(conn: sqlite3.Connection) -> Dict[str, Any]:
+        now = datetime.now()
+        stale_before = (now - timedelta(seconds=IMPORT_STALE_SECONDS)).isoformat(timespec="seconds")
+        state = checkpoint.claim(conn, kind, source_file, target_id, now.isoformat(timespec="seconds"), stale_before)
+        if on_claim is not None:
+            on_claim(conn)
+        return state
+
+    state = run_write(claim)
+    resumed_from = state["rows_done"] if resume else 0
+    if resume:
+        for name, value in state["counters"].items():
+            counters[name] = value
+    rows_done = resumed_from
+    chunks = 0
+    pending: List[Any] = []
+    last_position: Tuple[Optional[str], Optional[int]] = (None, None)
+
+    def flush() -> None:
+        nonlocal rows_done, chunks
+        chunk = list(pending)
+        pending.clear()
+        done_after = rows_done + len(chunk)
+        sheet, row_index = last_position
+
+        job_seconds = 0.0
+
+        def write(conn: sqlite3.Connection) -> Dict[str, int]:
+            nonlocal job_seconds
+            started = time.perf_counter()
+            deltas = write_chunk(conn, chunk)
+            merged = {name: counters.get(name, 0) + deltas.get(name, 0) for name in set(counters) | set(deltas)}
+            checkpoint.advance(
+                conn, key, done_after, sheet, row_index, merged, datetime.now().isoformat(timespec="seconds")
+            )
+            job_seconds = time.perf_counter() - started
+            return merged
+
+        started = time.perf_counter()
+        counters.update(run_write(write))
+        if run_usage is not None:
+            run_usage.add("commit", time.perf_counter() - started - job_seconds)
+            run_usage.rows += len(chunk)
+        rows_done = done_after
+        chunks += 1
+
+    try:
+        iterator = iter(enumerate(items, start=1))
+        while True:
+            started = time.perf_counter()
+            entry = next(iterator, None)
+            if run_usage is not None:
+                run_usage.add("normalize", time.perf_counter() - started)
+            if entry is None:
+                break
+            position, (sheet, row_index, payload) = entry
+            if position <= resumed_from:
+                continue
+            pending.append(payload)
+            last_position = (sheet, row_index)
+            if len(pending) >= IMPORT_CHUNK_ROWS:
+                flush()
+        if pending:
+            flush()
+
+        def finish(conn: sqlite3.Connection) -> None:
+            if on_finish is not None:
+                on_finish(conn)
+            checkpoint.finish(conn, key, datetime.now().isoformat(timespec="seconds"))
+
+        run_write(finish)
+    except Exception as exc:
+        error = str(exc)
+        run_write(lambda conn: checkpoint.fail(conn, key, error, datetime.now().isoformat(timespec="seconds")))
+        retry = "将从断点继续" if resume else "将重新比对全部行"
+        raise RuntimeError(f"{exc}（已提交 {rows_done} 行，重新导入同一文件{retry}）") from exc
+    return {"chunks": chunks, "resumed_from": resumed_from}
+
+
+def import_excel(
+    file_path: str,
+    source_file: str,
+    session_id: int,
+    dry_run: bool = False,
+    delta_only: bool = False,
+    retract: bool = False,
+) -> Dict[str, Any]:
+    """Import every sheet of an enrollment workbook into ``session_id``.
+
+    Rows are written in checkpointed chunks (run_chunked_import); importing
+    the same file into the same session again after a failure resumes.
+
+    With ``delta_only`` the workbook is taken as a revision of the session's
+    roster: each row is compared by ``row_hash`` with the session's
+    enrollment of the same person (app/importer/delta.py) and only new and
+    changed rows are written. ``retract`` (implies ``delta_only``) also
+    deletes the session's enrollments no row matched, so the workbook must
+    then be the complete roster.
+
+    With ``dry_run`` nothing is written: rows go through the same parsing and
+    normalisation, and new people are counted against the set of known
+    phones, loaded in one query.
+    """
+    delta_only = delta_only or retract
+    run_usage = usage.RunUsage("enrollment", source_file, session_id, dry_run)
+    try:
+        receipt = _import_excel(file_path, source_file, session_id, dry_run, run_usage, delta_only, retract)
+    except Exception as exc:
+        record_run_usage(run_usage, str(exc))
+        raise
+    receipt["usage"] = record_run_usage(run_usage)
+    return receipt
+
+
+def _import_excel(
+    file_path: str,
+    source_file: str,
+    session_id: int,
+    dry_run: bool,
+    run_usage: usage.RunUsage,
+    delta_only: bool = False,
+    retract: bool = False,
+) -> Dict[str, Any]:
+    counters = {"valid_rows": 0, "new_person_count": 0, "new_enrollment_count": 0}
+    if delta_only:
+        counters.update({"updated_enrollment_count": 0, "unchanged_count": 0})
+    if retract:
+        counters["retracted_count"] = 0
+    comparison = delta.EnrollmentDelta(session_id)
+    with run_usage.phase("read"):
+        sheets = readers.read_workbook(file_path)
+    sheet_count = len(sheets)
+    exceptions: List[Dict[str, Any]] = []
+
+    def write_chunk(conn: sqlite3.Connection, chunk: List[Tuple[str, str, Dict[str, Any]]]) -> Dict[str, int]:
+        new_people = 0
+        upsert_seconds = 0.0
+        insert_seconds = 0.0
+        for sheet_name, phone_norm, fields in chunk:
+            started = time.perf_counter()
+            person_id, created = upsert_person(conn, phone_norm, fields["name"], fields["org_text"])
+            upserted = time.perf_counter()
+            new_people += int(created)
+            row_hash = delta.row_hash(session_id, phone_norm, fields)
+            insert_enrollment(conn, session_id, person_id, fields, source_file, sheet_name, row_hash)
+            upsert_seconds += upserted - started
+            insert_seconds += time.perf_counter() - upserted
+        run_usage.add("person_upsert", upsert_seconds)
+        run_usage.add("enrollment_insert", insert_seconds)
+        return {"valid_rows": len(chunk), "new_person_count": new_people, "new_enrollment_count": len(chunk)}
+
+    def write_delta_chunk(conn: sqlite3.Connection, chunk: List[Tuple[str, str, Dict[str, Any]]]) -> Dict[str, int]:
+        deltas = {
+            "valid_rows": len(chunk),
+            "new_person_count": 0,
+            "new_enrollment_count": 0,
+            "updated_enrollment_count": 0,
+            "unchanged_count": 0,
+        }
+        started = time.perf_counter()
+        if comparison.existing is None:
+            comparison.load(conn)
+        compare_seconds = time.perf_counter() - started
+        upsert_seconds = 0.0
+        insert_seconds = 0.0
+        for sheet_name, phone_norm, fields in chunk:
+            started = time.perf_counter()
+            person_row = conn.execute(
+                "SELECT COALESCE(merged_into, person_id) FROM person WHERE phone_norm = ?", (phone_norm,)
+            ).fetchone()
+            action, enrollment_id, row_hash = comparison.match(
+                person_row[0] if person_row else None, phone_norm, fields
+            )
+            compared = time.perf_counter()
+            compare_seconds += compared - started
+            if action == delta.UNCHANGED:
+                deltas["unchanged_count"] += 1
+                continue
+            person_id, created = upsert_person(conn, phone_norm, fields["name"], fields["org_text"])
+            upserted = time.perf_counter()
+            deltas["new_person_count"] += int(created)
+            if action == delta.UPDATE:
+                update_enrollment(conn, enrollment_id, fields, source_file, sheet_name, row_hash)
+                deltas["updated_enrollment_count"] += 1
+            else:
+                insert_enrollment(conn, session_id, person_id, fields, source_file, sheet_name, row_hash)
+                deltas["new_enrollment_count"] += 1
+            upsert_seconds += upserted - compared
+            insert_seconds += time.perf_counter() - upserted
+        run_usage.add("compare", compare_seconds)
+        run_usage.add("person_upsert", upsert_seconds)
+        run_usage.add("enrollment_insert", insert_seconds)
+        return deltas
+
+    def retract_unmatched(conn: sqlite3.Connection) -> None:
+        if comparison.existing is None:
+            # The workbook had no usable rows; refuse to empty the session.
+            return
+        enrollment_changed.set()
+        cursor = conn.execute(
+            "DELETE FROM enrollment WHERE enrollment_id IN (SELECT value FROM json_each(?))",
+            (json.dumps(comparison.unmatched_ids()),),
+        )
+        counters["retracted_count"] = cursor.rowcount
+
+    def check_rows(conn: sqlite3.Connection) -> None:
+        known_phones = {row[0] for row in conn.execute("SELECT phone_norm FROM person")}
+        for _, _, phone_norm, _ in iter_enrollment_sheets(sheets, exceptions):
+            if phone_norm not in known_phones:
+                known_phones.add(phone_norm)
+                counters["new_person_count"] += 1
+            counters["new_enrollment_count"] += 1
+            counters["valid_rows"] += 1
+
+    def check_delta_rows(conn: sqlite3.Connection) -> None:
+        people = {
+            row[0]: row[1] for row in conn.execute("SELECT phone_norm, COALESCE(merged_into, person_id) FROM person")
+        }
+        comparison.load(conn)
+        for _, _, phone_norm, fields in iter_enrollment_sheets(sheets, exceptions):
+            counters["valid_rows"] += 1
+            action, _, _ = comparison.match(people.get(phone_norm), phone_norm, fields)
+            if action == delta.UNCHANGED:
+                counters["unchanged_count"] += 1
+                continue
+            if phone_norm not in people:
+                people[phone_norm] = None
+                counters["new_person_count"] += 1
+            if action == delta.UPDATE:
+                counters["updated_enrollment_count"] += 1
+            else:
+                counters["new_enrollment_count"] += 1
+        if retract and counters["valid_rows"]:
+            counters["retracted_count"] = len(comparison.unmatched_ids())
+
+    progress: Dict[str, Any] = {}
+    if dry_run:
+        with get_connection() as conn, run_usage.phase("normalize"):
+            (check_delta_rows if delta_only else check_rows)(conn)
+        run_usage.rows = counters["valid_rows"]
+    else:
+        items = (
+            (sheet_name, row_index, (sheet_name, phone_norm, fields))
+            for sheet_name, row_index, phone_norm, fields in iter_enrollment_sheets(sheets, exceptions)
+        )
+        # A delta import compares against the whole session and its retraction
+        # needs every row matched in one run, so a retry starts over instead
+        # of resuming; rows an interrupted run committed then compare as unchanged.
+        progress = run_chunked_import(
+            "enrollment_delta" if delta_only else "enrollment",
+            source_file,
+            session_id,
+            items,
+            write_delta_chunk if delta_only else write_chunk,
+            counters,
+            on_claim=lambda conn: blobstore.add_ref(conn, source_file, "enrollment", session_id),
+            on_finish=retract_unmatched if retract else None,
+            run_usage=run_usage,
+            resume=not delta_only,
+        )
+
+    receipt = {
         "sheet_count": sheet_count,
-        "valid_rows": valid_rows,
-        "new_person_count": new_person_count,
-        "new_enrollment_count": new_enrollment_count,
+        **counters,
         "exceptions": exceptions,
     }
+    if dry_run:
+        receipt["dry_run"] = True
+    elif progress["resumed_from"]:
+        receipt["resumed_from"] = progress["resumed_from"]
+    return receipt
 
 
 @app.route("/api/enrollment/import", methods=["POST"])
@@ -677,10 +1605,10 @@ def import_enrollment():
     excel_file = request.files.get("excel_file")
     if not excel_file or not excel_file.filename:
         return json_response(False, error="请上传报名 Excel 文件。")
-    if not is_excel_filename(excel_file.filename):
+    if not is_enrollment_filename(excel_file.filename):
         return json_response(
             False,
-            error="仅支持 Excel 文件（.xlsx/.xls/.xlsm/.xltx/.xltm），请重新上传。",
+            error="仅支持 Excel 文件（.xlsx/.xls/.xlsm/.xltx/.xltm）或 CSV 文件，请重新上传。",
         )
 
     session_id_value = request.form.get("session_id")
@@ -694,15 +1622,218 @@ def import_enrollment():
     if not cursor.fetchone():
         return json_response(False, error="期次不存在，请重新创建。")
 
+    delta_only = request.values.get("delta", "") == "1"
+    retract = request.values.get("retract", "") == "1"
+    if request.values.get("dry_run", "") == "1":
+        with temporary_upload(excel_file) as file_path:
+            try:
+                receipt = import_excel(
+                    file_path, excel_file.filename, session_id, dry_run=True, delta_only=delta_only, retract=retract
+                )
+            except Exception as exc:
+                return json_response(False, error=f"校验失败: {exc}")
+        return json_response(True, receipt)
+
     source_file, file_path = save_upload(excel_file)
     try:
-        receipt = import_excel(file_path, source_file, session_id)
+        receipt = import_excel(file_path, source_file, session_id, delta_only=delta_only, retract=retract)
     except Exception as exc:
         return json_response(False, error=f"导入失败: {exc}")
 
     return json_response(True, receipt)
 
 
+INGEST_CHUNK_SIZE = 1000
+INGEST_MAX_LINE_BYTES = 64 * 1024
+INGEST_MAX_ERRORS = 1000
+
+
+def iter_ndjson_lines(stream, max_line_bytes: int = INGEST_MAX_LINE_BYTES):
+    """Yield ``(line_no, text_or_None)`` from a byte stream without buffering the body.
+
+    Over-long lines are drained up to the next newline and yielded as ``None``
+    so the caller can report them and carry on.
+    """
+    line_no = 0
+    while True:
+        raw = stream.readline(max_line_bytes + 1)
+        if not raw:
+            return
+        line_no += 1
+        if len(raw) > max_line_bytes and not raw.endswith(b"\n"):
+            while raw and not raw.endswith(b"\n"):
+                raw = stream.readline(max_line_bytes)
+            yield line_no, None
+            continue
+        yield line_no, raw.decode("utf-8-sig" if line_no == 1 else "utf-8", errors="replace")
+
+
+def ingest_enrollment_stream(stream, session_id: int, source: str) -> Dict[str, Any]:
+    """Parse NDJSON enrollment records and write them in chunks of ``INGEST_CHUNK_SIZE``.
+
+    Each record is a JSON object whose keys are matched with the same
+    keywords as Excel headers (``phone``/``手机号``, ``name``/``姓名``, ...).
+    A record may carry ``session_id``; one that differs from ``session_id``
+    is reported as a bad line rather than written elsewhere. Bad lines are
+    reported and skipped; chunks that were written stay committed even if
+    the client disconnects midway.
+
+    The run's cost is recorded in import_run as kind ``ingest``, including
+    runs that fail partway.
+    """
+    run_usage = usage.RunUsage("ingest", source, session_id)
+    try:
+        receipt = _ingest_enrollment_stream(stream, session_id, source, run_usage)
+    except Exception as exc:
+        record_run_usage(run_usage, str(exc))
+        raise
+    receipt["usage"] = record_run_usage(run_usage)
+    return receipt
+
+
+def _ingest_enrollment_stream(stream, session_id: int, source: str, run_usage: usage.RunUsage) -> Dict[str, Any]:
+    receipt: Dict[str, Any] = {
+        "received": 0,
+        "valid_rows": 0,
+        "new_person_count": 0,
+        "new_enrollment_count": 0,
+        "chunks": 0,
+        "error_count": 0,
+        "errors": [],
+    }
+    column_maps: Dict[Tuple[str, ...], Dict[str, Optional[str]]] = {}
+    pending: List[Tuple[str, Dict[str, Any]]] = []
+
+    def add_error(line_no: int, reason: str) -> None:
+        receipt["error_count"] += 1
+        if len(receipt["errors"]) < INGEST_MAX_ERRORS:
+            receipt["errors"].append({"line": line_no, "reason": reason})
+
+    def flush() -> None:
+        chunk = list(pending)
+        pending.clear()
+        job_seconds = 0.0
+
+        def write_chunk(conn: sqlite3.Connection) -> int:
+            nonlocal job_seconds
+            job_started = time.perf_counter()
+            created_people = 0
+            upsert_seconds = 0.0
+            insert_seconds = 0.0
+            for phone_norm, fields in chunk:
+                started = time.perf_counter()
+                person_id, created = upsert_person(conn, phone_norm, fields["name"], fields["org_text"])
+                upserted = time.perf_counter()
+                created_people += int(created)
+                row_hash = delta.row_hash(session_id, phone_norm, fields)
+                insert_enrollment(conn, session_id, person_id, fields, source, None, row_hash)
+                upsert_seconds += upserted - started
+                insert_seconds += time.perf_counter() - upserted
+            run_usage.add("person_upsert", upsert_seconds)
+            run_usage.add("enrollment_insert", insert_seconds)
+            job_seconds = time.perf_counter() - job_started
+            return created_people
+
+        started = time.perf_counter()
+        receipt["new_person_count"] += run_write(write_chunk)
+        run_usage.add("commit", time.perf_counter() - started - job_seconds)
+        run_usage.rows += len(chunk)
+        receipt["new_enrollment_count"] += len(chunk)
+        receipt["valid_rows"] += len(chunk)
+        receipt["chunks"] += 1
+
+    def parse_line(line_no: int, text: Optional[str]) -> Optional[Tuple[str, Dict[str, Any]]]:
+        if text is None:
+            receipt["received"] += 1
+            add_error(line_no, "行过长")
+            return None
+        if not text.strip():
+            return None
+        receipt["received"] += 1
+        try:
+            record = json.loads(text)
+        except ValueError as exc:
+            add_error(line_no, f"JSON 解析失败：{exc.msg}")
+            return None
+        if not isinstance(record, dict):
+            add_error(line_no, "每行必须是 JSON 对象")
+            return None
+        if "session_id" in record:
+            try:
+                record_session_id = int(record["session_id"])
+            except (TypeError, ValueError):
+                record_session_id = None
+            if record_session_id != session_id:
+                add_error(line_no, f"session_id {record['session_id']} 与请求参数 session_id={session_id} 不一致")
+                return None
+        keys = tuple(key for key in record if key != "session_id")
+        column_map = column_maps.get(keys)
+        if column_map is None:
+            column_map = column_maps[keys] = map_enrollment_columns(list(keys))
+        phone_norm = normalize_phone(record.get(column_map["phone"])) if column_map["phone"] else None
+        if not phone_norm:
+            add_error(line_no, "手机号空或非法")
+            return None
+        fields = {
+            field: str(record.get(col) or "").strip() if col else ""
+            for field, col in column_map.items()
+            if field != "phone"
+        }
+        return phone_norm, fields
+
+    lines = iter_ndjson_lines(stream)
+    while True:
+        started = time.perf_counter()
+        entry = next(lines, None)
+        parsed_at = time.perf_counter()
+        run_usage.add("read", parsed_at - started)
+        if entry is None:
+            break
+        line_no, text = entry
+        parsed = parse_line(line_no, text)
+        run_usage.add("normalize", time.perf_counter() - parsed_at)
+        if parsed is None:
+            continue
+        pending.append(parsed)
+        if len(pending) >= INGEST_CHUNK_SIZE:
+            flush()
+    if pending:
+        flush()
+    return receipt
+
+
+@app.route("/api/enrollment/ingest", methods=["POST"])
+def ingest_enrollment():
+    """Stream NDJSON registrations: one JSON object per line, e.g. ``{"phone": "...", "name": "..."}``.
+
+    Unlike the upload routes, ``session_id`` is required: unattended pushes
+    must not land in whichever session was created last.
+    """
+    session_id_value = request.args.get("session_id", "").strip()
+    if not session_id_value.isdigit():
+        return json_response(False, error="请在查询参数中指定 session_id。")
+    session_id = int(session_id_value)
+    with get_connection() as conn:
+        exists = conn.execute(
+            "SELECT session_id FROM training_session WHERE session_id = ?", (session_id,)
+        ).fetchone()
+    if not exists:
+        return json_response(False, error="期次不存在，请重新创建。")
+
+    source = request.args.get("source", "").strip() or "ndjson"
+    try:
+        receipt = ingest_enrollment_stream(request.stream, session_id, f"ingest:{source}")
+    except Exception as exc:
+        app.logger.exception("NDJSON enrollment ingest failed")
+        return json_response(False, error=f"导入失败: {exc}")
+    receipt["session_id"] = session_id
+    app.logger.info(
+        "NDJSON ingest session=%s received=%s written=%s errors=%s",
+        session_id, receipt["received"], receipt["valid_rows"], receipt["error_count"],
+    )
+    return json_response(True, receipt)
+
+
 
 
 def normalize_cell_text(text: str) -> str:
@@ -766,6 +1897,8 @@ def combine_date_time(day: Optional[date], time_val: Optional[str]) -> Optional[
 def parse_course_rows_from_word(
     file_path: str, default_year: int, location_text: str = "", session_id: Optional[int] = None
 ) -> List[Dict[str, Any]]:
+    from docx import Document
+
     document = Document(file_path)
     records: List[Dict[str, Any]] = []
 
@@ -822,6 +1955,8 @@ def parse_course_rows_from_word(
 def build_qr_data_uri(text: str) -> str:
     if not QR_PIL_AVAILABLE:
         raise RuntimeError("未安装 Pillow（PIL），无法生成二维码。请先安装 qrcode[pil]。")
+    import qrcode
+
     image = qrcode.make(text)
     buffer = io.BytesIO()
     image.save(buffer, format="PNG")
@@ -830,8 +1965,7 @@ def build_qr_data_uri(text: str) -> str:
 
 
 def create_today_tasks() -> Dict[str, int]:
-    today = date.today().isoformat()
-    generated = 0
+    today = date.today()
     skipped = 0
     qr_warning_logged = False
 
@@ -840,73 +1974,81 @@ def create_today_tasks() -> Dict[str, int]:
             """
             SELECT course_id, title, teacher, start_at, end_at, location
             FROM course
-            WHERE substr(start_at, 1, 10) = ?
+            WHERE start_at >= ? AND start_at < ?
             """,
-            (today,),
+            (today.isoformat(), (today + timedelta(days=1)).isoformat()),
         ).fetchall()
 
-        for course in courses:
-            course_id = course["course_id"]
-            title = course["title"] or "课程"
-            teacher = course["teacher"] or ""
-            location = course["location"] or ""
-            start_at = datetime.fromisoformat(course["start_at"]) if course["start_at"] else None
-            end_at = datetime.fromisoformat(course["end_at"]) if course["end_at"] else None
-
-            post_planned = end_at or start_at
-
-            tasks = [
-                ("post", post_planned, f"【课后问卷】请填写 {title} 的反馈问卷。"),
-            ]
+    # QR codes are rendered before the write job so the writer thread only
+    # spends time on the INSERTs.
+    planned_tasks: List[Tuple[Any, ...]] = []
+    for course in courses:
+        course_id = course["course_id"]
+        title = course["title"] or "课程"
+        teacher = course["teacher"] or ""
+        location = course["location"] or ""
+        start_at = datetime.fromisoformat(course["start_at"]) if course["start_at"] else None
+        end_at = datetime.fromisoformat(course["end_at"]) if course["end_at"] else None
+
+        post_planned = end_at or start_at
+
+        tasks = [
+            ("post", post_planned, f"【课后问卷】请填写 {title} 的反馈问卷。"),
+        ]
 
-            for task_type, planned, content in tasks:
-                if not planned:
-                    skipped += 1
-                    continue
-                planned_iso = planned.isoformat(timespec="seconds")
-                survey_link = None
-                qr_data_uri = None
-                if task_type == "post":
-                    survey_link = f"http://127.0.0.1:5000/survey/{course_id}"
-                    if not QR_PIL_AVAILABLE:
-                        qr_data_uri = None
-                        if not qr_warning_logged:
-                            app.logger.error(
-                                "QR generation disabled: Pillow(PIL) missing. Install with: pip install qrcode[pil]"
-                            )
-                            qr_warning_logged = True
-                    else:
-                        try:
-                            qr_data_uri = build_qr_data_uri(survey_link)
-                        except Exception as exc:
-                            qr_data_uri = None
-                            app.logger.exception("QR generation failed for course_id=%s: %s", course_id, exc)
-
-                try:
-                    conn.execute(
-                        """
-                        INSERT INTO message_task (
-                            course_id, task_type, planned_at, content, survey_link,
-                            qr_data_uri, status, created_at
+        for task_type, planned, content in tasks:
+            if not planned:
+                skipped += 1
+                continue
+            planned_iso = planned.isoformat(timespec="seconds")
+            survey_link = None
+            qr_data_uri = None
+            if task_type == "post":
+                survey_link = f"{PUBLIC_BASE_URL}/survey/{course_id}"
+                if not QR_PIL_AVAILABLE:
+                    qr_data_uri = None
+                    if not qr_warning_logged:
+                        app.logger.error(
+                            "QR generation disabled: Pillow(PIL) missing. Install with: pip install qrcode[pil]"
                         )
-                        VALUES (?, ?, ?, ?, ?, ?, 'pending', ?)
-                        """,
-                        (
-                            course_id,
-                            task_type,
-                            planned_iso,
-                            content,
-                            survey_link,
-                            qr_data_uri,
-                            datetime.now().isoformat(timespec="seconds"),
-                        ),
+                        qr_warning_logged = True
+                else:
+                    try:
+                        qr_data_uri = build_qr_data_uri(survey_link)
+                    except Exception as exc:
+                        qr_data_uri = None
+                        app.logger.exception("QR generation failed for course_id=%s: %s", course_id, exc)
+            planned_tasks.append((course_id, task_type, planned_iso, content, survey_link, qr_data_uri))
+
+    def insert_tasks(conn: sqlite3.Connection) -> int:
+        generated = 0
+        for course_id, task_type, planned_iso, content, survey_link, qr_data_uri in planned_tasks:
+            try:
+                conn.execute(
+                    """
+                    INSERT INTO message_task (
+                        course_id, task_type, planned_at, content, survey_link,
+                        qr_data_uri, status, created_at
                     )
-                    generated += 1
-                except sqlite3.IntegrityError:
-                    skipped += 1
-                    continue
-        conn.commit()
+                    VALUES (?, ?, ?, ?, ?, ?, 'pending', ?)
+                    """,
+                    (
+                        course_id,
+                        task_type,
+                        planned_iso,
+                        content,
+                        survey_link,
+                        qr_data_uri,
+                        datetime.now().isoformat(timespec="seconds"),
+                    ),
+                )
+                generated += 1
+            except sqlite3.IntegrityError:
+                continue
+        return generated
 
+    generated = run_write(insert_tasks)
+    skipped += len(planned_tasks) - generated
     return {"generated": generated, "skipped": skipped}
 
 
@@ -947,37 +2089,35 @@ def import_course_word():
     if not rows:
         return json_response(False, error="未在 Word 表格中识别到课程内容列，请检查表头。")
 
-    with get_connection() as conn:
-        try:
-            for row in rows:
-                conn.execute(
-                    """
-                    INSERT INTO course (
-                        title, teacher, start_at, end_at, location, session_id,
-                        source_file, created_at
-                    )
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        row["title"],
-                        row["teacher"] or None,
-                        row["start_at"],
-                        row["end_at"],
-                        row["location"] or None,
-                        row["session_id"],
-                        source_file,
-                        datetime.now().isoformat(timespec="seconds"),
-                    ),
+    def insert_courses(conn: sqlite3.Connection) -> None:
+        blobstore.add_ref(conn, source_file, "course", session_id or 0)
+        for row in rows:
+            conn.execute(
+                """
+                INSERT INTO course (
+                    title, teacher, start_at, end_at, location, session_id,
+                    source_file, created_at
                 )
-            conn.commit()
-        except Exception:
-            conn.rollback()
-            raise
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    row["title"],
+                    row["teacher"] or None,
+                    row["start_at"],
+                    row["end_at"],
+                    row["location"] or None,
+                    row["session_id"],
+                    source_file,
+                    datetime.now().isoformat(timespec="seconds"),
+                ),
+            )
 
+    run_write(insert_courses)
     return json_response(True, {"imported_courses": len(rows), "rows": rows[:20]})
 
 
 @app.route("/api/course/list")
+@conditional_on_data_version
 def list_courses():
     with get_connection() as conn:
         rows = conn.execute(
@@ -999,7 +2139,7 @@ def create_course():
     if not title:
         return json_response(False, error="课程名称不能为空。")
 
-    with get_connection() as conn:
+    def insert_course(conn: sqlite3.Connection) -> int:
         cursor = conn.execute(
             """
             INSERT INTO course (title, teacher, start_at, end_at, location, session_id, source_file, created_at)
@@ -1016,7 +2156,9 @@ def create_course():
                 datetime.now().isoformat(timespec="seconds"),
             ),
         )
-    return json_response(True, {"course_id": cursor.lastrowid})
+        return cursor.lastrowid
+
+    return json_response(True, {"course_id": run_write(insert_course)})
 
 
 @app.route("/api/course/<int:course_id>")
@@ -1045,12 +2187,8 @@ def update_course():
     if not title:
         return json_response(False, error="课程名称不能为空。")
 
-    with get_connection() as conn:
-        row = conn.execute("SELECT course_id FROM course WHERE course_id = ?", (course_id,)).fetchone()
-        if not row:
-            return json_response(False, error="课程不存在。")
-
-        conn.execute(
+    def write_course(conn: sqlite3.Connection) -> bool:
+        cursor = conn.execute(
             """
             UPDATE course
             SET title = ?, teacher = ?, start_at = ?, end_at = ?, location = ?, session_id = ?
@@ -1066,15 +2204,21 @@ def update_course():
                 course_id,
             ),
         )
+        return cursor.rowcount > 0
+
+    if not run_write(write_course):
+        return json_response(False, error="课程不存在。")
     return json_response(True, {"course_id": course_id})
 
 
 @app.route("/api/course/<int:course_id>/delete", methods=["POST"])
 def delete_course(course_id: int):
-    with get_connection() as conn:
+    def remove_course(conn: sqlite3.Connection) -> None:
         conn.execute("DELETE FROM message_task WHERE course_id = ?", (course_id,))
         conn.execute("DELETE FROM survey_response WHERE course_id = ?", (course_id,))
         conn.execute("DELETE FROM course WHERE course_id = ?", (course_id,))
+
+    run_write(remove_course)
     return json_response(True, {"course_id": course_id})
 
 
@@ -1085,42 +2229,42 @@ def generate_today_tasks():
 
 
 @app.route("/api/tasks/today")
+@conditional_on_data_version
 def list_today_tasks():
     amap_key = request.args.get("map_api_key", "").strip()
     with get_connection() as conn:
-        rows = conn.execute(
-            """
-            SELECT c.course_id,
-                   c.title AS course_title,
-                   c.teacher AS course_teacher,
-                   c.location AS course_location,
-                   c.start_at,
-                   c.end_at,
-                   mt.task_id,
-                   mt.task_type,
-                   mt.planned_at,
-                   mt.content,
-                   mt.survey_link,
-                   mt.qr_data_uri,
-                   mt.status,
-                   mt.sent_at,
-                   (
-                       SELECT COUNT(1)
-                       FROM survey_response sr
-                       WHERE sr.course_id = c.course_id
-                   ) AS survey_submitted_count,
-                   (
-                       SELECT COUNT(1)
-                       FROM enrollment e
-                       WHERE e.session_id = c.session_id
-                   ) AS enrollment_total_count
-            FROM course c
-            LEFT JOIN message_task mt
-              ON mt.course_id = c.course_id AND mt.task_type = 'post'
-            ORDER BY COALESCE(c.end_at, c.start_at, c.created_at) DESC, c.course_id DESC
-            LIMIT 3
-            """,
-        ).fetchall()
+        result = query_today_tasks(conn)
+    attach_map_info(result, amap_key)
+    return json_response(True, result)
+
+
+def query_today_tasks(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+    rows = conn.execute(
+        """
+        SELECT c.course_id,
+               c.title AS course_title,
+               c.teacher AS course_teacher,
+               c.location AS course_location,
+               c.start_at,
+               c.end_at,
+               mt.task_id,
+               mt.task_type,
+               mt.planned_at,
+               mt.content,
+               mt.survey_link,
+               mt.qr_data_uri,
+               mt.status,
+               mt.sent_at,
+               c.survey_response_count AS survey_submitted_count,
+               COALESCE(ts.enrollment_count, 0) AS enrollment_total_count
+        FROM course c
+        LEFT JOIN message_task mt
+          ON mt.course_id = c.course_id AND mt.task_type = 'post'
+        LEFT JOIN training_session ts ON ts.session_id = c.session_id
+        ORDER BY c.effective_at DESC, c.course_id DESC
+        LIMIT 3
+        """,
+    ).fetchall()
     result = []
     for row in rows:
         item = dict(row)
@@ -1131,12 +2275,21 @@ def list_today_tasks():
         if not item.get("status"):
             item["status"] = "pending"
         if not item.get("survey_link"):
-            item["survey_link"] = f"http://127.0.0.1:5000/survey/{item['course_id']}"
-        map_info = build_map_info(item.get("course_location", ""), amap_key)
+            item["survey_link"] = f"{PUBLIC_BASE_URL}/survey/{item['course_id']}"
+        result.append(item)
+    return result
+
+
+def attach_map_info(items: List[Dict[str, Any]], amap_key: str) -> None:
+    """Fill ``map_url``/``geo`` on each task; geocoding calls run in parallel."""
+    if amap_key and len(items) > 1:
+        with ThreadPoolExecutor(max_workers=len(items)) as pool:
+            infos = list(pool.map(lambda item: build_map_info(item.get("course_location", ""), amap_key), items))
+    else:
+        infos = [build_map_info(item.get("course_location", ""), amap_key) for item in items]
+    for item, map_info in zip(items, infos):
         item["map_url"] = map_info["map_url"]
         item["geo"] = map_info["geo"]
-        result.append(item)
-    return json_response(True, result)
 
 
 @app.route("/api/tasks/upsert_post", methods=["POST"])
@@ -1155,11 +2308,19 @@ def upsert_post_task():
             "SELECT course_id, start_at, end_at FROM course WHERE course_id = ?",
             (course_id,),
         ).fetchone()
-        if not course:
-            return json_response(False, error="课程不存在。")
+    if not course:
+        return json_response(False, error="课程不存在。")
 
-        planned_at = course["end_at"] or course["start_at"] or datetime.now().isoformat(timespec="seconds")
-        survey_link = f"http://127.0.0.1:5000/survey/{course_id}"
+    planned_at = course["end_at"] or course["start_at"] or datetime.now().isoformat(timespec="seconds")
+    survey_link = f"{PUBLIC_BASE_URL}/survey/{course_id}"
+    qr_data_uri = None
+    if QR_PIL_AVAILABLE:
+        try:
+            qr_data_uri = build_qr_data_uri(survey_link)
+        except Exception:
+            qr_data_uri = None
+
+    def write_task(conn: sqlite3.Connection) -> int:
         existing = conn.execute(
             "SELECT task_id FROM message_task WHERE course_id = ? AND task_type = 'post' ORDER BY task_id DESC LIMIT 1",
             (course_id,),
@@ -1173,38 +2334,32 @@ def upsert_post_task():
                 """,
                 (content, planned_at, survey_link, existing["task_id"]),
             )
-            task_id = existing["task_id"]
-        else:
-            qr_data_uri = None
-            if QR_PIL_AVAILABLE:
-                try:
-                    qr_data_uri = build_qr_data_uri(survey_link)
-                except Exception:
-                    qr_data_uri = None
-            cursor = conn.execute(
-                """
-                INSERT INTO message_task (
-                    course_id, task_type, planned_at, content, survey_link,
-                    qr_data_uri, status, created_at
-                ) VALUES (?, 'post', ?, ?, ?, ?, 'pending', ?)
-                """,
-                (
-                    course_id,
-                    planned_at,
-                    content,
-                    survey_link,
-                    qr_data_uri,
-                    datetime.now().isoformat(timespec="seconds"),
-                ),
-            )
-            task_id = cursor.lastrowid
+            return existing["task_id"]
+        cursor = conn.execute(
+            """
+            INSERT INTO message_task (
+                course_id, task_type, planned_at, content, survey_link,
+                qr_data_uri, status, created_at
+            ) VALUES (?, 'post', ?, ?, ?, ?, 'pending', ?)
+            """,
+            (
+                course_id,
+                planned_at,
+                content,
+                survey_link,
+                qr_data_uri,
+                datetime.now().isoformat(timespec="seconds"),
+            ),
+        )
+        return cursor.lastrowid
 
+    task_id = run_write(write_task)
     return json_response(True, {"course_id": course_id, "task_id": task_id})
 
 
 @app.route("/api/tasks/<int:task_id>/mark_sent", methods=["POST"])
 def mark_task_sent(task_id: int):
-    with get_connection() as conn:
+    def write_sent(conn: sqlite3.Connection) -> None:
         conn.execute(
             """
             UPDATE message_task
@@ -1213,6 +2368,8 @@ def mark_task_sent(task_id: int):
             """,
             (datetime.now().isoformat(timespec="seconds"), task_id),
         )
+
+    run_write(write_sent)
     return json_response(True, {"task_id": task_id})
 
 
@@ -1220,11 +2377,31 @@ def mark_task_sent(task_id: int):
 def recent_logs():
     lines = int(request.args.get("lines", "200"))
     lines = max(20, min(lines, 1000))
-    if not LOG_PATH.exists():
-        return json_response(True, {"log_path": str(LOG_PATH), "lines": []})
+    cursor = request.args.get("cursor", "").strip() or None
+    if cursor is not None:
+        try:
+            logtail.parse_cursor(cursor)
+        except ValueError:
+            return json_response(False, error="cursor 非法。")
+    try:
+        predicate = logtail.build_predicate(
+            request.args.get("level", "").strip() or None,
+            request.args.get("q", "").strip() or None,
+        )
+    except ValueError:
+        return json_response(False, error="日志级别非法。")
 
-    content = LOG_PATH.read_text(encoding="utf-8", errors="replace").splitlines()
-    return json_response(True, {"log_path": str(LOG_PATH), "lines": content[-lines:]})
+    return json_response(True, read_recent_logs(lines, cursor, predicate))
+
+
+def read_recent_logs(
+    lines: int, cursor: Optional[str] = None, predicate: Optional[logtail.LinePredicate] = None
+) -> Dict[str, Any]:
+    if cursor is not None:
+        content, next_cursor = logtail.read_since(LOG_PATH, LOG_BACKUP_COUNT, cursor, lines, predicate)
+    else:
+        content, next_cursor = logtail.tail(LOG_PATH, LOG_BACKUP_COUNT, lines, predicate)
+    return {"log_path": str(LOG_PATH), "lines": content, "cursor": next_cursor}
 
 
 @app.route("/survey/<int:course_id>")
@@ -1246,14 +2423,13 @@ def submit_survey():
     if not isinstance(course_id, int):
         return json_response(False, error="course_id 非法。")
 
-    with get_connection() as conn:
+    def insert_response(conn: sqlite3.Connection) -> bool:
         course = conn.execute(
             "SELECT course_id FROM course WHERE course_id = ?",
             (course_id,),
         ).fetchone()
         if not course:
-            return json_response(False, error="课程不存在。")
-
+            return False
         conn.execute(
             """
             INSERT INTO survey_response (
@@ -1270,43 +2446,28 @@ def submit_survey():
                 datetime.now().isoformat(timespec="seconds"),
             ),
         )
+        return True
+
+    if not run_write(insert_response):
+        return json_response(False, error="课程不存在。")
     return json_response(True, {"course_id": course_id})
 
 
 def fetch_yearly_stats(year: str) -> Dict[str, Any]:
-    with get_connection() as conn:
-        enrollments = conn.execute(
-            """
-            SELECT enrollment.enrollment_id, person.phone_norm, person.name_latest
-            FROM enrollment
-            JOIN person ON enrollment.person_id = person.person_id
-            JOIN training_session ON enrollment.session_id = training_session.session_id
-            WHERE COALESCE(NULLIF(substr(training_session.start_date, 1, 4), ""), substr(enrollment.enrolled_at, 1, 4)) = ?
-            """,
-            (year,),
-        ).fetchall()
+    with read_snapshot([year]) as (conn, schemas):
+        return query_yearly_stats(conn, year, schemas)
 
-    person_counts: Dict[str, Dict[str, Any]] = {}
-    for row in enrollments:
-        phone_norm = row["phone_norm"]
-        if phone_norm not in person_counts:
-            person_counts[phone_norm] = {
-                "phone_norm": phone_norm,
-                "name": row["name_latest"] or "",
-                "count": 0,
-            }
-        person_counts[phone_norm]["count"] += 1
-
-    total_enrollments = len(enrollments)
-    total_people = len(person_counts)
-    repeat_people = sum(1 for item in person_counts.values() if item["count"] >= 2)
-    top5 = sorted(person_counts.values(), key=lambda x: x["count"], reverse=True)[:5]
 
+def query_yearly_stats(conn: sqlite3.Connection, year: str, schemas: Sequence[str] = ("main",)) -> Dict[str, Any]:
+    summary = analytics.yearly_summary(conn, year, top_n=5, schemas=schemas)
     return {
-        "total_enrollments": total_enrollments,
-        "total_people": total_people,
-        "repeat_people": repeat_people,
-        "top5": top5,
+        "total_enrollments": summary["total_enrollments"],
+        "total_people": summary["total_people"],
+        "repeat_people": summary["repeat_people"],
+        "top5": [
+            {"phone_norm": item["phone_norm"], "name": item["name"], "count": item["count"]}
+            for item in summary["top"]
+        ],
     }
 
 
@@ -1326,6 +2487,156 @@ def choose_field(row: Dict[str, str], headers: Dict[str, str], aliases: List[str
     return ""
 
 
+def import_finance_file(file_path: str, saved_name: str, dry_run: bool = False) -> Dict[str, Any]:
+    """Upsert finance records by ``record_no`` in checkpointed chunks (see run_chunked_import)."""
+    run_usage = usage.RunUsage("finance", saved_name, 0, dry_run)
+    try:
+        receipt = _import_finance_file(file_path, saved_name, dry_run, run_usage)
+    except Exception as exc:
+        record_run_usage(run_usage, str(exc))
+        raise
+    receipt["usage"] = record_run_usage(run_usage)
+    return receipt
+
+
+def _import_finance_file(file_path: str, saved_name: str, dry_run: bool, run_usage: usage.RunUsage) -> Dict[str, Any]:
+    counters = {"imported": 0, "updated": 0}
+    skipped = 0
+
+    # Parsing and field mapping happen while reading, so both count as "read".
+    read_started = time.perf_counter()
+    with open(file_path, "r", encoding="utf-8-sig", errors="ignore", newline="") as handle:
+        sample = handle.read(4096)
+        handle.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",\t;")
+        except Exception:
+            dialect = csv.excel_tab
+        reader = csv.DictReader(handle, dialect=dialect)
+        if not reader.fieldnames:
+            raise ValueError("CSV 表头为空，无法导入。")
+
+        headers = {normalize_header_name(name): name for name in reader.fieldnames}
+        now = datetime.now().isoformat(timespec="seconds")
+        payloads: List[Dict[str, Any]] = []
+        line_numbers: List[int] = []
+        for row in reader:
+            if not row:
+                continue
+            record_no = choose_field(row, headers, ["编号", "id", "序号"])
+            if not record_no:
+                skipped += 1
+                continue
+
+            payloads.append(
+                {
+                    "record_no": record_no,
+                    "start_time": choose_field(row, headers, ["开始答题时间", "开始时间"]),
+                    "end_time": choose_field(row, headers, ["结束答题时间", "结束时间"]),
+                    "duration_text": choose_field(row, headers, ["答题时长", "时长"]),
+                    "name": choose_field(row, headers, ["姓名", "1.姓名"]),
+                    "phone": choose_field(row, headers, ["手机", "手机号", "2.手机"]),
+                    "id_card": choose_field(row, headers, ["身份证号", "3.身份证号"]),
+                    "org_name": choose_field(row, headers, ["工作单位", "4.工作单位"]),
+                    "job_title": choose_field(row, headers, ["职务/职称", "5.职务/职称", "职务"]),
+                    "bank_card": choose_field(row, headers, ["银行卡号", "7.银行卡号"]),
+                    "bank_name": choose_field(row, headers, ["开户行", "8.开户行"]),
+                    "city_name": choose_field(row, headers, ["地理位置市", "城市"]),
+                    "user_type": choose_field(row, headers, ["用户类型"]),
+                    "nickname": choose_field(row, headers, ["昵称"]),
+                    "source_file": saved_name,
+                    "updated_at": now,
+                    "raw_json": json.dumps(row, ensure_ascii=False),
+                }
+            )
+            line_numbers.append(reader.line_num)
+    run_usage.add("read", time.perf_counter() - read_started)
+
+    def write_records(conn: sqlite3.Connection, chunk: List[Dict[str, Any]]) -> Dict[str, int]:
+        imported = 0
+        updated = 0
+        started = time.perf_counter()
+        for payload in chunk:
+            record_no = payload["record_no"]
+            exists = conn.execute(
+                "SELECT record_id FROM finance_record WHERE record_no = ?",
+                (record_no,),
+            ).fetchone()
+            if exists:
+                conn.execute(
+                    """
+                    UPDATE finance_record
+                    SET start_time = ?, end_time = ?, duration_text = ?, name = ?, phone = ?,
+                        id_card = ?, org_name = ?, job_title = ?, bank_card = ?, bank_name = ?,
+                        city_name = ?, user_type = ?, nickname = ?, source_file = ?, updated_at = ?, raw_json = ?
+                    WHERE record_no = ?
+                    """,
+                    (
+                        payload["start_time"], payload["end_time"], payload["duration_text"], payload["name"], payload["phone"],
+                        payload["id_card"], payload["org_name"], payload["job_title"], payload["bank_card"], payload["bank_name"],
+                        payload["city_name"], payload["user_type"], payload["nickname"], payload["source_file"], payload["updated_at"], payload["raw_json"],
+                        record_no,
+                    ),
+                )
+                updated += 1
+            else:
+                conn.execute(
+                    """
+                    INSERT INTO finance_record (
+                        record_no, start_time, end_time, duration_text, name, phone, id_card,
+                        org_name, job_title, bank_card, bank_name, city_name, user_type,
+                        nickname, source_file, updated_at, raw_json
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        payload["record_no"], payload["start_time"], payload["end_time"], payload["duration_text"], payload["name"], payload["phone"], payload["id_card"],
+                        payload["org_name"], payload["job_title"], payload["bank_card"], payload["bank_name"], payload["city_name"], payload["user_type"],
+                        payload["nickname"], payload["source_file"], payload["updated_at"], payload["raw_json"],
+                    ),
+                )
+                imported += 1
+        run_usage.add("finance_upsert", time.perf_counter() - started)
+        return {"imported": imported, "updated": updated}
+
+    def check_records(conn: sqlite3.Connection) -> None:
+        known = {row[0] for row in conn.execute("SELECT record_no FROM finance_record")}
+        for payload in payloads:
+            if payload["record_no"] in known:
+                counters["updated"] += 1
+            else:
+                known.add(payload["record_no"])
+                counters["imported"] += 1
+
+    progress: Dict[str, Any] = {}
+    if dry_run:
+        with get_connection() as conn, run_usage.phase("normalize"):
+            check_records(conn)
+        run_usage.rows = len(payloads)
+    else:
+        progress = run_chunked_import(
+            "finance",
+            saved_name,
+            0,
+            (("csv", line_no, payload) for line_no, payload in zip(line_numbers, payloads)),
+            write_records,
+            counters,
+            on_claim=lambda conn: blobstore.add_ref(conn, saved_name, "finance_record", 0),
+            on_finish=blobstore.refresh_finance_refs,
+            run_usage=run_usage,
+        )
+
+    receipt = {
+        **counters,
+        "skipped": skipped,
+        "source_file": saved_name,
+    }
+    if dry_run:
+        receipt["dry_run"] = True
+    elif progress["resumed_from"]:
+        receipt["resumed_from"] = progress["resumed_from"]
+    return receipt
+
+
 @app.route("/api/finance/import", methods=["POST"])
 def import_finance_csv():
     csv_file = request.files.get("csv_file")
@@ -1334,109 +2645,59 @@ def import_finance_csv():
     if not csv_file.filename.lower().endswith(".csv"):
         return json_response(False, error="仅支持 CSV 文件。")
 
-    saved_name, file_path = save_upload(csv_file)
-    imported = 0
-    updated = 0
-    skipped = 0
-
-    try:
-        with open(file_path, "r", encoding="utf-8-sig", errors="ignore", newline="") as handle:
-            sample = handle.read(4096)
-            handle.seek(0)
+    if request.values.get("dry_run", "") == "1":
+        with temporary_upload(csv_file) as file_path:
             try:
-                dialect = csv.Sniffer().sniff(sample, delimiters=",\t;")
-            except Exception:
-                dialect = csv.excel_tab
-            reader = csv.DictReader(handle, dialect=dialect)
-            if not reader.fieldnames:
-                return json_response(False, error="CSV 表头为空，无法导入。")
-
-            headers = {normalize_header_name(name): name for name in reader.fieldnames}
-            now = datetime.now().isoformat(timespec="seconds")
-            with get_connection() as conn:
-                for row in reader:
-                    if not row:
-                        continue
-                    record_no = choose_field(row, headers, ["编号", "id", "序号"])
-                    if not record_no:
-                        skipped += 1
-                        continue
-
-                    payload = {
-                        "record_no": record_no,
-                        "start_time": choose_field(row, headers, ["开始答题时间", "开始时间"]),
-                        "end_time": choose_field(row, headers, ["结束答题时间", "结束时间"]),
-                        "duration_text": choose_field(row, headers, ["答题时长", "时长"]),
-                        "name": choose_field(row, headers, ["姓名", "1.姓名"]),
-                        "phone": choose_field(row, headers, ["手机", "手机号", "2.手机"]),
-                        "id_card": choose_field(row, headers, ["身份证号", "3.身份证号"]),
-                        "org_name": choose_field(row, headers, ["工作单位", "4.工作单位"]),
-                        "job_title": choose_field(row, headers, ["职务/职称", "5.职务/职称", "职务"]),
-                        "bank_card": choose_field(row, headers, ["银行卡号", "7.银行卡号"]),
-                        "bank_name": choose_field(row, headers, ["开户行", "8.开户行"]),
-                        "city_name": choose_field(row, headers, ["地理位置市", "城市"]),
-                        "user_type": choose_field(row, headers, ["用户类型"]),
-                        "nickname": choose_field(row, headers, ["昵称"]),
-                        "source_file": saved_name,
-                        "updated_at": now,
-                        "raw_json": json.dumps(row, ensure_ascii=False),
-                    }
+                receipt = import_finance_file(file_path, csv_file.filename, dry_run=True)
+            except Exception as exc:
+                return json_response(False, error=f"校验失败：{exc}")
+        return json_response(True, receipt)
 
-                    exists = conn.execute(
-                        "SELECT record_id FROM finance_record WHERE record_no = ?",
-                        (record_no,),
-                    ).fetchone()
-                    if exists:
-                        conn.execute(
-                            """
-                            UPDATE finance_record
-                            SET start_time = ?, end_time = ?, duration_text = ?, name = ?, phone = ?,
-                                id_card = ?, org_name = ?, job_title = ?, bank_card = ?, bank_name = ?,
-                                city_name = ?, user_type = ?, nickname = ?, source_file = ?, updated_at = ?, raw_json = ?
-                            WHERE record_no = ?
-                            """,
-                            (
-                                payload["start_time"], payload["end_time"], payload["duration_text"], payload["name"], payload["phone"],
-                                payload["id_card"], payload["org_name"], payload["job_title"], payload["bank_card"], payload["bank_name"],
-                                payload["city_name"], payload["user_type"], payload["nickname"], payload["source_file"], payload["updated_at"], payload["raw_json"],
-                                record_no,
-                            ),
-                        )
-                        updated += 1
-                    else:
-                        conn.execute(
-                            """
-                            INSERT INTO finance_record (
-                                record_no, start_time, end_time, duration_text, name, phone, id_card,
-                                org_name, job_title, bank_card, bank_name, city_name, user_type,
-                                nickname, source_file, updated_at, raw_json
-                            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                            """,
-                            (
-                                payload["record_no"], payload["start_time"], payload["end_time"], payload["duration_text"], payload["name"], payload["phone"], payload["id_card"],
-                                payload["org_name"], payload["job_title"], payload["bank_card"], payload["bank_name"], payload["city_name"], payload["user_type"],
-                                payload["nickname"], payload["source_file"], payload["updated_at"], payload["raw_json"],
-                            ),
-                        )
-                        imported += 1
-                conn.commit()
+    saved_name, file_path = save_upload(csv_file)
+    try:
+        receipt = import_finance_file(file_path, saved_name)
     except Exception as exc:
         app.logger.exception("Finance CSV import failed")
         return json_response(False, error=f"导入失败：{exc}")
 
-    return json_response(True, {
-        "imported": imported,
-        "updated": updated,
-        "skipped": skipped,
-        "source_file": saved_name,
-    })
+    return json_response(True, receipt)
+
+
+@app.route("/api/imports/runs")
+def import_runs():
+    kind = request.args.get("kind", "").strip()
+    before_id_text = request.args.get("before_id", "").strip()
+    if kind and kind not in {"enrollment", "ingest", "finance", "export"}:
+        return json_response(False, error="kind 非法。")
+    if before_id_text and not before_id_text.isdigit():
+        return json_response(False, error="before_id 非法。")
+    try:
+        limit = min(500, max(1, int(request.args.get("limit", "50"))))
+    except ValueError:
+        return json_response(False, error="limit 非法。")
+    with get_connection() as conn:
+        runs = usage.history(conn, kind or None, limit, int(before_id_text) if before_id_text else None)
+    return json_response(True, runs)
+
+
+@app.route("/api/imports/unfinished")
+def imports_unfinished():
+    with get_connection() as conn:
+        return json_response(True, checkpoint.unfinished(conn))
 
 
 @app.route("/api/finance/list")
+@conditional_on_data_version
 def finance_list():
     keyword = request.args.get("q", "").strip()
     page = max(1, int(request.args.get("page", "1")))
     page_size = min(100, max(10, int(request.args.get("page_size", "20"))))
+    # The total and the page come from one snapshot even while a finance CSV is importing.
+    with read_snapshot() as (conn, _):
+        return json_response(True, query_finance_list(conn, keyword, page, page_size))
+
+
+def query_finance_list(conn: sqlite3.Connection, keyword: str = "", page: int = 1, page_size: int = 20) -> Dict[str, Any]:
     offset = (page - 1) * page_size
 
     where_sql = ""
@@ -1446,56 +2707,177 @@ def finance_list():
         like_kw = f"%{keyword}%"
         params.extend([like_kw, like_kw, like_kw, like_kw, like_kw])
 
-    with get_connection() as conn:
-        total = conn.execute(
-            f"SELECT COUNT(1) AS c FROM finance_record {where_sql}",
-            tuple(params),
-        ).fetchone()["c"]
-        rows = conn.execute(
-            f"""
-            SELECT record_id, record_no, start_time, end_time, duration_text, name, phone,
-                   id_card, org_name, job_title, bank_card, bank_name, city_name,
-                   user_type, nickname, source_file, updated_at
-            FROM finance_record
-            {where_sql}
-            ORDER BY COALESCE(start_time, updated_at) DESC, record_id DESC
-            LIMIT ? OFFSET ?
-            """,
-            tuple(params + [page_size, offset]),
-        ).fetchall()
+    total = conn.execute(
+        f"SELECT COUNT(1) AS c FROM finance_record {where_sql}",
+        tuple(params),
+    ).fetchone()["c"]
+    rows = conn.execute(
+        f"""
+        SELECT record_id, record_no, start_time, end_time, duration_text, name, phone,
+               id_card, org_name, job_title, bank_card, bank_name, city_name,
+               user_type, nickname, source_file, updated_at
+        FROM finance_record
+        {where_sql}
+        ORDER BY COALESCE(start_time, updated_at) DESC, record_id DESC
+        LIMIT ? OFFSET ?
+        """,
+        tuple(params + [page_size, offset]),
+    ).fetchall()
 
-    return json_response(True, {
+    return {
         "total": total,
         "page": page,
         "page_size": page_size,
         "rows": [dict(row) for row in rows],
-    })
+    }
 
 
 
 
 @app.route("/api/session/history")
+@conditional_on_data_version
 def session_history():
+    try:
+        limit = min(200, max(1, int(request.args.get("limit", "50"))))
+    except ValueError:
+        return json_response(False, error="limit 非法。")
+    before_id_text = request.args.get("before_id", "").strip()
+    year = request.args.get("year", "").strip()
+    if before_id_text and not before_id_text.isdigit():
+        return json_response(False, error="before_id 非法。")
+    if year and not re.fullmatch(r"\d{4}", year):
+        return json_response(False, error="请输入四位年份。")
+
+    before_id = int(before_id_text) if before_id_text else None
+    with get_connection() as conn:
+        # Session ids stay unique across archives, so the unfiltered keyset
+        # pages run over every archived year as well.
+        schemas = archive.attach_years(conn, ARCHIVE_DIR, [year]) if year else archive.attach_all(conn, ARCHIVE_DIR)
+        return json_response(True, query_session_history(conn, limit, before_id, year or None, schemas))
+
+
+def query_session_history(
+    conn: sqlite3.Connection,
+    limit: int = 50,
+    before_id: Optional[int] = None,
+    year: Optional[str] = None,
+    schemas: Sequence[str] = ("main",),
+) -> Dict[str, Any]:
+    conditions: List[str] = []
+    params: List[Any] = []
+    if before_id is not None:
+        conditions.append("session_id < ?")
+        params.append(before_id)
+    if year:
+        conditions.append("start_date >= ? AND start_date < ?")
+        params.extend([year, str(int(year) + 1)])
+    where_sql = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    # Each schema contributes at most one page, newest first, before the merge.
+    sessions = archive.union_all(
+        schemas,
+        f"""
+        SELECT * FROM (
+            SELECT session_id, title, start_date, end_date, location_text,
+                   training_goal, created_at, enrollment_count
+            FROM {{schema}}.training_session
+            {where_sql}
+            ORDER BY session_id DESC
+            LIMIT ?
+        )
+        """,
+    )
+    rows = conn.execute(
+        f"""
+        {sessions}
+        ORDER BY session_id DESC
+        LIMIT ?
+        """,
+        tuple((params + [limit + 1]) * len(schemas) + [limit + 1]),
+    ).fetchall()
+
+    next_before_id = rows[limit - 1]["session_id"] if len(rows) > limit else None
+    return {
+        "rows": [dict(row) for row in rows[:limit]],
+        "next_before_id": next_before_id,
+    }
+
+
+@app.route("/api/person/duplicates")
+def person_duplicates():
+    from app.dedup import PersonRecord, find_duplicates
+
+    try:
+        threshold = float(request.args.get("threshold", "0.7"))
+        limit = min(1000, max(1, int(request.args.get("limit", "200"))))
+    except ValueError:
+        return json_response(False, error="threshold/limit 非法。")
     with get_connection() as conn:
         rows = conn.execute(
             """
-            SELECT
-                ts.session_id,
-                ts.title,
-                ts.start_date,
-                ts.end_date,
-                ts.location_text,
-                ts.training_goal,
-                ts.created_at,
-                COUNT(e.enrollment_id) AS enrollment_count
-            FROM training_session ts
-            LEFT JOIN enrollment e ON e.session_id = ts.session_id
-            GROUP BY ts.session_id
-            ORDER BY ts.session_id DESC
+            SELECT p.person_id, p.phone_norm, p.name_latest, p.org_text_latest,
+                   COALESCE(e.enrollment_count, 0) AS enrollment_count
+            FROM person p
+            LEFT JOIN (
+                SELECT person_id, COUNT(1) AS enrollment_count FROM enrollment GROUP BY person_id
+            ) e ON e.person_id = p.person_id
+            WHERE p.merged_into IS NULL
             """
         ).fetchall()
+    records = [
+        PersonRecord(
+            row["person_id"], row["phone_norm"], row["name_latest"] or "", row["org_text_latest"] or "",
+            row["enrollment_count"],
+        )
+        for row in rows
+    ]
+    return json_response(True, find_duplicates(records, threshold, limit))
+
+
+@app.route("/api/person/merge", methods=["POST"])
+def merge_person():
+    payload = request.get_json(silent=True) or {}
+    keep_id = payload.get("keep_person_id")
+    merge_ids = payload.get("merge_person_ids")
+    if not isinstance(keep_id, int):
+        return json_response(False, error="keep_person_id 非法。")
+    if (
+        not isinstance(merge_ids, list)
+        or not merge_ids
+        or not all(isinstance(item, int) for item in merge_ids)
+        or keep_id in merge_ids
+    ):
+        return json_response(False, error="merge_person_ids 非法。")
+    merge_ids = sorted(set(merge_ids))
+
+    def merge(conn: sqlite3.Connection) -> Optional[Dict[str, int]]:
+        placeholders = ",".join("?" for _ in merge_ids)
+        keep = conn.execute(
+            "SELECT person_id FROM person WHERE person_id = ? AND merged_into IS NULL", (keep_id,)
+        ).fetchone()
+        found = conn.execute(
+            f"SELECT COUNT(1) AS c FROM person WHERE person_id IN ({placeholders}) AND merged_into IS NULL",
+            merge_ids,
+        ).fetchone()["c"]
+        if not keep or found != len(merge_ids):
+            return None
+        enrollment_changed.set()
+        moved = conn.execute(
+            f"UPDATE enrollment SET person_id = ? WHERE person_id IN ({placeholders})",
+            [keep_id, *merge_ids],
+        ).rowcount
+        conn.execute(
+            f"UPDATE person SET merged_into = ? WHERE person_id IN ({placeholders}) OR merged_into IN ({placeholders})",
+            [keep_id, *merge_ids, *merge_ids],
+        )
+        return {"keep_person_id": keep_id, "merged": len(merge_ids), "enrollments_moved": moved}
+
+    result = run_write(merge)
+    if result is None:
+        return json_response(False, error="人员不存在或已被合并。")
+    app.logger.info("Merged persons %s into %s (%s enrollments)", merge_ids, keep_id, result["enrollments_moved"])
+    return json_response(True, result)
 
-    return json_response(True, [dict(row) for row in rows])
 
 @app.route("/api/stats/year")
 def stats_year():
@@ -1507,20 +2889,110 @@ def stats_year():
     return json_response(True, stats)
 
 
-def build_exports(year: str) -> io.BytesIO:
+@app.route("/api/stats/cohorts")
+def stats_cohorts():
     with get_connection() as conn:
-        enrollments = conn.execute(
-            """
-            SELECT enrollment.*, person.phone_norm, person.name_latest, training_session.title AS session_title,
-                   training_session.start_date, training_session.end_date, training_session.location_text
-            FROM enrollment
-            JOIN person ON enrollment.person_id = person.person_id
-            JOIN training_session ON enrollment.session_id = training_session.session_id
-            WHERE COALESCE(NULLIF(substr(training_session.start_date, 1, 4), ""), substr(enrollment.enrolled_at, 1, 4)) = ?
-            """,
-            (year,),
-        ).fetchall()
+        years = archive.archived_years(conn)
+    with read_snapshot(years) as (conn, schemas):
+        return json_response(True, analytics.cohort_retention(conn, schemas))
+
+
+@app.route("/api/bootstrap")
+def bootstrap():
+    """Everything the dashboard renders on load, in one response.
+
+    The database panels are read from one snapshot (read_snapshot). Reading the log tail and geocoding course locations
+    do not touch SQLite, so they run on a small pool while the queries run.
+    """
+    year = request.args.get("year", "").strip() or str(date.today().year)
+    if not re.fullmatch(r"\d{4}", year):
+        return json_response(False, error="请输入四位年份。")
+    amap_key = request.args.get("map_api_key", "").strip()
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        logs_future = pool.submit(read_recent_logs, 200)
+        with read_snapshot([year]) as (conn, schemas):
+            tasks = query_today_tasks(conn)
+            map_futures = [
+                pool.submit(build_map_info, item.get("course_location", ""), amap_key) for item in tasks
+            ]
+            stats = query_yearly_stats(conn, year, schemas)
+            history = query_session_history(conn)
+            finance = query_finance_list(conn)
+        for item, future in zip(tasks, map_futures):
+            map_info = future.result()
+            item["map_url"] = map_info["map_url"]
+            item["geo"] = map_info["geo"]
+        logs = logs_future.result()
 
+    return json_response(True, {
+        "year": year,
+        "stats": stats,
+        "history": history,
+        "today_tasks": tasks,
+        "finance": finance,
+        "logs": logs,
+    })
+
+
+def build_exports(year: str) -> io.BytesIO:
+    run_usage = usage.RunUsage("export", "", int(year))
+    try:
+        buffer = _build_exports(year, run_usage)
+    except Exception as exc:
+        record_run_usage(run_usage, str(exc))
+        raise
+    record_run_usage(run_usage)
+    return buffer
+
+
+# Enrollment columns in the export files; internal ones (stat_year, row_hash)
+# stay out so exported files keep their shape as the table grows.
+EXPORT_ENROLLMENT_COLUMNS = (
+    "enrollment_id",
+    "session_id",
+    "person_id",
+    "enrolled_at",
+    "name_snapshot",
+    "org_text",
+    "region_text",
+    "title_text",
+    "remote_id_snapshot",
+    "room_preference",
+    "source_file",
+    "source_sheet",
+)
+
+
+def _build_exports(year: str, run_usage: usage.RunUsage) -> io.BytesIO:
+    with run_usage.phase("load_pandas"):
+        import pandas as pd
+
+    query_started = time.perf_counter()
+    with read_snapshot([year]) as (conn, schemas):
+        selects = []
+        for schema in schemas:
+            person = archive.person_sql(schema)
+            columns = archive.select_columns(
+                conn, schema, "enrollment", EXPORT_ENROLLMENT_COLUMNS, "e", {"person_id": person["person"]}
+            )
+            selects.append(
+                f"""
+                SELECT {columns},
+                       person.phone_norm, person.name_latest, training_session.title AS session_title,
+                       training_session.start_date, training_session.end_date, training_session.location_text
+                FROM {schema}.enrollment AS e
+                {person["person_join"]}
+                JOIN main.person ON person.person_id = {person["person"]}
+                JOIN {schema}.training_session ON e.session_id = training_session.session_id
+                WHERE e.stat_year = :year
+                """
+            )
+        enrollments = conn.execute("\nUNION ALL\n".join(selects), {"year": year}).fetchall()
+    run_usage.add("query", time.perf_counter() - query_started)
+    run_usage.rows = len(enrollments)
+
+    summarize_started = time.perf_counter()
     enrollment_rows = [dict(row) for row in enrollments]
     enrollment_df = pd.DataFrame(enrollment_rows)
 
@@ -1534,9 +3006,10 @@ def build_exports(year: str) -> io.BytesIO:
             .rename(columns={"name_latest": "name"})
             .sort_values("count", ascending=False)
         )
+    run_usage.add("summarize", time.perf_counter() - summarize_started)
 
     buffer = io.BytesIO()
-    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+    with run_usage.phase("write"), zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
         enrollment_csv = enrollment_df.to_csv(index=False)
         zf.writestr(f"{year}_enrollments.csv", enrollment_csv)
         summary_csv = summary_df.to_csv(index=False)
@@ -1561,8 +3034,108 @@ def export_year():
     )
 
 
+def prewarm_imports(host: str, port: int, timeout: float = 30.0) -> None:
+    """Import the heavy optional modules once the server accepts connections.
+
+    Runs in a daemon thread so the first Excel import, export or QR code does
+    not pay the import cost, without delaying the moment the port opens.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                break
+        except OSError:
+            time.sleep(0.2)
+    started = time.perf_counter()
+    for name in PREWARM_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception as exc:
+            app.logger.warning("Prewarm import %s failed: %s", name, exc)
+    app.logger.info("Prewarmed %s in %.2fs", ", ".join(PREWARM_MODULES), time.perf_counter() - started)
+
+
+def start_prewarm(host: str, port: int) -> None:
+    if not PREWARM_ENABLED:
+        return
+    threading.Thread(target=prewarm_imports, args=(host, port), name="prewarm", daemon=True).start()
+
+
+def serve(host: str, port: int, threads: int) -> None:
+    try:
+        from waitress import serve as waitress_serve
+    except ImportError as exc:
+        raise SystemExit("生产模式需要 waitress，请执行: pip install waitress") from exc
+    start_prewarm(host, port)
+    start_upload_gc()
+    start_backups()
+    print(f"服务已启动（waitress，{threads} 线程），请访问 http://{host}:{port}")
+    waitress_serve(app, host=host, port=port, threads=threads, connection_limit=max(100, threads * 8))
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="培训报名管理服务")
+    parser.add_argument("--serve", action="store_true", help="使用 waitress 多线程服务（生产模式）")
+    parser.add_argument("--host", default=os.environ.get("TRAINING_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("TRAINING_PORT", "5000")))
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("TRAINING_THREADS", "16")))
+    parser.add_argument(
+        "--archive-year",
+        action="append",
+        default=[],
+        metavar="YYYY",
+        help=f"把已结束年度的培训及报名移入 {ARCHIVE_DIR}/training_<年份>.db 后退出（可重复）",
+    )
+    parser.add_argument("--vacuum", action="store_true", help="归档后 VACUUM 主库以回收空间")
+    parser.add_argument("--backup-now", action="store_true", help=f"在线备份到 {BACKUP_DIR} 后退出")
+    parser.add_argument(
+        "--verify-backup",
+        nargs="?",
+        const="latest",
+        metavar="FILE",
+        help="校验备份（默认最新一份）：核对校验和，恢复到临时库并做完整性检查",
+    )
+    return parser.parse_args(argv)
+
+
+def archive_years(years: Sequence[str], vacuum: bool = False) -> List[Dict[str, Any]]:
+    """Archive closed ``years`` out of the hot database; the current year stays."""
+    current_year = datetime.now().year
+    for year in years:
+        if not re.fullmatch(r"\d{4}", year) or int(year) >= current_year:
+            raise ValueError(f"只能归档已结束的年度：{year}")
+    results = []
+    with get_connection() as conn:
+        for year in years:
+            moved = archive.archive_year(conn, ARCHIVE_DIR, year)
+            with conn:
+                bump_data_version(conn)
+                analytics.bump_enrollment_version(conn)
+            results.append({"year": year, "moved": moved})
+        if vacuum:
+            conn.execute("VACUUM")
+    return results
+
+
 if __name__ == "__main__":
+    args = parse_args()
     setup_logging()
     initialize_database()
-    print("本地服务已启动，请访问 http://127.0.0.1:5000")
-    app.run(host="127.0.0.1", port=5000)
+    if args.archive_year:
+        for item in archive_years(args.archive_year, args.vacuum):
+            print(f"{item['year']}: {item['moved']}")
+    elif args.backup_now:
+        print(json.dumps(create_backup(), ensure_ascii=False, indent=2))
+    elif args.verify_backup:
+        verification = backup.verify_backup(backup.resolve_backup(BACKUP_DIR, args.verify_backup))
+        print(json.dumps(verification, ensure_ascii=False, indent=2))
+        raise SystemExit(0 if verification["ok"] else 1)
+    elif args.serve:
+        serve(args.host, args.port, args.threads)
+    else:
+        start_prewarm(args.host, args.port)
+        start_upload_gc()
+        start_backups()
+        print(f"本地服务已启动，请访问 http://{args.host}:{args.port}")
+        app.run(host=args.host, port=args.port)
@@ -26,13 +26,13 @@ function Ensure-EnvWithConda {
 
     Write-Host "安装依赖..." -ForegroundColor Yellow
     & $CondaExe run -n $EnvName python -m pip install --upgrade pip
-    & $CondaExe run -n $EnvName python -m pip install flask pandas openpyxl python-docx qrcode[pil]
+    & $CondaExe run -n $EnvName python -m pip install flask waitress pandas openpyxl python-calamine python-docx qrcode[pil]
 
     Write-Host "运行环境检查..." -ForegroundColor Yellow
     & $CondaExe run -n $EnvName python env_check.py
 
     Write-Host "启动服务: http://127.0.0.1:5000" -ForegroundColor Green
-    & $CondaExe run -n $EnvName python main.py
+    & $CondaExe run -n $EnvName python main.py --serve
 }
 
 function Ensure-EnvWithVenv {
@@ -60,13 +60,13 @@ function Ensure-EnvWithVenv {
 
     Write-Host "安装依赖..." -ForegroundColor Yellow
     & $venvPython -m pip install --upgrade pip
-    & $venvPython -m pip install flask pandas openpyxl python-docx qrcode[pil]
+    & $venvPython -m pip install flask waitress pandas openpyxl python-calamine python-docx qrcode[pil]
 
     Write-Host "运行环境检查..." -ForegroundColor Yellow
     & $venvPython env_check.py
 
     Write-Host "启动服务: http://127.0.0.1:5000" -ForegroundColor Green
-    & $venvPython main.py
+    & $venvPython main.py --serve
 }
 
 $condaExe = Ensure-Conda
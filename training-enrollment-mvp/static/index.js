@@ -95,29 +95,28 @@ async function fetchStats() {
   }
 
   try {
-    const data = await handleResponse(await fetch(`/api/stats/year?year=${encodeURIComponent(year)}`));
-    const rows = (data.top5 || []).map((item) => `<tr><td>${item.phone_norm}</td><td>${item.name || ""}</td><td>${item.count}</td></tr>`).join("");
-    statsResult.innerHTML = `
-      <p>年度：${year}</p>
-      <p>参训人次：<strong>${data.total_enrollments}</strong>；参训人数：<strong>${data.total_people}</strong>；复训人数：<strong>${data.repeat_people}</strong></p>
-      <table>
-        <thead><tr><th>手机号</th><th>姓名</th><th>次数</th></tr></thead>
-        <tbody>${rows || '<tr><td colspan="3">暂无数据</td></tr>'}</tbody>
-      </table>
-    `;
+    renderStats(year, await handleResponse(await fetch(`/api/stats/year?year=${encodeURIComponent(year)}`)));
   } catch (error) {
     statsResult.innerHTML = `<p class="error">统计失败：${error.message}</p>`;
   }
 }
 
-async function fetchHistory() {
-  try {
-    const rows = await handleResponse(await fetch("/api/session/history"));
-    if (!rows.length) {
-      historyList.innerHTML = "<p>暂无历史培训班。</p>";
-      return;
-    }
-    historyList.innerHTML = rows.map((item) => `
+function renderStats(year, data) {
+  const rows = (data.top5 || []).map((item) => `<tr><td>${item.phone_norm}</td><td>${item.name || ""}</td><td>${item.count}</td></tr>`).join("");
+  statsResult.innerHTML = `
+    <p>年度：${year}</p>
+    <p>参训人次：<strong>${data.total_enrollments}</strong>；参训人数：<strong>${data.total_people}</strong>；复训人数：<strong>${data.repeat_people}</strong></p>
+    <table>
+      <thead><tr><th>手机号</th><th>姓名</th><th>次数</th></tr></thead>
+      <tbody>${rows || '<tr><td colspan="3">暂无数据</td></tr>'}</tbody>
+    </table>
+  `;
+}
+
+let historyNextBeforeId = null;
+
+function renderHistoryItems(rows) {
+  return rows.map((item) => `
       <div class="history-item">
         <div><strong>#${item.session_id} ${item.title || "未命名培训班"}</strong></div>
         <div>日期：${item.start_date || ""} ~ ${item.end_date || ""}</div>
@@ -127,11 +126,38 @@ async function fetchHistory() {
         <button data-action="edit-session" data-session-id="${item.session_id}">修改</button>
       </div>
     `).join("");
+}
+
+function renderHistoryMore() {
+  return historyNextBeforeId
+    ? '<button data-action="more-history">加载更多</button>'
+    : "";
+}
+
+async function fetchHistory(append = false) {
+  try {
+    const query = append && historyNextBeforeId ? `?before_id=${historyNextBeforeId}` : "";
+    renderHistory(await handleResponse(await fetch(`/api/session/history${query}`)), append);
   } catch (error) {
     historyList.innerHTML = `<p class="error">加载历史培训班失败：${error.message}</p>`;
   }
 }
 
+function renderHistory(data, append = false) {
+  const rows = data.rows || [];
+  historyNextBeforeId = data.next_before_id;
+  if (!append && !rows.length) {
+    historyList.innerHTML = "<p>暂无历史培训班。</p>";
+    return;
+  }
+  if (append) {
+    historyList.querySelector("button[data-action='more-history']")?.remove();
+    historyList.insertAdjacentHTML("beforeend", renderHistoryItems(rows) + renderHistoryMore());
+  } else {
+    historyList.innerHTML = renderHistoryItems(rows) + renderHistoryMore();
+  }
+}
+
 async function createSession() {
   const title = document.getElementById("new-title").value.trim();
   if (!title) {
@@ -318,7 +344,7 @@ async function reimportSessionCourse() {
   }
 }
 
-async function reimportSessionEnrollment() {
+async function reimportSessionEnrollment(dryRun = false) {
   const sessionId = document.getElementById("session-edit-id").value.trim();
   if (!sessionId) {
     sessionEditResult.innerHTML = '<p class="error">请先选择一个历史培训班。</p>';
@@ -333,13 +359,29 @@ async function reimportSessionEnrollment() {
   const formData = new FormData();
   formData.append("session_id", sessionId);
   formData.append("excel_file", file);
+  if (dryRun) {
+    formData.append("dry_run", "1");
+  }
+  const mode = document.getElementById("session-edit-enrollment-mode").value;
+  if (mode !== "append") {
+    formData.append("delta", "1");
+  }
+  if (mode === "retract") {
+    formData.append("retract", "1");
+  }
   try {
     const data = await handleResponse(await fetch("/api/enrollment/import", { method: "POST", body: formData }));
-    const errors = (data.invalid_rows || []).map((it) => `<li>sheet:${it.sheet} 行:${it.row} 原因:${it.reason}</li>`).join("");
+    const errors = (data.exceptions || []).map((it) => `<li>sheet:${it.sheet} 行:${it.row ?? "-"} 原因:${it.reason}</li>`).join("");
+    const title = dryRun ? "学员名单校验完成（未写入）" : "学员名单重新导入完成";
+    const deltaText = mode === "append" ? "" : `，更新报名 ${data.updated_enrollment_count}，未变化 ${data.unchanged_count}`;
+    const retractText = mode === "retract" ? `，删除报名 ${data.retracted_count ?? 0}` : "";
     sessionEditResult.innerHTML = `
-      <p>学员名单重新导入完成：sheet数 ${data.sheet_count}，有效行 ${data.valid_rows}，新增学员 ${data.new_person_count}，新增报名 ${data.new_enrollment_count}。</p>
+      <p>${title}：sheet数 ${data.sheet_count}，有效行 ${data.valid_rows}，新增学员 ${data.new_person_count}，新增报名 ${data.new_enrollment_count}${deltaText}${retractText}。</p>
       <ul>${errors || "<li>无异常行</li>"}</ul>
     `;
+    if (dryRun) {
+      return;
+    }
     document.getElementById("session-edit-enrollment-file").value = "";
     await fetchHistory();
   } catch (error) {
@@ -361,94 +403,107 @@ async function fetchTodayTasks() {
   try {
     const mapApiKey = document.getElementById("map-api-key").value.trim();
     const query = mapApiKey ? `?map_api_key=${encodeURIComponent(mapApiKey)}` : "";
-    const tasks = await handleResponse(await fetch(`/api/tasks/today${query}`));
-    if (!tasks.length) {
-      todayTaskList.innerHTML = "<p>暂无近期课程。</p>";
-      return;
-    }
+    renderTodayTasks(await handleResponse(await fetch(`/api/tasks/today${query}`)));
+  } catch (error) {
+    todayTaskList.innerHTML = `<p class="error">加载今天任务失败：${error.message}</p>`;
+  }
+}
 
-    todayTaskList.innerHTML = tasks.map((item) => {
-      const submitted = Number(item.survey_submitted_count || 0);
-      const total = Number(item.enrollment_total_count || 0);
-      const ratioText = total > 0 ? `${((submitted / total) * 100).toFixed(1)}%` : "--";
-      const surveyHtml = item.survey_link
-        ? `<div>问卷：<a href="${item.survey_link}" target="_blank">${item.survey_link}</a></div>
-           <div style="margin-top:6px;padding:8px;border:1px solid #e7e7e7;border-radius:6px;background:#fff;">
-             <strong>问卷快速结果</strong>
-             <div>填写份数：${submitted}</div>
-             <div>总人数：${total}</div>
-             <div>回收比例：${ratioText}</div>
-           </div>`
-        : "";
-      const qrHtml = item.qr_data_uri
-        ? `<div style="margin-top:6px;"><div>二维码：</div><img src="${item.qr_data_uri}" alt="问卷二维码" width="120" /></div>`
-        : '<div class="inline-tip" style="margin-top:6px;">二维码暂不可用（请检查 Pillow/qrcode 依赖或日志）。</div>';
-      const mapHtml = item.map_url
-        ? `<div style="margin-top:6px;padding:8px;border:1px solid #e7e7e7;border-radius:6px;background:#fff;">
-             <strong>培训地点</strong>
-             <div>地址：${item.course_location || ""}</div>
-             <div>坐标：${item.geo || "未解析"}</div>
-             <div><a href="${item.map_url}" target="_blank">打开地图（便于转发）</a></div>
-           </div>`
-        : "";
-      const statusText = item.status === "sent" ? "已发送" : "待发送";
-      const safeContent = (item.content || "").replace(/"/g, "&quot;");
-      return `
-        <div class="task-item">
-          <div class="task-row">
-            <div class="task-panel">
-              <div><strong>${item.course_title || "课程"}</strong></div>
-              <div>讲师：${item.course_teacher || ""}</div>
-              <div>时间：${item.start_at || ""} ~ ${item.end_at || ""}</div>
-              <div>状态：${statusText}</div>
-              ${surveyHtml}
-              ${mapHtml}
-              ${qrHtml}
-              <div style="margin-top:8px;">
-                <button data-action="mark-sent" data-task-id="${item.task_id || ""}">标记已发送</button>
-              </div>
+function renderTodayTasks(tasks) {
+  if (!tasks.length) {
+    todayTaskList.innerHTML = "<p>暂无近期课程。</p>";
+    return;
+  }
+
+  todayTaskList.innerHTML = tasks.map((item) => {
+    const submitted = Number(item.survey_submitted_count || 0);
+    const total = Number(item.enrollment_total_count || 0);
+    const ratioText = total > 0 ? `${((submitted / total) * 100).toFixed(1)}%` : "--";
+    const surveyHtml = item.survey_link
+      ? `<div>问卷：<a href="${item.survey_link}" target="_blank">${item.survey_link}</a></div>
+         <div style="margin-top:6px;padding:8px;border:1px solid #e7e7e7;border-radius:6px;background:#fff;">
+           <strong>问卷快速结果</strong>
+           <div>填写份数：${submitted}</div>
+           <div>总人数：${total}</div>
+           <div>回收比例：${ratioText}</div>
+         </div>`
+      : "";
+    const qrHtml = item.qr_data_uri
+      ? `<div style="margin-top:6px;"><div>二维码：</div><img src="${item.qr_data_uri}" alt="问卷二维码" width="120" /></div>`
+      : '<div class="inline-tip" style="margin-top:6px;">二维码暂不可用（请检查 Pillow/qrcode 依赖或日志）。</div>';
+    const mapHtml = item.map_url
+      ? `<div style="margin-top:6px;padding:8px;border:1px solid #e7e7e7;border-radius:6px;background:#fff;">
+           <strong>培训地点</strong>
+           <div>地址：${item.course_location || ""}</div>
+           <div>坐标：${item.geo || "未解析"}</div>
+           <div><a href="${item.map_url}" target="_blank">打开地图（便于转发）</a></div>
+         </div>`
+      : "";
+    const statusText = item.status === "sent" ? "已发送" : "待发送";
+    const safeContent = (item.content || "").replace(/"/g, "&quot;");
+    return `
+      <div class="task-item">
+        <div class="task-row">
+          <div class="task-panel">
+            <div><strong>${item.course_title || "课程"}</strong></div>
+            <div>讲师：${item.course_teacher || ""}</div>
+            <div>时间：${item.start_at || ""} ~ ${item.end_at || ""}</div>
+            <div>状态：${statusText}</div>
+            ${surveyHtml}
+            ${mapHtml}
+            ${qrHtml}
+            <div style="margin-top:8px;">
+              <button data-action="mark-sent" data-task-id="${item.task_id || ""}">标记已发送</button>
             </div>
-            <div class="task-panel">
-              <div><strong>可发送内容</strong></div>
-              <label>发送文案</label>
-              <textarea id="task-content-${item.course_id}" style="width:100%;height:92px;">${item.content || ""}</textarea>
-              <label>课程名称</label>
-              <input type="text" id="course-title-${item.course_id}" value="${item.course_title || ""}" style="width:100%;" />
-              <label>讲师</label>
-              <input type="text" id="course-teacher-${item.course_id}" value="${item.course_teacher || ""}" style="width:100%;" />
-              <label>开始时间</label>
-              <input type="datetime-local" id="course-start-${item.course_id}" value="${toDateTimeLocalValue(item.start_at)}" style="width:100%;" />
-              <label>结束时间</label>
-              <input type="datetime-local" id="course-end-${item.course_id}" value="${toDateTimeLocalValue(item.end_at)}" style="width:100%;" />
-              <label>地点</label>
-              <input type="text" id="course-location-${item.course_id}" value="${item.course_location || ""}" style="width:100%;" />
-              <div style="margin-top:8px;">
-                <button data-action="save-course" data-course-id="${item.course_id}">保存课程信息</button>
-                <button data-action="save-task-content" data-course-id="${item.course_id}">保存发送内容</button>
-                <button data-action="append-map" data-course-id="${item.course_id}">加入地图到文案</button>
-                <button data-action="copy-task" data-course-id="${item.course_id}">复制文案</button>
-              </div>
+          </div>
+          <div class="task-panel">
+            <div><strong>可发送内容</strong></div>
+            <label>发送文案</label>
+            <textarea id="task-content-${item.course_id}" style="width:100%;height:92px;">${item.content || ""}</textarea>
+            <label>课程名称</label>
+            <input type="text" id="course-title-${item.course_id}" value="${item.course_title || ""}" style="width:100%;" />
+            <label>讲师</label>
+            <input type="text" id="course-teacher-${item.course_id}" value="${item.course_teacher || ""}" style="width:100%;" />
+            <label>开始时间</label>
+            <input type="datetime-local" id="course-start-${item.course_id}" value="${toDateTimeLocalValue(item.start_at)}" style="width:100%;" />
+            <label>结束时间</label>
+            <input type="datetime-local" id="course-end-${item.course_id}" value="${toDateTimeLocalValue(item.end_at)}" style="width:100%;" />
+            <label>地点</label>
+            <input type="text" id="course-location-${item.course_id}" value="${item.course_location || ""}" style="width:100%;" />
+            <div style="margin-top:8px;">
+              <button data-action="save-course" data-course-id="${item.course_id}">保存课程信息</button>
+              <button data-action="save-task-content" data-course-id="${item.course_id}">保存发送内容</button>
+              <button data-action="append-map" data-course-id="${item.course_id}">加入地图到文案</button>
+              <button data-action="copy-task" data-course-id="${item.course_id}">复制文案</button>
             </div>
           </div>
-        </div>`;
-    }).join("");
-  } catch (error) {
-    todayTaskList.innerHTML = `<p class="error">加载今天任务失败：${error.message}</p>`;
-  }
+        </div>
+      </div>`;
+  }).join("");
 }
 
+const LOG_PANEL_MAX_LINES = 1000;
+let logCursor = null;
+let logLines = [];
+
 async function fetchLogs() {
   try {
-    const data = await handleResponse(await fetch("/api/logs/recent?lines=200"));
-    logPath.textContent = `日志文件：${data.log_path}`;
-    logContent.textContent = (data.lines || []).join("\n") || "暂无日志";
+    const query = logCursor === null ? "?lines=200" : `?lines=${LOG_PANEL_MAX_LINES}&cursor=${encodeURIComponent(logCursor)}`;
+    renderLogs(await handleResponse(await fetch(`/api/logs/recent${query}`)));
   } catch (error) {
     logPath.textContent = `日志加载失败：${error.message}`;
     logContent.textContent = "";
   }
 }
 
-async function importFinanceCsv() {
+function renderLogs(data) {
+  logCursor = data.cursor;
+  logLines = logLines.concat(data.lines || []).slice(-LOG_PANEL_MAX_LINES);
+  logPath.textContent = `日志文件：${data.log_path}`;
+  logContent.textContent = logLines.join("\n") || "暂无日志";
+}
+
+async function importFinanceCsv(dryRun = false) {
   const file = document.getElementById("finance-csv-file").files[0];
   if (!file) {
     showResult(financeImportResult, "请先选择 CSV 文件。", true);
@@ -456,8 +511,15 @@ async function importFinanceCsv() {
   }
   const formData = new FormData();
   formData.append("csv_file", file);
+  if (dryRun) {
+    formData.append("dry_run", "1");
+  }
   try {
     const data = await handleResponse(await fetch("/api/finance/import", { method: "POST", body: formData }));
+    if (dryRun) {
+      showResult(financeImportResult, `校验完成（未写入）：将新增 ${data.imported} 条，更新 ${data.updated} 条，跳过 ${data.skipped} 条。`);
+      return;
+    }
     showResult(financeImportResult, `导入成功：新增 ${data.imported} 条，更新 ${data.updated} 条，跳过 ${data.skipped} 条。`);
     await fetchFinanceList();
   } catch (error) {
@@ -469,28 +531,31 @@ async function fetchFinanceList() {
   const keyword = document.getElementById("finance-search").value.trim();
   const query = keyword ? `?q=${encodeURIComponent(keyword)}` : "";
   try {
-    const data = await handleResponse(await fetch(`/api/finance/list${query}`));
-    const rows = data.rows || [];
-    if (!rows.length) {
-      financeList.innerHTML = "<p>暂无财务记录。</p>";
-      return;
-    }
-    financeList.innerHTML = rows.map((row) => `
-      <div class="task-item">
-        <div><strong>#${row.record_no || ""} ${row.name || ""}</strong></div>
-        <div>手机：${row.phone || ""}</div>
-        <div>单位：${row.org_name || ""}</div>
-        <div>职务：${row.job_title || ""}</div>
-        <div>开户行：${row.bank_name || ""}</div>
-        <div>银行卡：${row.bank_card || ""}</div>
-        <div>答题时间：${row.start_time || ""} ~ ${row.end_time || ""}</div>
-      </div>
-    `).join("");
+    renderFinanceList(await handleResponse(await fetch(`/api/finance/list${query}`)));
   } catch (error) {
     financeList.innerHTML = `<p class="error">加载财务记录失败：${error.message}</p>`;
   }
 }
 
+function renderFinanceList(data) {
+  const rows = data.rows || [];
+  if (!rows.length) {
+    financeList.innerHTML = "<p>暂无财务记录。</p>";
+    return;
+  }
+  financeList.innerHTML = rows.map((row) => `
+    <div class="task-item">
+      <div><strong>#${row.record_no || ""} ${row.name || ""}</strong></div>
+      <div>手机：${row.phone || ""}</div>
+      <div>单位：${row.org_name || ""}</div>
+      <div>职务：${row.job_title || ""}</div>
+      <div>开户行：${row.bank_name || ""}</div>
+      <div>银行卡：${row.bank_card || ""}</div>
+      <div>答题时间：${row.start_time || ""} ~ ${row.end_time || ""}</div>
+    </div>
+  `).join("");
+}
+
 async function markTaskSent(taskId) {
   try {
     await handleResponse(await fetch(`/api/tasks/${taskId}/mark_sent`, { method: "POST" }));
@@ -588,20 +653,26 @@ function bindEvents() {
   document.getElementById("create-session").addEventListener("click", createSession);
   document.getElementById("parse-notice-btn").addEventListener("click", parseNoticeAndFill);
 
-  document.getElementById("refresh-history").addEventListener("click", fetchHistory);
+  document.getElementById("refresh-history").addEventListener("click", () => fetchHistory());
 
   document.getElementById("close-session-edit").addEventListener("click", closeSessionEditModal);
   document.getElementById("save-session-edit").addEventListener("click", saveSessionEdit);
   document.getElementById("reimport-session-course").addEventListener("click", reimportSessionCourse);
-  document.getElementById("reimport-session-enrollment").addEventListener("click", reimportSessionEnrollment);
+  document.getElementById("reimport-session-enrollment").addEventListener("click", () => reimportSessionEnrollment());
+  document.getElementById("check-session-enrollment").addEventListener("click", () => reimportSessionEnrollment(true));
 
   document.getElementById("generate-today-tasks").addEventListener("click", generateTodayTasks);
   document.getElementById("refresh-today-tasks").addEventListener("click", fetchTodayTasks);
   document.getElementById("refresh-logs").addEventListener("click", fetchLogs);
-  document.getElementById("finance-import").addEventListener("click", importFinanceCsv);
+  document.getElementById("finance-import").addEventListener("click", () => importFinanceCsv());
+  document.getElementById("finance-check").addEventListener("click", () => importFinanceCsv(true));
   document.getElementById("finance-search-btn").addEventListener("click", fetchFinanceList);
 
   historyList.addEventListener("click", (event) => {
+    if (event.target.closest("button[data-action='more-history']")) {
+      fetchHistory(true);
+      return;
+    }
     const button = event.target.closest("button[data-action='edit-session']");
     if (!button) return;
     editSession(Number(button.dataset.sessionId));
@@ -635,15 +706,33 @@ function bindEvents() {
   });
 }
 
+async function loadDashboard() {
+  const year = document.getElementById("year").value.trim();
+  const mapApiKey = document.getElementById("map-api-key").value.trim();
+  const params = new URLSearchParams({ year });
+  if (mapApiKey) params.set("map_api_key", mapApiKey);
+  try {
+    const data = await handleResponse(await fetch(`/api/bootstrap?${params}`));
+    renderStats(data.year, data.stats);
+    renderHistory(data.history);
+    renderTodayTasks(data.today_tasks);
+    renderFinanceList(data.finance);
+    renderLogs(data.logs);
+  } catch (error) {
+    // Fall back to the per-panel endpoints so one failing panel does not blank the page.
+    fetchStats();
+    fetchHistory();
+    fetchTodayTasks();
+    fetchFinanceList();
+    fetchLogs();
+  }
+}
+
 function init() {
   const currentYear = new Date().getFullYear();
   document.getElementById("year").value = String(currentYear);
   bindEvents();
-  fetchStats();
-  fetchHistory();
-  fetchTodayTasks();
-  fetchFinanceList();
-  fetchLogs();
+  loadDashboard();
 }
 
 init();
@@ -0,0 +1,13 @@
+"""WSGI entry point for multi-process servers, e.g. ``gunicorn -w 4 wsgi:app``.
+
+Each worker process initialises logging and the schema on import; shared
+state such as the latest session lives in the database, so workers agree.
+"""
+from main import app, initialize_database, setup_logging, start_backups, start_upload_gc
+
+setup_logging()
+initialize_database()
+start_upload_gc()
+start_backups()
+
+__all__ = ["app"]